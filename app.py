@@ -0,0 +1,172 @@
+from contextlib import asynccontextmanager
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from src.constants import APP_HOST, APP_PORT, ARROW_STREAM_MEDIA_TYPE, MODEL_CONFIG_FILE_PATH
+from src.logger import logging
+from src.pipline.micro_batcher import MicroBatcher
+from src.entity.schema_validator import SchemaValidationError
+from src.pipline.prediction_pipeline import PersonalityClassifier, PersonalityData, schema_validator
+from src.utils.main_utils import read_yaml_file
+from src.utils.prediction_cache import PredictionCache
+
+serving_config = read_yaml_file(file_path=MODEL_CONFIG_FILE_PATH).get("serving", {})
+micro_batching_config = serving_config.get("micro_batching", {})
+hot_reload_config = serving_config.get("hot_reload", {})
+prediction_cache_config = serving_config.get("prediction_cache", {})
+
+prediction_cache = None
+if prediction_cache_config.get("enabled", False):
+    prediction_cache = PredictionCache(max_entries=prediction_cache_config.get("max_entries", 100000))
+classifier = PersonalityClassifier(prediction_cache=prediction_cache)
+# Set by serve.py in its forked workers: the parent polls for new versions and re-forks the
+# workers from the reloaded bundle, so they keep sharing one copy of it
+prefork_worker = False
+batcher = None
+if micro_batching_config.get("enabled", False):
+    batcher = MicroBatcher(predict_batch=classifier.predict_records,
+                           max_batch_size=micro_batching_config.get("max_batch_size", 64),
+                           max_wait_ms=micro_batching_config.get("max_wait_ms", 2))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fetch the production bundle once; requests are then served from memory. Workers started by
+    # serve.py inherit the bundle the parent loaded before forking
+    if not classifier.is_loaded:
+        classifier.load()
+    logging.info(f"Serving model version {classifier.model_version}")
+    if hot_reload_config.get("enabled", False) and not prefork_worker:
+        classifier.start_hot_reload(poll_interval_seconds=hot_reload_config.get("poll_interval_seconds", 30))
+    if batcher is not None:
+        await batcher.start()
+    yield
+    if batcher is not None:
+        await batcher.stop()
+    classifier.stop_hot_reload()
+
+
+app = FastAPI(title="Personality Classifier", lifespan=lifespan)
+
+
+# The handlers only do microseconds of NumPy work, so they run on the event loop
+# instead of paying for a hop to the thread pool
+@app.get("/health")
+async def health() -> dict:
+    status = {"status": "ok", "model_version": classifier.model_version}
+    if batcher is not None:
+        status["micro_batching"] = {"batches": batcher.batches, "records": batcher.records}
+    if prediction_cache is not None:
+        status["prediction_cache"] = prediction_cache.stats()
+    return status
+
+
+@app.get("/cache/stats")
+async def cache_stats() -> dict:
+    if prediction_cache is None:
+        raise HTTPException(status_code=404, detail="Prediction cache is disabled")
+    return prediction_cache.stats()
+
+
+def check_explainable() -> None:
+    if not classifier.can_explain:
+        raise HTTPException(status_code=400, detail="Explanations are only available for linear models")
+
+
+def validation_error(error: SchemaValidationError) -> HTTPException:
+    return HTTPException(status_code=422, detail={"n_errors": error.n_errors, "errors": error.errors})
+
+
+# The body is checked by the compiled schema validator rather than per field by pydantic;
+# PersonalityData only documents it in the OpenAPI schema
+@app.post("/predict", openapi_extra={"requestBody": {"required": True, "content": {
+    "application/json": {"schema": PersonalityData.model_json_schema()}}}})
+async def predict(request: Request, explain: bool = False) -> dict:
+    try:
+        record = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Body must be JSON")
+    if not isinstance(record, dict):
+        raise HTTPException(status_code=422, detail="Body must be a JSON object")
+    try:
+        columns = schema_validator.validate_records([record])
+    except SchemaValidationError as e:
+        raise validation_error(e)
+    if explain:
+        check_explainable()
+        try:
+            result = classifier.explain(columns)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        return {"prediction": result["predictions"][0], "explanation": result["explanations"][0],
+                "positive_class": result["positive_class"], "model_version": result["model_version"]}
+    try:
+        if batcher is not None:
+            prediction = await batcher.submit(record)
+        else:
+            prediction = classifier.predict_records([record])[0]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"prediction": prediction, "model_version": classifier.model_version}
+
+
+@app.post("/predict/batch")
+async def predict_batch(request: Request, explain: bool = False) -> dict:
+    """
+    Scores many records, given either row-oriented as {"records": [{column: value, ...}, ...]}
+    or column-oriented as {"columns": {column: [values, ...], ...}}. The batch is validated
+    against config/schema.yaml as column arrays by the compiled schema validator. With
+    ?explain=true every prediction comes with the contribution of each engineered feature.
+    """
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Body must be JSON")
+    if not isinstance(body, dict) or not (isinstance(body.get("columns"), dict) or isinstance(body.get("records"), list)):
+        raise HTTPException(status_code=422, detail='Body must be {"records": [...]} or {"columns": {...}}')
+    if explain:
+        check_explainable()
+    try:
+        if isinstance(body.get("columns"), dict):
+            columns = schema_validator.validate_columns(body["columns"])
+            if explain:
+                return classifier.explain(columns)
+            predictions = [str(label) for label in classifier.predict(columns)]
+        else:
+            columns = schema_validator.validate_records(body["records"])
+            if explain:
+                return classifier.explain(columns)
+            predictions = [str(label) for label in classifier.predict(columns)] if body["records"] else []
+    except SchemaValidationError as e:
+        raise validation_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"predictions": predictions, "model_version": classifier.model_version}
+
+
+@app.post("/predict/arrow")
+async def predict_arrow(request: Request) -> StreamingResponse:
+    """
+    Bulk scoring for high-volume clients: the body is an Arrow IPC stream with the schema.yaml
+    input columns, and the response is an Arrow IPC stream with a prediction column, one
+    record batch per input batch. The whole stream is validated first; batches are then scored
+    in the thread pool as the response streams.
+    """
+    try:
+        batches = classifier.read_arrow_stream(await request.body())
+    except SchemaValidationError as e:
+        raise validation_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        model, model_version = classifier.snapshot()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(classifier.iter_arrow_predictions(batches, model), media_type=ARROW_STREAM_MEDIA_TYPE,
+                             headers={"X-Model-Version": str(model_version)})
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host=APP_HOST, port=APP_PORT)
@@ -0,0 +1,92 @@
+"""
+Vectorized generator of synthetic personality records that conform to config/schema.yaml.
+
+Rows look like documents exported from the MongoDB collection: numerical columns hold whole
+numbers inside the schema's numerical_bounds, categorical columns its categorical_levels, and
+missing values are either the "na" strings the source data uses or real nulls. Feature values
+depend on the class, so the trained model and its metrics behave like they do on real data.
+Every column is drawn with whole-array NumPy operations, so ten million rows take seconds.
+"""
+from typing import Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+# Target classes, in the order DataCleaning's LabelEncoder assigns them
+TARGET_LEVELS = ("Extrovert", "Introvert")
+# Columns whose values are higher for introverts; every other numerical column is lower
+INTROVERT_HIGH_COLUMNS = ("Time_spent_Alone",)
+# Categorical level that is more likely for introverts
+INTROVERT_LEVEL = "Yes"
+
+
+def object_ids(n_rows: int, start: int = 0) -> np.ndarray:
+    """24-digit hex ids that sort in insertion order, like MongoDB ObjectIds."""
+    counters = np.arange(start, start + n_rows, dtype=np.uint64)
+    digits = (counters[:, None] >> np.arange(60, -4, -4, dtype=np.uint64)[None, :]) & np.uint64(0xF)
+    characters = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)[digits.astype(np.intp)]
+    # A uint64 holds 16 hex digits; the first 8 of the 24 stay zero
+    characters = np.concatenate([np.full((n_rows, 8), ord("0"), dtype=np.uint8), characters], axis=1)
+    return np.ascontiguousarray(characters).view("S24").ravel().astype("U24").astype(object)
+
+
+def generate_records(n_rows: int, schema_config: Mapping, introvert_share: float = 0.49,
+                     missing_rate: float = 0.03, na_string_share: float = 0.7, label_noise: float = 0.05,
+                     with_ids: bool = True, seed: Optional[int] = 42) -> pd.DataFrame:
+    """
+    :param n_rows: number of rows
+    :param schema_config: parsed config/schema.yaml
+    :param introvert_share: fraction of rows labelled Introvert (class balance)
+    :param missing_rate: fraction of feature values that are missing; the target is never missing
+    :param na_string_share: fraction of missing values written as "na" rather than null
+    :param label_noise: fraction of rows whose features are drawn from the other class
+    :param with_ids: add a sortable _id column, as the MongoDB export has
+    :return: DataFrame with the schema's columns in order, feature columns of object dtype
+    """
+    rng = np.random.default_rng(seed)
+    is_introvert = rng.random(n_rows) < introvert_share
+    # Rows that look like the other class keep the data from being perfectly separable
+    looks_introvert = is_introvert ^ (rng.random(n_rows) < label_noise)
+
+    columns = {}
+    if with_ids:
+        columns["_id"] = object_ids(n_rows)
+    for column in schema_config["numerical_columns"]:
+        low, high = schema_config["numerical_bounds"][column]
+        high_for_introverts = column in INTROVERT_HIGH_COLUMNS
+        p = np.where(looks_introvert == high_for_introverts, 0.7, 0.25)
+        values = (low + rng.binomial(high - low, p)).astype(np.float64)
+        columns[column] = _with_missing(values, rng, missing_rate, na_string_share)
+    for column in schema_config["categorical_columns"]:
+        levels = np.asarray(schema_config["categorical_levels"][column], dtype=object)
+        other = levels[levels != INTROVERT_LEVEL][0]
+        values = np.where(rng.random(n_rows) < np.where(looks_introvert, 0.85, 0.15), INTROVERT_LEVEL, other).astype(object)
+        columns[column] = _with_missing(values, rng, missing_rate, na_string_share)
+    columns[schema_config["target_column"]] = np.where(is_introvert, TARGET_LEVELS[1], TARGET_LEVELS[0]).astype(object)
+
+    order = (["_id"] if with_ids else []) + [list(column)[0] for column in schema_config["columns"]]
+    return pd.DataFrame({column: columns[column] for column in order}, copy=False)
+
+
+def _with_missing(values: np.ndarray, rng: np.random.Generator, missing_rate: float, na_string_share: float) -> np.ndarray:
+    column = values.astype(object)
+    is_missing = rng.random(len(values)) < missing_rate
+    is_na_string = is_missing & (rng.random(len(values)) < na_string_share)
+    column[is_missing] = None
+    column[is_na_string] = "na"
+    return column
+
+
+def to_model_inputs(dataframe: pd.DataFrame, schema_config: Mapping) -> dict:
+    """
+    Raw prediction inputs from generated records, as the service receives them: numerical columns
+    as float64 with NaN for missing values and categorical columns as objects with None.
+    """
+    inputs = {}
+    for column in schema_config["numerical_columns"]:
+        inputs[column] = pd.to_numeric(dataframe[column].replace({"na": None}), errors="coerce").to_numpy(dtype=np.float64)
+    for column in schema_config["categorical_columns"]:
+        values = dataframe[column].to_numpy(dtype=object).copy()
+        values[values == "na"] = None
+        inputs[column] = values
+    return inputs
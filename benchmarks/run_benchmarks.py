@@ -0,0 +1,233 @@
+"""
+Scale benchmarks of the training stages and the prediction path.
+
+For each row count, a fresh process generates synthetic records with benchmarks.data_generator,
+serves them to DataIngestion in place of the MongoDB collection, and runs every component of
+src/components in order against local files and an S3 endpoint. Then it scores the rows with
+the trained model bundle in memory and through the batch prediction CLI path. The process is
+started from scratch for each size so peak memory is not carried over between sizes.
+
+    python -m benchmarks.run_benchmarks --rows 10000 1000000 10000000
+    python -m benchmarks.run_benchmarks --rows 10000 --s3 moto --compare benchmarks/results/<earlier>.json
+
+S3 is the endpoint in AWS_ENDPOINT_URL (LocalStack from docker-compose.yml by default), or an
+in-process moto server with --s3 moto. Everything is written to a separate bucket and a scratch
+working directory, so the project's artifacts and registry are never touched.
+
+Each stage is measured by the components' instrumentation. The results file holds one record
+per (rows, component) with throughput, peak RSS and bytes moved, so two files compare directly.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import subprocess
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_BUCKET_NAME = "personality-classifier-benchmark-bucket"
+PREDICTION_CHUNK_ROWS = 100000
+RESULT_FIELDS = ("wall_seconds", "cpu_seconds", "children_cpu_seconds", "rss_start_mb", "rss_peak_mb",
+                 "read_bytes", "written_bytes", "s3_read_bytes", "s3_written_bytes", "overlapped")
+
+
+class GeneratedCollection:
+    """Stands in for src.data_access.data.Data, serving generated records instead of MongoDB."""
+
+    records = None
+
+    def export_collection_as_dataframe(self, collection_name: str, database_name: Optional[str] = None,
+                                       after_id: Optional[str] = None):
+        # What Data does after reading the documents
+        dataframe = self.records.copy()
+        dataframe.replace({"na": np.nan}, inplace=True)
+        return dataframe
+
+
+def run_size(n_rows: int, workdir: str, seed: int) -> List[dict]:
+    """
+    Runs in a fresh process: generates n_rows records, runs every stage and the prediction path,
+    and returns the instrumentation record of each.
+    """
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_DIR)
+    from src.constants import SCHEMA_FILE_PATH
+    from src.components import data_ingestion
+    from src.components.data_ingestion import DataIngestion
+    from src.components.data_validation import DataValidation
+    from src.components.data_cleaning import DataCleaning
+    from src.components.feature_engineering import FeatureEngineering
+    from src.components.model_trainer import ModelTrainer
+    from src.components.model_evaluation import ModelEvaluation
+    from src.components.model_pusher import ModelPusher
+    from src.configuration.aws_connection import buckets
+    from src.entity.config_entity import (DataIngestionConfig, DataValidationConfig, DataCleaningConfig,
+                                          FeatureEngineeringConfig, ModelTrainerConfig, ModelEvaluationConfig,
+                                          ModelPusherConfig, BatchPredictionConfig)
+    from src.entity.model_bundle import ModelBundle
+    from src.pipline.batch_prediction import BatchPrediction
+    from src.utils.instrumentation import instrumented, record_rows, collect_metrics
+    from src.utils.main_utils import read_yaml_file
+    from benchmarks.data_generator import generate_records, to_model_inputs
+
+    schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+    client = buckets()
+    try:
+        client.s3_client.create_bucket(Bucket=BENCHMARK_BUCKET_NAME)
+    except client.s3_client.exceptions.BucketAlreadyOwnedByYou:
+        pass
+
+    @instrumented
+    def generate_data():
+        GeneratedCollection.records = generate_records(n_rows, schema_config, seed=seed)
+        record_rows(n_rows)
+
+    generate_data()
+    data_ingestion.Data = GeneratedCollection
+
+    ingestion_artifact = DataIngestion(DataIngestionConfig(bucket_name=BENCHMARK_BUCKET_NAME)).initiate_data_ingestion()
+    validation_artifact = DataValidation(ingestion_artifact, DataValidationConfig()).initiate_data_validation()
+    cleaning_artifact = DataCleaning(ingestion_artifact, DataCleaningConfig(), validation_artifact).initiate_data_cleaning()
+    feature_artifact = FeatureEngineering(ingestion_artifact, FeatureEngineeringConfig(),
+                                          cleaning_artifact).initiate_feature_engineering()
+    trainer_artifact = ModelTrainer(feature_artifact, ModelTrainerConfig(bucket_name=BENCHMARK_BUCKET_NAME),
+                                    cleaning_artifact).initiate_model_trainer()
+    evaluation_artifact = ModelEvaluation(ModelEvaluationConfig(bucket_name=BENCHMARK_BUCKET_NAME), trainer_artifact,
+                                          feature_artifact).initiate_model_evaluation()
+    ModelPusher(evaluation_artifact, ModelPusherConfig(bucket_name=BENCHMARK_BUCKET_NAME)).initiate_model_pusher()
+
+    # The pusher adds the lookup table to the bundle when the model is promoted
+    bundle = ModelBundle.load(trainer_artifact.bundle_file_path)
+    inputs = to_model_inputs(GeneratedCollection.records, schema_config)
+    GeneratedCollection.records = None
+
+    @instrumented
+    def predict_bundle():
+        for start in range(0, n_rows, PREDICTION_CHUNK_ROWS):
+            bundle.predict({column: values[start:start + PREDICTION_CHUNK_ROWS] for column, values in inputs.items()})
+        record_rows(n_rows)
+
+    @instrumented
+    def batch_prediction():
+        config = BatchPredictionConfig(local_bundle_file_path=trainer_artifact.bundle_file_path)
+        summary = BatchPrediction(config).predict_file(ingestion_artifact.ingested_data_path,
+                                                       os.path.join(workdir, "predictions.parquet"))
+        record_rows(summary["rows"])
+
+    predict_bundle()
+    batch_prediction()
+
+    return collect_metrics()
+
+
+def summarize(n_rows: int, records: List[dict]) -> List[dict]:
+    """
+    One result per stage. Throughput is dataset rows per second for every stage, so stages that
+    only see a split or a sample (rows_processed) stay comparable with the others.
+    """
+    results = []
+    for record in records:
+        result = {"rows": n_rows, "component": record["component"].replace("run_size.<locals>.", ""),
+                  "status": record["status"], "rows_processed": record["rows"],
+                  "rows_per_second": round(n_rows / record["wall_seconds"], 1) if record["wall_seconds"] > 0 else None}
+        result.update({field: record.get(field) for field in RESULT_FIELDS})
+        result["rss_growth_mb"] = round(record["rss_peak_mb"] - record["rss_start_mb"], 1)
+        results.append(result)
+    return results
+
+
+def start_moto() -> object:
+    try:
+        from moto.server import ThreadedMotoServer
+    except ImportError:
+        raise SystemExit("--s3 moto needs the moto package: pip install 'moto[server]'")
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port)
+    server.start()
+    os.environ["AWS_ENDPOINT_URL"] = f"http://127.0.0.1:{port}"
+    return server
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: dict, current: dict) -> None:
+    """Prints throughput and peak memory of every (rows, component) present in both result files."""
+    previous = {(result["rows"], result["component"]): result for result in baseline["results"]}
+    print(f"\n{'rows':>10}  {'component':<48} {'rows/s before':>14} {'rows/s now':>12} {'speedup':>8} "
+          f"{'peak MB before':>15} {'peak MB now':>12}")
+    for result in current["results"]:
+        before = previous.get((result["rows"], result["component"]))
+        if before is None or not before["rows_per_second"] or not result["rows_per_second"]:
+            continue
+        print(f"{result['rows']:>10}  {result['component']:<48} {before['rows_per_second']:>14.0f} "
+              f"{result['rows_per_second']:>12.0f} {result['rows_per_second'] / before['rows_per_second']:>7.2f}x "
+              f"{before['rss_peak_mb']:>15} {result['rss_peak_mb']:>12}")
+
+
+def main(argv: Optional[list] = None) -> dict:
+    parser = argparse.ArgumentParser(description="Benchmark the training stages and prediction path at scale")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 1000000, 10000000])
+    parser.add_argument("--s3", choices=["endpoint", "moto"], default="endpoint",
+                        help="endpoint: AWS_ENDPOINT_URL (LocalStack by default); moto: in-process moto server")
+    parser.add_argument("--output", default=None, help="Results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier results file to compare with")
+    parser.add_argument("--workdir", default=None, help="Scratch directory for artifacts (default: a temporary one)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    server = start_moto() if args.s3 == "moto" else None
+    workdir = args.workdir or tempfile.mkdtemp(prefix="personality_benchmark_")
+    output = args.output or os.path.join(REPO_DIR, "benchmarks", "results", f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    report = {"created_at": datetime.now().isoformat(), "git_commit": git_commit(),
+              "machine": {"cpu_count": os.cpu_count(), "platform": platform.platform(), "python": platform.python_version()},
+              "results": []}
+    try:
+        for n_rows in args.rows:
+            size_dir = os.path.join(workdir, str(n_rows))
+            shutil.copytree(os.path.join(REPO_DIR, "config"), os.path.join(size_dir, "config"), dirs_exist_ok=True)
+            start = time.perf_counter()
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                records = executor.submit(run_size, n_rows, size_dir, args.seed).result()
+            report["results"].extend(summarize(n_rows, records))
+            print(f"{n_rows} rows benchmarked in {time.perf_counter() - start:.1f}s")
+            for result in report["results"][-len(records):]:
+                print(f"  {result['component']:<48} {result['wall_seconds']:>9.3f}s {result['rows_per_second'] or 0:>14.0f} rows/s "
+                      f"peak {result['rss_peak_mb']:>8} MB")
+            if args.workdir is None:
+                shutil.rmtree(size_dir, ignore_errors=True)
+    finally:
+        if server is not None:
+            server.stop()
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file_obj:
+        json.dump(report, file_obj, indent=4)
+    print(f"Results written to {output}")
+    if args.compare:
+        with open(args.compare) as file_obj:
+            compare(json.load(file_obj), report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
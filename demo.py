@@ -20,7 +20,8 @@ features = FeatureEngineering(data_ingestion_artifact=data_ingestion_artifact,
                                     data_cleaning_artifact=cleaning_data_artifact)
 feature_engineering_artifact = features.initiate_feature_engineering()
 trainer = ModelTrainer(feature_engineering_artifact=feature_engineering_artifact,
-                        model_trainer_config=ModelTrainerConfig())
+                        model_trainer_config=ModelTrainerConfig(),
+                        data_cleaning_artifact=cleaning_data_artifact)
 model_trainer_artifact = trainer.initiate_model_trainer()
 evaluate = ModelEvaluation(model_eval_config=ModelEvaluationConfig(),
                            model_trainer_artifact=model_trainer_artifact,
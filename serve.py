@@ -0,0 +1,196 @@
+"""
+Pre-fork launcher for the prediction service.
+
+The parent process loads the production model bundle once, moves every object it allocated into
+the permanent GC generation (gc.freeze) and then forks the uvicorn workers, which all accept on
+one listening socket. The bundle's arrays (feature parameters, scaler, lookup table) are never
+written after loading, so the workers share those pages with the parent copy-on-write instead of
+each holding a copy. gc.freeze keeps the collector from writing to the inherited objects' headers,
+which would otherwise un-share their pages on the first collection.
+
+    python serve.py --workers 4
+
+With hot reload enabled in config/model.yaml, the workers do not poll for new model versions
+themselves: each would load a private copy of the new bundle and memory would grow back to one
+copy per worker. The parent polls instead, loads the new version, freezes it again and replaces
+the workers one at a time with workers forked from it, so they share the new bundle as they did
+the old one. Old workers finish their in-flight requests while the shared listening socket hands
+new connections to the others, so no connection is refused during the switch.
+
+After startup, and after each rolling restart, the parent logs each worker's RSS and its private
+(unshared) memory.
+"""
+import gc
+import os
+import sys
+import time
+import signal
+import socket
+import argparse
+from typing import Dict, List, Optional
+
+import uvicorn
+
+from src.constants import APP_HOST, APP_PORT
+from src.logger import logging
+
+
+def read_memory(pid: int) -> Optional[Dict[str, float]]:
+    """
+    RSS, PSS and private memory of a process in MB, from /proc/<pid>/smaps_rollup (Linux only).
+    Private memory is what the process does not share with the parent or its siblings.
+    """
+    try:
+        fields = {}
+        with open(f"/proc/{pid}/smaps_rollup") as file_obj:
+            for line in file_obj:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+        return {"rss_mb": round(fields["Rss"], 1), "pss_mb": round(fields["Pss"], 1),
+                "private_mb": round(fields["Private_Clean"] + fields["Private_Dirty"], 1)}
+    except (OSError, KeyError):
+        return None
+
+
+def log_memory_report(parent_pid: int, worker_pids: List[int]) -> None:
+    logging.info(f"Parent {parent_pid} memory: {read_memory(parent_pid)}")
+    for pid in worker_pids:
+        logging.info(f"Worker {pid} memory: {read_memory(pid)}")
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket) -> None:
+    # Imported by the parent before forking, so this is the already-loaded module
+    import app as service
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    service.prefork_worker = True
+    service.classifier.after_fork()
+    server = uvicorn.Server(uvicorn.Config(service.app, log_level="info"))
+    server.run(sockets=[sock])
+
+
+def spawn_worker(sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid == 0:
+        exit_code = 0
+        try:
+            run_worker(sock)
+        except Exception:
+            logging.exception("Worker failed")
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+    return pid
+
+
+def reload_model(service) -> bool:
+    """
+    Loads a new production version into the parent, if there is one, and freezes it so the workers
+    forked from now on share it. The previous bundle is freed once the last old worker exited.
+
+    :return: whether a new version was loaded
+    """
+    try:
+        if not service.classifier.estimator.refresh():
+            return False
+    except Exception:
+        # Keep serving the current model; the next poll retries
+        logging.exception("Model refresh failed")
+        return False
+    gc.collect()
+    gc.freeze()
+    return True
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve the prediction service from pre-forked workers")
+    parser.add_argument("--host", default=APP_HOST)
+    parser.add_argument("--port", type=int, default=APP_PORT)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--report-after", type=float, default=5.0,
+                        help="Seconds after startup, and after each rolling restart, at which per-worker memory is logged")
+    parser.add_argument("--restart-interval", type=float, default=2.0,
+                        help="Seconds between replacing two workers after a model reload")
+    args = parser.parse_args(argv)
+
+    import app as service
+    service.classifier.load()
+    logging.info(f"Loaded model version {service.classifier.model_version} in parent {os.getpid()}")
+    gc.collect()
+    gc.freeze()
+
+    sock = bind_socket(args.host, args.port)
+    workers = [spawn_worker(sock) for _ in range(args.workers)]
+    logging.info(f"Started {len(workers)} workers on {args.host}:{args.port}: {workers}")
+
+    hot_reload_config = service.hot_reload_config
+    poll_interval = hot_reload_config.get("poll_interval_seconds", 30) if hot_reload_config.get("enabled", False) else None
+    next_poll_at = time.monotonic() + poll_interval if poll_interval is not None else None
+    # Workers still running the previous model, replaced one every restart_interval seconds, and
+    # workers told to exit, which are not replaced when they do
+    outdated, retiring = [], set()
+    next_restart_at = 0.0
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers + list(retiring):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    report_at = time.monotonic() + args.report_after
+    while workers or retiring:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid == 0:
+            now = time.monotonic()
+            if report_at is not None and now >= report_at:
+                log_memory_report(os.getpid(), workers)
+                report_at = None
+            if not stopping and next_poll_at is not None and now >= next_poll_at and not outdated:
+                next_poll_at = now + poll_interval
+                if reload_model(service):
+                    logging.info(f"Loaded model version {service.classifier.model_version}, restarting workers")
+                    outdated = list(workers)
+            if not stopping and outdated and now >= next_restart_at:
+                old = outdated.pop(0)
+                if old in workers:
+                    workers.remove(old)
+                    workers.append(spawn_worker(sock))
+                    retiring.add(old)
+                    os.kill(old, signal.SIGTERM)
+                next_restart_at = now + args.restart_interval
+                if not outdated:
+                    logging.info(f"All workers serve model version {service.classifier.model_version}: {workers}")
+                    report_at = now + args.report_after
+            time.sleep(0.5)
+            continue
+        if pid in retiring:
+            retiring.discard(pid)
+        elif pid in workers:
+            workers.remove(pid)
+            if not stopping:
+                # Replacements fork from the same frozen parent, so they share its pages too
+                logging.warning(f"Worker {pid} exited with status {status}; starting a replacement")
+                workers.append(spawn_worker(sock))
+    sock.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
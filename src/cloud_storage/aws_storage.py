@@ -0,0 +1,64 @@
+import os
+import sys
+import pickle
+
+from src.configuration.aws_connection import buckets
+from src.entity.model_bundle import BUNDLE_MAGIC, ModelBundle
+from src.exception import MyException
+from src.logger import logging
+
+
+class SimpleStorageService:
+    """
+    Storage operations used by the serving side (Proj1Estimator) on top of the boto3 wrapper.
+    """
+
+    def __init__(self, client: buckets = None):
+        try:
+            self.client = client or buckets()
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def s3_key_path_available(self, bucket_name: str, s3_key: str) -> bool:
+        try:
+            return self.client.path_exists_in_s3(bucket_name=bucket_name, path=s3_key)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def read_object(self, key: str, bucket_name: str) -> bytes:
+        """
+        Reads an object into memory with a single GET.
+        """
+        try:
+            return self.client.download_file(bucket=bucket_name, key=key, as_object=True)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def load_model(self, model_name: str, bucket_name: str) -> object:
+        """
+        Loads a model object from S3: a ModelBundle when the object is a bundle, otherwise the
+        unpickled model.
+        model_name: str S3 key of the model
+        """
+        try:
+            payload = self.read_object(model_name, bucket_name=bucket_name)
+            if payload[:len(BUNDLE_MAGIC)] == BUNDLE_MAGIC:
+                model = ModelBundle.from_bytes(payload)
+            else:
+                model = pickle.loads(payload)
+            logging.info(f"Loaded {model} from {model_name} ({len(payload)} bytes)")
+            return model
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def upload_file(self, from_filename: str, to_filename: str, bucket_name: str, remove: bool = True) -> None:
+        """
+        Streams a local file to S3, optionally deleting the local copy afterwards.
+        """
+        try:
+            logging.info(f"Uploading {from_filename} to {to_filename} in {bucket_name}")
+            self.client.upload_file_stream(bucket=bucket_name, key=to_filename, file_path=from_filename)
+            if remove:
+                os.remove(from_filename)
+        except Exception as e:
+            raise MyException(e, sys) from e
@@ -1,27 +1,39 @@
 import sys
+import json
 import numpy as np
 import pandas as pd
 from sklearn.preprocessing import LabelEncoder
 from sklearn.impute import SimpleImputer
 import os
+from typing import Optional
 from src.constants import TARGET_COLUMN, SCHEMA_FILE_PATH
 from src.configuration.aws_connection import buckets
-from src.entity.config_entity import DataCleaningConfig
+from src.entity.config_entity import DataCleaningConfig, ModelRegistryConfig
 from src.entity.artifact_entity import DataCleaningArtifact, DataIngestionArtifact, DataValidationArtifact
+from src.entity.model_bundle import ModelBundle
+from src.entity.model_registry import ModelRegistry
 from src.exception import MyException
 from src.logger import logging
 from src.utils.main_utils import save_object, save_numpy_array_data, read_yaml_file
+from src.utils.instrumentation import instrumented, record_rows
 
 
 class DataCleaning:
     def __init__(self, data_ingestion_artifact: DataIngestionArtifact,
                  data_cleaning_config: DataCleaningConfig,
-                 data_validation_artifact: DataValidationArtifact):
+                 data_validation_artifact: Optional[DataValidationArtifact] = None):
+        """
+        :param data_validation_artifact: validation result checked before cleaning; None when the
+                                         caller gates on validation itself, e.g. the training DAG
+                                         which cleans while validation runs
+        """
         try:
             self.data_ingestion_artifact = data_ingestion_artifact
             self.data_cleaning_config = data_cleaning_config
             self.data_validation_artifact = data_validation_artifact
             self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+            # Fitted cleaning parameters, saved so serving can clean raw records the same way
+            self._cleaning_params = {}
         except Exception as e:
             raise MyException(e, sys)
 
@@ -55,6 +67,8 @@ class DataCleaning:
             # Impute categorical features
             df[categorical_features] = categorical_imputer.fit_transform(df[categorical_features])
             logging.info("Categorical features imputed.")
+            self._cleaning_params["medians"] = dict(zip(numerical_features, numerical_imputer.statistics_.tolist()))
+            self._cleaning_params["modes"] = dict(zip(categorical_features, categorical_imputer.statistics_.tolist()))
             return df
 
         except Exception as e:
@@ -65,11 +79,15 @@ class DataCleaning:
         """Create dummy variables for categorical features."""
         logging.info("Creating dummy variables for categorical features")
         categorical_features = self._schema_config['categorical_columns']
+        # get_dummies orders levels by value and drop_first removes the lowest one
+        self._cleaning_params["dummy_levels"] = {col: [str(level) for level in sorted(df[col].unique())[1:]]
+                                                 for col in categorical_features}
         df = pd.get_dummies(df, columns=categorical_features, drop_first=True, dtype=bool)
         return df
     
     def _cap_outliers(self, df):
         numerical_features = self._schema_config['numerical_columns']
+        self._cleaning_params["caps"] = {}
         for col in numerical_features:
             Q1 = df[col].quantile(0.25)
             Q3 = df[col].quantile(0.75)
@@ -78,46 +96,93 @@ class DataCleaning:
             # Less aggressive upper bound for extrovert-related features
             upper_bound = Q3 + 2.5 * IQR if col in ['Social_event_attendance', 'Friends_circle_size', 'Post_frequency'] else Q3 + 1.5 * IQR
             df[col] = df[col].clip(lower=lower_bound, upper=upper_bound)
+            self._cleaning_params["caps"][col] = [float(lower_bound), float(upper_bound)]
         return df
 
     def _encode_target(self, df):
         target = self._schema_config['target_column']
         le = LabelEncoder()
         df[target] = le.fit_transform(df[target])
+        self._cleaning_params["target_classes"] = [str(label) for label in le.classes_]
         return df
 
+    def load_frozen_bundle(self) -> Optional[ModelBundle]:
+        """
+        In an incremental run, the bundle of the production version it updates, which holds the cleaning
+        parameters it was trained with. None when the parameters are fitted on this run's data.
+        """
+        try:
+            base_version = self.data_ingestion_artifact.base_version
+            if base_version is None:
+                return None
+            registry = ModelRegistry(ModelRegistryConfig(bucket_name=self.data_ingestion_artifact.bucket_name))
+            bundle_key = registry.read_manifest(base_version)["bundle_key"]
+            return ModelBundle.from_bytes(registry.client.download_file(bucket=self.data_ingestion_artifact.bucket_name,
+                                                                        key=bundle_key, as_object=True))
+        except Exception as e:
+            raise MyException(e, sys)
+
+    def apply_frozen_cleaning(self, df: pd.DataFrame, bundle: ModelBundle) -> pd.DataFrame:
+        """
+        Cleans new rows with the bundle's parameters the way the fitting steps would: outlier caps,
+        median / mode imputation, the dummy columns of the fitted levels and the fitted target encoding.
+        """
+        try:
+            target = self._schema_config['target_column']
+            cleaning_params = bundle.cleaning_params
+            cleaned = pd.DataFrame(bundle.clean({column: df[column].to_numpy() for column in df.columns}), index=df.index)
+            for col, levels in cleaning_params["dummy_levels"].items():
+                for level in levels:
+                    cleaned[f"{col}_{level}"] = cleaned[f"{col}_{level}"].astype(bool)
+            classes = cleaning_params["target_classes"]
+            unknown = set(df[target].astype(str)) - set(classes)
+            if unknown:
+                raise ValueError(f"Target values {sorted(unknown)} were not seen when the production model was trained")
+            cleaned[target] = df[target].astype(str).map({label: index for index, label in enumerate(classes)})
+            self._cleaning_params = cleaning_params
+            return cleaned
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    @instrumented
     def initiate_data_cleaning(self) -> DataCleaningArtifact:
         """
         Initiates the data cleaning component for the pipeline.
         """
         try:
             logging.info("Data cleaning Started !!!")
-            if not self.data_validation_artifact.validation_status:
+            if self.data_validation_artifact is not None and not self.data_validation_artifact.validation_status:
                 raise Exception(self.data_validation_artifact.message)
 
             df = self.read_data(file_path=self.data_ingestion_artifact.ingested_data_path)
+            record_rows(len(df))
             logging.info("data loaded")
 
-            logging.info("Encoding target feature")
-            df = self._encode_target(df)
-            logging.info("Target feature encoded in df.")
+            frozen_bundle = self.load_frozen_bundle()
+            if frozen_bundle is not None:
+                logging.info(f"Cleaning new rows with the parameters of production version {self.data_ingestion_artifact.base_version}")
+                df = self.apply_frozen_cleaning(df, frozen_bundle)
+            else:
+                logging.info("Encoding target feature")
+                df = self._encode_target(df)
+                logging.info("Target feature encoded in df.")
 
-            logging.info("Capping outliers in numerical features")
-            df = self._cap_outliers(df)
-            logging.info("Outliers capped in df.")
+                logging.info("Capping outliers in numerical features")
+                df = self._cap_outliers(df)
+                logging.info("Outliers capped in df.")
 
-            logging.info("Initializing transformation for data")
-            target = df[TARGET_COLUMN]
-            X = df.drop(columns=[self._schema_config['target_column']])
-            df = self.impute_missing_values(X)
-            logging.info("Transformation done end to end to df.")
+                logging.info("Initializing transformation for data")
+                target = df[TARGET_COLUMN]
+                X = df.drop(columns=[self._schema_config['target_column']])
+                df = self.impute_missing_values(X)
+                logging.info("Transformation done end to end to df.")
 
-            logging.info("Creating dummy columns for categorical features")
-            df = self._create_dummy_columns(df)
-            logging.info("Dummy columns created for df.")
+                logging.info("Creating dummy columns for categorical features")
+                df = self._create_dummy_columns(df)
+                logging.info("Dummy columns created for df.")
 
-            df = pd.concat([df, target], axis=1)
-            logging.info("Target column concatenated with df.")
+                df = pd.concat([df, target], axis=1)
+                logging.info("Target column concatenated with df.")
 
             file_path = self.data_cleaning_config.cleaned_data_file_path
             latest_file_path = self.data_cleaning_config.latest_data_file_path
@@ -130,11 +195,17 @@ class DataCleaning:
 
             df.to_csv(file_path, index=False, header = True)
             df.to_csv(latest_file_path, index=False, header = True)
+            for params_file_path in (self.data_cleaning_config.cleaning_params_file_path,
+                                     self.data_cleaning_config.latest_cleaning_params_file_path):
+                with open(params_file_path, "w") as params_file:
+                    json.dump(self._cleaning_params, params_file, indent=4)
+            logging.info(f"Cleaning parameters saved: {self._cleaning_params}")
             client.upload_file(bucket=self.data_ingestion_artifact.bucket_name, key = self.data_cleaning_config.latest_data_file_path, file_path=file_path)
 
             # logging.info("Data cleaning completed successfully")
             return DataCleaningArtifact(
-                cleaned_data_file_path = self.data_cleaning_config.cleaned_data_file_path
+                cleaned_data_file_path = self.data_cleaning_config.cleaned_data_file_path,
+                cleaning_params_file_path = self.data_cleaning_config.cleaning_params_file_path
             )
             
 
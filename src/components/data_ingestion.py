@@ -2,12 +2,19 @@ import os
 import sys
 from pandas import DataFrame
 from src.configuration.aws_connection import buckets
-from src.entity.config_entity import DataIngestionConfig
+from src.constants import MODEL_CONFIG_FILE_PATH
+from src.entity.config_entity import DataIngestionConfig, ModelRegistryConfig
 from src.entity.artifact_entity import DataIngestionArtifact
+from src.entity.feature_plan import FeaturePlan
+from src.entity.model_registry import ModelRegistry
 from src.exception import MyException
 from src.logger import logging
 from src.data_access.data import Data
+from src.utils.main_utils import read_yaml_file
+from src.utils.training_state import read_training_state, is_full_retrain_due
+from src.utils.instrumentation import instrumented, record_rows
 from io import StringIO
+from typing import Optional, Tuple
 
 class DataIngestion:
     def __init__(self,data_ingestion_config:DataIngestionConfig=DataIngestionConfig()):
@@ -16,21 +23,89 @@ class DataIngestion:
         """
         try:
             self.data_ingestion_config = data_ingestion_config
+            self._model_config = read_yaml_file(file_path=MODEL_CONFIG_FILE_PATH)
         except Exception as e:
             raise MyException(e,sys)
 
-    def export_data_into_feature_store(self)->DataFrame:
+    def plan_incremental_run(self, training_state: dict, base_version: Optional[str]) -> Optional[str]:
+        """
+        Method Name :   plan_incremental_run
+        Description :   In incremental training mode, decides whether this run updates the production
+                        version on the documents inserted after its watermark. It does unless a full
+                        retrain is due, the production model was not trained in incremental mode, or it
+                        has no bundle and feature state to clean and transform the new rows with, or the
+                        feature spec changed since it was trained
+
+        Output      :   Returns the production version to update, or None when all data is retrained on
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            training_config = self._model_config.get("model_trainer", {})
+            if training_config.get("mode") != "incremental" or base_version is None:
+                return None
+            if training_state.get("mode") != "incremental" or not training_state.get("watermark"):
+                logging.info(f"Production version {base_version} was not trained incrementally, retraining on all data")
+                return None
+            if is_full_retrain_due(training_state, training_config.get("incremental", {})):
+                return None
+            manifest = ModelRegistry(ModelRegistryConfig(bucket_name=self.data_ingestion_config.bucket_name)).read_manifest(base_version)
+            if not manifest.get("bundle_key") or not manifest.get("feature_state_key"):
+                logging.info(f"Production version {base_version} has no bundle or feature state, retraining on all data")
+                return None
+            if manifest.get("feature_version") != FeaturePlan.from_config(self._model_config).version:
+                logging.info("Feature spec changed since the production model was trained, retraining on all data")
+                return None
+            return base_version
+        except Exception as e:
+            raise MyException(e, sys)
+
+    def split_new_partition(self, dataframe: DataFrame, previous_watermark: Optional[str]) -> Tuple[DataFrame, int, Optional[str]]:
+        """
+        Method Name :   split_new_partition
+        Description :   This method orders records by their mongodb _id and counts the documents inserted
+                        after the watermark of the production model; all of them when only those were read
+        
+        Output      :   Returns the ordered dataframe, the number of new rows and the new watermark
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            if "_id" not in dataframe.columns:
+                return dataframe, len(dataframe), None
+
+            # ObjectIds start with their creation time, so their hex strings sort by insertion order
+            ids = dataframe["_id"].astype(str)
+            order = ids.argsort(kind="stable")
+            dataframe, ids = dataframe.iloc[order].reset_index(drop=True), ids.iloc[order].reset_index(drop=True)
+
+            new_row_count = int((ids > previous_watermark).sum()) if previous_watermark else len(dataframe)
+            watermark = ids.iloc[-1] if len(ids) else previous_watermark
+            logging.info(f"{new_row_count} rows ingested after watermark {previous_watermark}")
+            return dataframe, new_row_count, watermark
+        except Exception as e:
+            raise MyException(e, sys)
+
+    def export_data_into_feature_store(self, previous_watermark: Optional[str] = None, new_rows_only: bool = False,
+                                       min_rows: int = 0) -> Tuple[int, Optional[str]]:
         """
         Method Name :   export_data_into_feature_store
-        Description :   This method imports data from mongodb to csv file, and then uploads it to S3 bucket
+        Description :   This method imports data from mongodb to csv file, and then uploads it to S3 bucket.
+                        With new_rows_only, only the documents after previous_watermark are read, and
+                        there must be at least min_rows of them
         
-        Output      :   data is stored in csv file in S3 bucket
+        Output      :   data is stored in csv file in S3 bucket, returns the new row count and watermark
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
             logging.info(f"Importing data from mongodb")
             my_data = Data()
-            dataframe = my_data.export_collection_as_dataframe(database_name=self.data_ingestion_config.database_name, collection_name=self.data_ingestion_config.collection_name)
+            dataframe = my_data.export_collection_as_dataframe(database_name=self.data_ingestion_config.database_name, collection_name=self.data_ingestion_config.collection_name,
+                                                               after_id=previous_watermark if new_rows_only else None)
+            record_rows(len(dataframe))
+            if len(dataframe) < min_rows:
+                raise Exception(f"Only {len(dataframe)} documents were inserted after watermark {previous_watermark}, "
+                                f"fewer than the {min_rows} of model_trainer.incremental.min_new_rows needed to "
+                                f"update and evaluate the production model")
+            dataframe, new_row_count, watermark = self.split_new_partition(dataframe, previous_watermark)
             if "_id" in dataframe.columns:
                 dataframe.drop(columns=["_id"], inplace=True)
             logging.info(f"Shape of dataframe: {dataframe.shape}")
@@ -48,11 +123,13 @@ class DataIngestion:
             dataframe.to_csv(latest_file_path, index=False, header = True)
             client.upload_file(bucket=self.data_ingestion_config.bucket_name, key = self.data_ingestion_config.latest_data_file_path, file_path=file_path)
             logging.info(f"Data exported to {file_path} in S3 bucket {self.data_ingestion_config.bucket_name}")
+            return new_row_count, watermark
 
         except Exception as e:
             logging.error(f"Error in exporting data to feature store: {e}")
             raise MyException(e,sys)
 
+    @instrumented
     def initiate_data_ingestion(self) ->DataIngestionArtifact:
         """
         Method Name :   initiate_data_ingestion
@@ -64,7 +141,13 @@ class DataIngestion:
         logging.info("Entered initiate_data_ingestion method of Data_Ingestion class")
 
         try:
-            self.export_data_into_feature_store()
+            # The training state is read once, so every later stage works from the same production version
+            training_state, production_version = read_training_state(self.data_ingestion_config.bucket_name)
+            base_version = self.plan_incremental_run(training_state, production_version)
+            min_new_rows = int(self._model_config.get("model_trainer", {}).get("incremental", {}).get("min_new_rows", 1))
+            new_row_count, watermark = self.export_data_into_feature_store(previous_watermark=training_state.get("watermark"),
+                                                                           new_rows_only=base_version is not None,
+                                                                           min_rows=min_new_rows if base_version is not None else 0)
 
             logging.info("Got the data from mongodb and exported it to feature store")
 
@@ -73,7 +156,9 @@ class DataIngestion:
             )
         
             data_ingestion_artifact = DataIngestionArtifact(
-                ingested_data_path=self.data_ingestion_config.data_file_path, bucket_name=self.data_ingestion_config.bucket_name
+                ingested_data_path=self.data_ingestion_config.data_file_path, bucket_name=self.data_ingestion_config.bucket_name,
+                new_row_count=new_row_count, watermark=watermark,
+                base_version=base_version, training_state=training_state
             )
             return data_ingestion_artifact
         except Exception as e:
@@ -9,6 +9,7 @@ from pandas import DataFrame
 from src.exception import MyException
 from src.logger import logging
 from src.utils.main_utils import read_yaml_file
+from src.utils.instrumentation import instrumented, record_rows
 from src.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact
 from src.entity.config_entity import DataValidationConfig
 from src.constants import SCHEMA_FILE_PATH
@@ -88,6 +89,7 @@ class DataValidation:
         except Exception as e:
             raise MyException(e, sys)
         
+    @instrumented
     def initiate_data_validation(self) -> DataValidationArtifact:
         """
         Method Name :   initiate_data_validation
@@ -101,6 +103,7 @@ class DataValidation:
             validation_error_msg = ""
             logging.info("Starting data validation")
             df = DataValidation.load_data(file_path=self.data_ingestion_artifact.ingested_data_path)
+            record_rows(len(df))
 
             # Checking col len of dataframe for df
             status = self.validate_number_of_columns(dataframe=df)
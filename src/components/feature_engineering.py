@@ -1,16 +1,19 @@
 import sys
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import PolynomialFeatures, StandardScaler
+from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
 import os
 from src.configuration.aws_connection import buckets
-from src.constants import TARGET_COLUMN, SCHEMA_FILE_PATH
-from src.entity.config_entity import FeatureEngineeringConfig
+from src.constants import TARGET_COLUMN, SCHEMA_FILE_PATH, MODEL_CONFIG_FILE_PATH
+from src.entity.config_entity import FeatureEngineeringConfig, ModelRegistryConfig
 from src.entity.artifact_entity import FeatureEngineeringArtifact, DataIngestionArtifact, DataCleaningArtifact
+from src.entity.feature_plan import FeaturePlan
+from src.entity.model_registry import ModelRegistry
 from src.exception import MyException
 from src.logger import logging
-from src.utils.main_utils import save_object, save_numpy_array_data, read_yaml_file
+from src.utils.main_utils import save_object, save_numpy_array_data, read_yaml_file, stable_test_mask
+from src.utils.instrumentation import instrumented, record_rows
 import pickle
 
 class FeatureEngineering:
@@ -22,6 +25,7 @@ class FeatureEngineering:
             self.feature_engineering_config = feature_engineering_config
             self.data_cleaning_artifact = data_cleaning_artifact
             self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+            self._model_config = read_yaml_file(file_path=MODEL_CONFIG_FILE_PATH)
         except Exception as e:
             raise MyException(e, sys)
 
@@ -32,58 +36,94 @@ class FeatureEngineering:
         except Exception as e:
             raise MyException(e, sys)
 
-    def train_test_split(self, df: pd.DataFrame):
+    def train_test_split(self, df: pd.DataFrame, raw: pd.DataFrame):
         try:
             X = df.drop(columns=[self._schema_config['target_column']])
             y = df[self._schema_config['target_column']]
+            if self._model_config.get("model_trainer", {}).get("mode") == "incremental":
+                # Rows keep their side of the split from run to run, so rows the production model was
+                # trained on never land in a later test set. The split is keyed on the raw row, as the
+                # cleaned values change with the cleaning parameters and an incremental run reads
+                # only the new rows
+                is_test = stable_test_mask(self.row_keys(raw), self.feature_engineering_config.split_size)
+                return X[~is_test], X[is_test], y[~is_test], y[is_test]
             X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=self.feature_engineering_config.split_size, stratify=y, random_state=42)
             return X_train, X_test, y_train, y_test
         except Exception as e:
             raise MyException(e, sys)
 
-    def interaction_feature_engineering(self, X_train: pd.DataFrame, X_test: pd.DataFrame) -> pd.DataFrame:
+    def row_keys(self, raw: pd.DataFrame) -> np.array:
+        """
+        64-bit hash of each raw row. Numerical columns are hashed as floats and the others as strings,
+        so the key does not depend on the dtypes pandas happened to infer for this run's rows.
+        """
         try:
-            X_train['Alone_to_Social_Ratio'] = X_train['Time_spent_Alone'] / (X_train['Social_event_attendance'] + 1)
-            X_test['Alone_to_Social_Ratio'] = X_test['Time_spent_Alone'] / (X_test['Social_event_attendance'] + 1)
-            X_train['Social_Comfort_Index'] = (X_train['Friends_circle_size'] + X_train['Post_frequency'] - X_train['Stage_fear_Yes']) / 3
-            X_test['Social_Comfort_Index'] = (X_test['Friends_circle_size'] + X_test['Post_frequency'] - X_test['Stage_fear_Yes']) / 3
-            X_train['Social_Overload'] = X_train['Drained_after_socializing_Yes'] * X_train['Social_event_attendance']
-            X_test['Social_Overload'] = X_test['Drained_after_socializing_Yes'] * X_test['Social_event_attendance']
-            return X_train, X_test
+            numerical_columns = self._schema_config['numerical_columns']
+            normalized = raw.astype({column: np.float64 for column in numerical_columns})
+            other_columns = [column for column in raw.columns if column not in numerical_columns]
+            normalized[other_columns] = normalized[other_columns].astype(str)
+            return pd.util.hash_pandas_object(normalized, index=False).to_numpy()
         except Exception as e:
             raise MyException(e, sys)
-        
-    def binned_feature_engineering(self, X_train: pd.DataFrame, X_test: pd.DataFrame, time_alone_bins) -> pd.DataFrame:
+
+    def scaler(self, X_train: pd.DataFrame, X_test: pd.DataFrame) -> pd.DataFrame:
         try:
-            X_train['Time_spent_Alone_Binned'] = pd.cut(X_train['Time_spent_Alone'], bins=time_alone_bins, labels=['Low', 'Medium', 'High'], include_lowest=True)
-            X_test['Time_spent_Alone_Binned'] = pd.cut(X_test['Time_spent_Alone'], bins=time_alone_bins, labels=['Low', 'Medium', 'High'], include_lowest=True)
-            X_train = pd.get_dummies(X_train, columns=['Time_spent_Alone_Binned'], drop_first=True)
-            X_test = pd.get_dummies(X_test, columns=['Time_spent_Alone_Binned'], drop_first=True)
-            return X_train, X_test
+            scaler = StandardScaler()
+            X_train_scaled = scaler.fit_transform(X_train)
+            X_test_scaled = scaler.transform(X_test)
+            return X_train_scaled, X_test_scaled, scaler
         except Exception as e:
             raise MyException(e, sys)
     
-    def polynomial_feature_engineering(self, X_train: pd.DataFrame, X_test: pd.DataFrame) -> pd.DataFrame:
+    def slice_columns(self, df: pd.DataFrame) -> list:
+        """
+        Cleaned columns that define the evaluation slices (model_evaluation.slices). They are carried
+        through from the cleaned data because the feature plan may not select them as features.
+        """
         try:
-            poly = PolynomialFeatures(degree=2, include_bias=False, interaction_only=True)
-            poly_features_train = poly.fit_transform(X_train[['Time_spent_Alone', 'Social_event_attendance', 'Friends_circle_size']])
-            poly_features_test = poly.transform(X_test[['Time_spent_Alone', 'Social_event_attendance', 'Friends_circle_size']])
-            poly_feature_names = poly.get_feature_names_out(['Time_spent_Alone', 'Social_event_attendance', 'Friends_circle_size'])
-            X_train[poly_feature_names] = poly_features_train
-            X_test[poly_feature_names] = poly_features_test
-            return X_train, X_test, poly
+            slices = list(self._model_config.get("model_evaluation", {}).get("slices") or [])
+            missing = [column for column in slices if column not in df.columns]
+            if missing:
+                raise ValueError(f"Slice columns in model_evaluation.slices are not in the cleaned data: {missing}; "
+                                 f"cleaned columns are {list(df.columns)}")
+            return slices
         except Exception as e:
             raise MyException(e, sys)
-    
-    def scaler(self, X_train: pd.DataFrame, X_test: pd.DataFrame) -> pd.DataFrame:
+
+    def save_test_rows(self, raw: pd.DataFrame, test_index: pd.Index, y_test: pd.Series) -> None:
+        """
+        Saves the raw input columns of the test rows, in test matrix order, with their encoded target.
+        Evaluation scores the production model on them through its own bundle, i.e. with the cleaning
+        parameters, feature plan and scaler it was trained with rather than the ones fitted in this run.
+        """
         try:
-            scaler = StandardScaler()
-            X_train_scaled = scaler.fit_transform(X_train)
-            X_test_scaled = scaler.transform(X_test)
-            return X_train_scaled, X_test_scaled, scaler
+            input_columns = self._schema_config['numerical_columns'] + self._schema_config['categorical_columns']
+            test_rows = raw.loc[test_index, input_columns].assign(**{TARGET_COLUMN: y_test.to_numpy()})
+            os.makedirs(os.path.dirname(self.feature_engineering_config.test_rows_file_path), exist_ok=True)
+            test_rows.to_csv(self.feature_engineering_config.test_rows_file_path, index=False)
         except Exception as e:
             raise MyException(e, sys)
-    
+
+    def load_frozen_feature_state(self):
+        """
+        In an incremental run, returns the fitted feature plan and scaler of the production version
+        ingestion planned to update, so the new rows are transformed into the feature space that model
+        was trained in. They are stored with the version when it is promoted. Returns None when all
+        data is retrained on.
+        """
+        try:
+            base_version = self.data_ingestion_artifact.base_version
+            if base_version is None:
+                return None
+            registry = ModelRegistry(ModelRegistryConfig(bucket_name=self.data_ingestion_artifact.bucket_name))
+            feature_state = registry.load_feature_state(registry.read_manifest(base_version))
+            if feature_state is None:
+                raise Exception(f"Production version {base_version} has no feature state")
+            return feature_state["feature_plan"], feature_state["scaler"]
+        except Exception as e:
+            raise MyException(e, sys)
+
+    @instrumented
     def initiate_feature_engineering(self) -> FeatureEngineeringArtifact:
         """
         Initiates the feature engineering component for the pipeline.
@@ -91,29 +131,41 @@ class FeatureEngineering:
         try:
             logging.info("Feature Engineering Started !!!")
             df = self.read_data(file_path=self.data_cleaning_artifact.cleaned_data_file_path)
+            record_rows(len(df))
+            # The ingested rows the cleaned ones came from, row for row
+            raw = self.read_data(file_path=self.data_ingestion_artifact.ingested_data_path)
+            if len(raw) != len(df):
+                raise ValueError(f"Ingested data has {len(raw)} rows but the cleaned data {len(df)}")
             logging.info("Data loaded successfully")
-
-            logging.info("Computing time spent alone bins")
-            time_alone_bins = pd.qcut(df['Time_spent_Alone'], q=3, retbins=True)[1]
+            slice_columns = self.slice_columns(df)
+
+            frozen_state = self.load_frozen_feature_state()
+            if frozen_state is None:
+                logging.info("Compiling feature plan from model config")
+                feature_plan = FeaturePlan.from_config(self._model_config)
+                feature_plan.fit(df)
+                logging.info(f"Feature plan fitted: {feature_plan}")
+            else:
+                feature_plan, frozen_scaler = frozen_state
+                logging.info(f"Reusing feature parameters of production version {self.data_ingestion_artifact.base_version}: {feature_plan}")
 
             logging.info("Splitting data into train and test sets")
-            X_train, X_test, y_train, y_test = self.train_test_split(df)
+            X_train, X_test, y_train, y_test = self.train_test_split(df, raw)
             logging.info("Train-test split completed")
+            self.save_test_rows(raw, X_test.index, y_test)
+            X_test[slice_columns].to_csv(self.feature_engineering_config.test_slices_file_path, index=False)
 
-            logging.info("Creating interaction features")
-            X_train, X_test = self.interaction_feature_engineering(X_train, X_test)
-            logging.info("Interaction features engineered")
-
-            logging.info("Creating binned features")
-            X_train, X_test = self.binned_feature_engineering(X_train, X_test, time_alone_bins)
-            logging.info("Binned features engineered")
-
-            logging.info("Applying polynomial feature engineering")
-            X_train, X_test, poly = self.polynomial_feature_engineering(X_train, X_test)
-            logging.info("Polynomial features engineered")
+            logging.info("Computing engineered features")
+            X_train = feature_plan.transform(X_train)
+            X_test = feature_plan.transform(X_test)
+            logging.info("Engineered features computed")
 
             logging.info("Scaling data")
-            X_train_scaled, X_test_scaled, scaler = self.scaler(X_train, X_test)
+            if frozen_state is None:
+                X_train_scaled, X_test_scaled, scaler = self.scaler(X_train, X_test)
+            else:
+                scaler = frozen_scaler
+                X_train_scaled, X_test_scaled = scaler.transform(X_train), scaler.transform(X_test)
             logging.info("Data scaled")
 
             train_arr = np.c_[X_train_scaled, np.array(y_train)]
@@ -136,6 +188,11 @@ class FeatureEngineering:
             save_numpy_array_data(file_path=latest_train_file_path, array=train_arr)
             save_numpy_array_data(file_path=latest_test_file_path, array=test_arr)
             logging.info("Transformed data saved successfully")
+            # An incremental run ingested only the rows after the production watermark, so its whole
+            # training split is the partition the production model is updated on
+            partition_file_path = train_file_path if frozen_state is not None else None
+            if partition_file_path is not None:
+                logging.info(f"{len(train_arr)} new training rows in this partition")
 
             client = buckets()
             logging.info("Uploading transformed data to S3 bucket")
@@ -146,15 +203,20 @@ class FeatureEngineering:
             feature_engineering_artifact = FeatureEngineeringArtifact(
                 train_file_path=train_file_path,
                 test_file_path=test_file_path,
-                time_alone_bins = time_alone_bins,
+                feature_plan = feature_plan,
                 scaler = scaler,
-                poly_features = poly
+                partition_file_path = partition_file_path,
+                watermark = self.data_ingestion_artifact.watermark,
+                base_version = self.data_ingestion_artifact.base_version if frozen_state is not None else None,
+                training_state = self.data_ingestion_artifact.training_state,
+                test_rows_file_path = self.feature_engineering_config.test_rows_file_path,
+                test_slices_file_path = self.feature_engineering_config.test_slices_file_path
             )
 
             client.upload_file(bucket=self.data_ingestion_artifact.bucket_name, key=self.feature_engineering_config.artifact_dir, body=pickle.dumps(feature_engineering_artifact))
             logging.info("Feature Engineering completed successfully")
             return feature_engineering_artifact
         except Exception as e:
-            logging.exception("Exception occurred in initiate_feature_engineering method of DataTransformation class")
+            logging.exception("Exception occurred in initiate_feature_engineering method of FeatureEngineering class")
             raise MyException(e, sys) from e
         
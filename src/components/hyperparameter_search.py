@@ -0,0 +1,201 @@
+import os
+import sys
+import math
+import time
+import queue
+import itertools
+import multiprocessing
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from src.exception import MyException
+from src.logger import logging
+from src.utils.estimator_factory import build_estimator
+from src.utils.metrics import METRIC_NAMES, confusion_counts, metrics_from_counts
+
+
+def _split_indices(n_rows: int, validation_fraction: float, random_state: int):
+    """Deterministic train/validation split of the training matrix rows, identical in every worker."""
+    permutation = np.random.default_rng(random_state).permutation(n_rows)
+    n_validation = max(1, int(n_rows * validation_fraction))
+    return permutation[n_validation:], permutation[:n_validation]
+
+
+def _fit_and_score(estimator_name: str, params: dict, train_file_path: str, n_samples: int,
+                   validation_fraction: float, scoring: str, random_state: int) -> dict:
+    """
+    Worker task: fits one candidate on the first n_samples rows of the shuffled training pool
+    and scores it on the validation rows. The training matrix is memory-mapped, so workers
+    share the page cache instead of receiving pickled copies.
+    """
+    train = np.load(train_file_path, mmap_mode="r")
+    pool_idx, validation_idx = _split_indices(train.shape[0], validation_fraction, random_state)
+    fit_idx = np.sort(pool_idx[:n_samples])
+    x_fit, y_fit = train[fit_idx, :-1], train[fit_idx, -1]
+    validation = train[np.sort(validation_idx)]
+
+    model = build_estimator(estimator_name, params)
+    start = time.perf_counter()
+    model.fit(x_fit, y_fit)
+    fit_time = time.perf_counter() - start
+    score = metrics_from_counts(confusion_counts(validation[:, -1], model.predict(validation[:, :-1])))[scoring]
+    return {"score": float(score), "fit_time": fit_time}
+
+
+class HyperparameterSearch:
+    """
+    Successive-halving hyperparameter search driven by the ``model_trainer.search`` section
+    of config/model.yaml.
+
+    Every rung evaluates the surviving candidates in parallel on a growing subset of the
+    training rows and keeps the best 1/halving_factor of them, so weak candidates are cut
+    while they are still cheap to train. The search stops at the wall-clock budget and
+    returns the best candidate of the last completed rung.
+    """
+
+    def __init__(self, search_config: dict, train_file_path: str):
+        """
+        :param search_config: ``model_trainer.search`` section of the model config
+        :param train_file_path: path to the .npy training matrix (target in the last column)
+        """
+        try:
+            self.search_config = search_config
+            self.train_file_path = train_file_path
+            self.estimator_name = search_config.get("estimator", "logistic_regression")
+            self.scoring = search_config.get("scoring", "f1")
+            self.halving_factor = int(search_config.get("halving_factor", 3))
+            self.min_samples = int(search_config.get("min_samples", 500))
+            self.validation_fraction = float(search_config.get("validation_fraction", 0.2))
+            self.time_budget = float(search_config.get("time_budget_seconds", 300))
+            self.random_state = int(search_config.get("random_state", 42))
+            n_jobs = int(search_config.get("n_jobs", -1))
+            self.n_jobs = os.cpu_count() if n_jobs <= 0 else n_jobs
+            if self.scoring not in METRIC_NAMES:
+                raise ValueError(f"Unknown scoring '{self.scoring}', expected one of {METRIC_NAMES}")
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def get_candidates(self) -> List[dict]:
+        """
+        Expands the configured param_space into candidate parameter sets. The grid strategy
+        takes the full cartesian product; the random strategy samples n_candidates points,
+        drawing list entries uniformly and {low, high, log} ranges from a (log-)uniform distribution.
+        """
+        try:
+            space = self.search_config["param_space"]
+            strategy = self.search_config.get("strategy", "grid")
+            if strategy == "grid":
+                names = list(space)
+                return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+            if strategy == "random":
+                rng = np.random.default_rng(self.random_state)
+                candidates = []
+                for _ in range(int(self.search_config.get("n_candidates", 20))):
+                    params = {}
+                    for name, values in space.items():
+                        if isinstance(values, dict):
+                            low, high = float(values["low"]), float(values["high"])
+                            if values.get("log", False):
+                                params[name] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+                            else:
+                                params[name] = float(rng.uniform(low, high))
+                        else:
+                            params[name] = values[rng.integers(len(values))]
+                    candidates.append(params)
+                return candidates
+
+            raise ValueError(f"Unknown search strategy '{strategy}', expected 'grid' or 'random'")
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def run(self) -> tuple:
+        """
+        Runs the search.
+
+        Output      :   Returns (best params, leaderboard dataframe sorted best first)
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            deadline = time.monotonic() + self.time_budget
+            n_rows = np.load(self.train_file_path, mmap_mode="r").shape[0]
+            n_pool = n_rows - max(1, int(n_rows * self.validation_fraction))
+
+            candidates = self.get_candidates()
+            survivors = list(range(len(candidates)))
+            n_samples = min(self.min_samples, n_pool)
+            rung = 0
+            records = []
+            logging.info(f"Hyperparameter search: {len(candidates)} candidates, {self.n_jobs} workers, "
+                         f"{self.time_budget}s budget")
+
+            # A Pool rather than a ProcessPoolExecutor: its workers can be terminated, so fits still
+            # running at the deadline stop instead of finishing unobserved
+            pool = multiprocessing.Pool(processes=self.n_jobs)
+            # (candidate, result, error) of each finished evaluation, put by the pool's result thread
+            finished = queue.Queue()
+            budget_exhausted = False
+            try:
+                while True:
+                    for idx in survivors:
+                        pool.apply_async(_fit_and_score,
+                                         (self.estimator_name, candidates[idx], self.train_file_path, n_samples,
+                                          self.validation_fraction, self.scoring, self.random_state),
+                                         callback=lambda result, idx=idx: finished.put((idx, result, None)),
+                                         error_callback=lambda error, idx=idx: finished.put((idx, None, error)))
+                    scores = {}
+                    n_pending = len(survivors)
+                    while n_pending and time.monotonic() < deadline:
+                        try:
+                            idx, result, error = finished.get(timeout=max(0.0, deadline - time.monotonic()))
+                        except queue.Empty:
+                            break
+                        n_pending -= 1
+                        if error is not None:
+                            # One invalid parameter combination does not abort the search
+                            logging.warning(f"Candidate {candidates[idx]} failed on {n_samples} rows: {error}")
+                            result = {"score": float("-inf"), "error": f"{type(error).__name__}: {error}"}
+                        else:
+                            scores[idx] = result["score"]
+                        records.append({"candidate": idx, "rung": rung, "n_samples": n_samples,
+                                        "params": candidates[idx], **result})
+
+                    if n_pending:
+                        budget_exhausted = True
+                        logging.info(f"Search budget exhausted during rung {rung}, "
+                                     f"{n_pending} evaluations abandoned")
+                    if not scores:
+                        break
+                    ranked = sorted(scores, key=scores.get, reverse=True)
+                    survivors = ranked[:max(1, math.ceil(len(ranked) / self.halving_factor))]
+                    logging.info(f"Rung {rung}: {len(scores)} candidates on {n_samples} rows, "
+                                 f"best {self.scoring}={scores[ranked[0]]:.4f}")
+                    if n_pending or len(survivors) == 1 or n_samples >= n_pool:
+                        break
+                    n_samples = min(n_samples * self.halving_factor, n_pool)
+                    rung += 1
+            finally:
+                if budget_exhausted:
+                    pool.terminate()
+                else:
+                    pool.close()
+                pool.join()
+
+            if not records:
+                raise Exception("Hyperparameter search budget expired before any candidate finished")
+            if not any("error" not in record for record in records):
+                raise Exception(f"Every hyperparameter candidate failed, first error: {records[0]['error']}")
+
+            leaderboard = pd.DataFrame(records)
+            leaderboard["params"] = leaderboard["params"].astype(str)
+            # Candidates that reached the furthest rung rank first, then by score; failed evaluations last
+            leaderboard = leaderboard.assign(failed=~np.isfinite(leaderboard["score"])) \
+                .sort_values(["failed", "rung", "score"], ascending=[True, False, False]) \
+                .drop(columns="failed").reset_index(drop=True)
+            best_params = candidates[int(leaderboard.loc[0, "candidate"])]
+            logging.info(f"Best hyperparameters: {best_params}")
+            return best_params, leaderboard
+        except Exception as e:
+            raise MyException(e, sys) from e
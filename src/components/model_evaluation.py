@@ -1,23 +1,30 @@
-from src.entity.config_entity import ModelEvaluationConfig
+from src.entity.config_entity import ModelEvaluationConfig, ModelRegistryConfig
+from src.entity.model_bundle import ModelBundle
+from src.entity.model_registry import ModelRegistry
 from src.entity.artifact_entity import ModelTrainerArtifact, ModelEvaluationArtifact, FeatureEngineeringArtifact
-from sklearn.metrics import f1_score
 from src.exception import MyException
-from src.constants import TARGET_COLUMN
+from src.constants import TARGET_COLUMN, MODEL_CONFIG_FILE_PATH
 from src.logger import logging
-from src.utils.main_utils import load_object
+from src.utils.main_utils import load_object, read_yaml_file, file_fingerprint, read_numpy_array_header, save_numpy_array_data
+from src.utils.instrumentation import instrumented, record_rows
+from src.utils.metrics import get_classification_metrics_from_counts, metrics_from_counts, win_probability
+from src.utils.score_cache import read_champion_scores, write_champion_scores
+from src.components.streaming_evaluator import StreamingEvaluator
 import sys
+import hashlib
+from typing import Optional, Tuple
 import pandas as pd
 from dataclasses import dataclass
 from src.configuration.aws_connection import buckets
-import pickle 
-from src.utils.main_utils import load_numpy_array_data
 
 @dataclass
 class EvaluateModelResponse:
-    trained_model_f1_score: float
-    best_model_f1_score: float
+    trained_model_score: float
+    best_model_score: float
     is_model_accepted: bool
     difference: float
+    win_probability: float
+    slice_regressions: dict
 
 
 class ModelEvaluation:
@@ -29,29 +36,110 @@ class ModelEvaluation:
             self.model_eval_config = model_eval_config
             self.model_trainer_artifact = model_trainer_artifact
             self.feature_engineering_artifact = feature_engineering_artifact
+            model_config = read_yaml_file(file_path=MODEL_CONFIG_FILE_PATH)
+            self._evaluation_config = model_config.get("model_evaluation", {})
+            self._metrics_config = model_config.get("metrics", {})
         except Exception as e:
             raise MyException(e, sys) from e
 
-    def get_best_model(self):
+    def get_best_model(self) -> Tuple[Optional[dict], Optional[str]]:
         """
         Method Name :   get_best_model
         Description :   This function is used to get model from production stage.
+                        It reads the registry's production pointer, which names the production
+                        model and its serving bundle
         
-        Output      :   Returns model object if available in s3 storage
+        Output      :   Returns (production pointer or None, ETag of the production pointer)
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            registry = ModelRegistry(ModelRegistryConfig(bucket_name=self.model_eval_config.bucket_name))
+            return registry.read_production_pointer()
+        except Exception as e:
+            raise  MyException(e,sys)
+
+    def score_models(self, test_fingerprint: str, champion: Optional[dict]) -> dict:
+        """
+        Method Name :   score_models
+        Description :   This function scores the challenger on the test matrix, and the production model
+                        when its scores on this test set are not cached, in a single streaming pass. The
+                        production model is scored through its bundle on the raw test rows, so with the
+                        cleaning parameters, feature plan and scaler it was trained with. Cached champion
+                        scores are keyed by the model object's ETag and the fingerprint of the raw test
+                        rows, so the bundle is only downloaded on a cache miss. The cache also holds the
+                        champion's prediction of every test row, so both models' predictions are counted
+                        jointly for the paired bootstrap either way
+        
+        Output      :   Returns {"challenger": scores, "champion": scores or None, "paired": joint counts
+                        or None}, where scores hold the overall and per-slice confusion counts
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
             bucket_name = self.model_eval_config.bucket_name
-            model_path=self.model_trainer_artifact.trained_model_file_path
+            models = {"challenger": load_object(self.model_trainer_artifact.trained_model_file_path)}
+            bundles = {}
+            champion_scores, champion_predictions = None, None
             buck = buckets()
+            if champion is not None and not champion.get("bundle_key"):
+                logging.warning(f"Production version {champion['version']} has no model bundle, so it cannot be scored in "
+                                f"the feature space it was trained in; evaluating the challenger on its own.")
+                champion = None
+            if champion is not None:
+                champion_model_key = champion["model_key"]
+                logging.info(f"Best model found in production stage at {champion_model_key}, looking up its scores for evaluation.")
+                model_etag = buck.head_object(bucket=bucket_name, key=champion_model_key)["ETag"]
+                champion_scores, champion_predictions = read_champion_scores(buck, bucket_name, champion_model_key,
+                                                                             model_etag, test_fingerprint)
+                if isinstance(champion_scores, dict):
+                    logging.info("Champion scores found in cache, skipping re-scoring.")
+                else:
+                    logging.info("No cached champion scores for this model and test set, re-scoring the production bundle.")
+                    bundles["champion"] = ModelBundle.from_bytes(buck.download_file(bucket=bucket_name, key=champion["bundle_key"],
+                                                                                    as_object=True))
 
-            if buck.path_exists_in_s3(bucket_name=bucket_name, path=model_path):
-                return True
-            return None
+            evaluator = StreamingEvaluator(models=models,
+                                           slice_features=self._evaluation_config.get("slices"),
+                                           block_rows=int(self._evaluation_config.get("block_rows", 100000)),
+                                           known_predictions={"champion": champion_predictions} if champion_predictions is not None else None,
+                                           pair=("challenger", "champion") if champion is not None else None,
+                                           bundles=bundles)
+            scores = evaluator.run(self.feature_engineering_artifact.test_file_path,
+                                   rows_file_path=self.feature_engineering_artifact.test_rows_file_path,
+                                   slices_file_path=self.feature_engineering_artifact.test_slices_file_path)
+            if "champion" in scores:
+                champion_scores = scores["champion"]
+                write_champion_scores(buck, bucket_name, champion_model_key, model_etag, test_fingerprint, champion_scores,
+                                      predictions=evaluator.predictions["champion"])
+            save_numpy_array_data(self.model_eval_config.predictions_file_path, evaluator.predictions["challenger"])
+            paired = scores["challenger"].pop("paired", {}).get("champion")
+            return {"challenger": scores["challenger"], "champion": champion_scores, "paired": paired}
         except Exception as e:
-            raise  MyException(e,sys)
+            raise MyException(e, sys) from e
 
-    def evaluate_model(self) -> EvaluateModelResponse:
+    def get_slice_regressions(self, challenger_scores: dict, champion_scores: dict, metric: str) -> dict:
+        """
+        Compares the challenger with the champion on every slice level both were scored on.
+
+        Output      :   Returns {"feature=level": champion metric - challenger metric} for the levels
+                        where the challenger is worse by more than max_slice_regression
+        """
+        try:
+            max_regression = float(self._evaluation_config.get("max_slice_regression", 0.05))
+            min_rows = int(self._evaluation_config.get("min_slice_rows", 30))
+            regressions = {}
+            for feature, levels in challenger_scores["slices"].items():
+                champion_levels = champion_scores.get("slices", {}).get(feature, {})
+                for level, counts in levels.items():
+                    if level not in champion_levels or sum(counts) < min_rows:
+                        continue
+                    drop = float(metrics_from_counts(champion_levels[level])[metric] - metrics_from_counts(counts)[metric])
+                    if drop > max_regression:
+                        regressions[f"{feature}={level}"] = drop
+            return regressions
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def evaluate_model(self, scores: dict) -> EvaluateModelResponse:
         """
         Method Name :   evaluate_model
         Description :   This function is used to evaluate trained model 
@@ -61,29 +149,36 @@ class ModelEvaluation:
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
-            best_model_f1_score=None
-            best_model = self.get_best_model()
-            if best_model is not None:
-                logging.info("Best model found in production stage, loading it for evaluation.")
-                buck = buckets()
-                best_model = buck.download_file(
-                    bucket=self.model_eval_config.bucket_name,
-                    key=self.model_trainer_artifact.trained_model_file_path,
-                    as_object=True
-                )
-                best_model = pickle.loads(best_model)
-                test = load_numpy_array_data(file_path = self.feature_engineering_artifact.test_file_path)
-                x, y = test[:, :-1], test[:, -1]
-                y_hat_best_model = best_model.predict(x)
-                best_model_f1_score = f1_score(y, y_hat_best_model)
-
-            trained_model_f1_score=self.model_trainer_artifact.metric_artifact.f1_score
-
-            tmp_best_model_score = 0 if best_model_f1_score is None else best_model_f1_score
-            result = EvaluateModelResponse(trained_model_f1_score=trained_model_f1_score,
-                                           best_model_f1_score=tmp_best_model_score,
-                                           is_model_accepted=trained_model_f1_score > tmp_best_model_score,
-                                           difference=trained_model_f1_score - tmp_best_model_score
+            metric = self._evaluation_config.get("metric", "f1")
+            trained_metric_artifact = get_classification_metrics_from_counts(scores["challenger"]["overall"])
+            best_model_score = None
+            slice_regressions = {}
+            # With no champion the challenger is accepted on its score alone
+            challenger_win_probability = 1.0
+            if scores["champion"] is not None:
+                best_metric_artifact = get_classification_metrics_from_counts(scores["champion"]["overall"])
+                best_model_score = getattr(best_metric_artifact, f"{metric}_score")
+                challenger_win_probability = win_probability(
+                    paired_counts=scores["paired"],
+                    metric=metric,
+                    n_resamples=self._metrics_config.get("n_resamples", 2000),
+                    random_state=self._metrics_config.get("random_state", 42))
+                slice_regressions = self.get_slice_regressions(scores["challenger"], scores["champion"], metric)
+                if slice_regressions:
+                    logging.info(f"Challenger regresses on slices: {slice_regressions}")
+
+            trained_model_score = getattr(trained_metric_artifact, f"{metric}_score")
+
+            tmp_best_model_score = 0 if best_model_score is None else best_model_score
+            min_win_probability = self._evaluation_config.get("min_win_probability", 0.95)
+            result = EvaluateModelResponse(trained_model_score=trained_model_score,
+                                           best_model_score=tmp_best_model_score,
+                                           is_model_accepted=(trained_model_score > tmp_best_model_score and
+                                                              challenger_win_probability >= min_win_probability and
+                                                              not slice_regressions),
+                                           difference=trained_model_score - tmp_best_model_score,
+                                           win_probability=challenger_win_probability,
+                                           slice_regressions=slice_regressions
                                            )
             logging.info(f"Result: {result}")
             return result
@@ -91,6 +186,7 @@ class ModelEvaluation:
         except Exception as e:
             raise MyException(e, sys)
 
+    @instrumented
     def initiate_model_evaluation(self) -> ModelEvaluationArtifact:
         """
         Method Name :   initiate_model_evaluation
@@ -102,16 +198,34 @@ class ModelEvaluation:
         try:
             print("------------------------------------------------------------------------------------------------")
             logging.info("Initialized Model Evaluation Component.")
-            evaluate_model_response = self.evaluate_model()
-            s3_model_path = self.model_trainer_artifact.trained_model_file_path
+            # Champion scores depend on the raw test rows and their slices, not on the test matrix this
+            # run's feature state produced
+            test_fingerprint = hashlib.sha256("".join(
+                file_fingerprint(file_path) for file_path in (self.feature_engineering_artifact.test_rows_file_path,
+                                                              self.feature_engineering_artifact.test_slices_file_path)
+            ).encode()).hexdigest()
+            record_rows(read_numpy_array_header(self.feature_engineering_artifact.test_file_path)[0][0])
+            champion, production_pointer_etag = self.get_best_model()
+            scores = self.score_models(test_fingerprint=test_fingerprint, champion=champion)
+            evaluate_model_response = self.evaluate_model(scores=scores)
 
             model_evaluation_artifact = ModelEvaluationArtifact(
                 is_model_accepted=evaluate_model_response.is_model_accepted,
-                s3_model_path=s3_model_path,
+                s3_model_path=champion["model_key"] if champion is not None else None,
                 trained_model_path=self.model_trainer_artifact.trained_model_file_path,
-                changed_accuracy=evaluate_model_response.difference)
+                changed_accuracy=evaluate_model_response.difference,
+                test_set_fingerprint=test_fingerprint,
+                trained_model_scores=scores["challenger"],
+                trained_model_predictions_file_path=self.model_eval_config.predictions_file_path,
+                production_pointer_etag=production_pointer_etag,
+                bundle_file_path=self.model_trainer_artifact.bundle_file_path,
+                feature_state_file_path=self.model_trainer_artifact.feature_state_file_path,
+                training_state=self.model_trainer_artifact.training_state,
+                feature_version=self.feature_engineering_artifact.feature_plan.version,
+                data_fingerprint={"train": file_fingerprint(self.feature_engineering_artifact.train_file_path),
+                                  "test": file_fingerprint(self.feature_engineering_artifact.test_file_path)})
 
             logging.info(f"Model evaluation artifact: {model_evaluation_artifact}")
             return model_evaluation_artifact
         except Exception as e:
-            raise MyException(e, sys) from e
\ No newline at end of file
+            raise MyException(e, sys) from e
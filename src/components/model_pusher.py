@@ -1,11 +1,16 @@
 import sys
 from src.configuration.aws_connection import buckets
+from src.constants import MODEL_CONFIG_FILE_PATH, SCHEMA_FILE_PATH
 from src.exception import MyException
 from src.logger import logging
 from src.entity.artifact_entity import ModelEvaluationArtifact
-from src.entity.config_entity import ModelPusherConfig
-from src.configuration.aws_connection import buckets
-import pickle
+from src.entity.config_entity import ModelPusherConfig, ModelRegistryConfig
+from src.entity.model_bundle import ModelBundle
+from src.entity.model_registry import ModelRegistry
+from src.utils.main_utils import read_yaml_file, load_numpy_array_data
+from src.utils.instrumentation import instrumented
+from src.utils.metrics import metrics_from_counts
+from src.utils.score_cache import write_champion_scores
 
 class ModelPusher:
     def __init__(self, model_evaluation_artifact: ModelEvaluationArtifact,
@@ -17,12 +22,53 @@ class ModelPusher:
         self.s3 = buckets()
         self.model_evaluation_artifact = model_evaluation_artifact
         self.model_pusher_config = model_pusher_config
+        self.registry = ModelRegistry(ModelRegistryConfig(bucket_name=model_pusher_config.bucket_name), client=self.s3)
+        self._lookup_table_config = read_yaml_file(file_path=MODEL_CONFIG_FILE_PATH).get("serving", {}).get("lookup_table", {})
+
+    def get_manifest_metadata(self) -> dict:
+        """
+        Metadata recorded in the registry manifest of the pushed version.
+        """
+        try:
+            scores = self.model_evaluation_artifact.trained_model_scores or {}
+            metrics = None
+            if scores.get("overall") is not None:
+                metrics = {name: float(value) for name, value in metrics_from_counts(scores["overall"]).items()}
+            return {
+                "metrics": metrics,
+                "scores": scores,
+                "data_fingerprint": self.model_evaluation_artifact.data_fingerprint,
+                "feature_version": self.model_evaluation_artifact.feature_version,
+                # Watermark and full retrain schedule the next incremental run continues from
+                "training_state": self.model_evaluation_artifact.training_state,
+            }
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def add_lookup_table(self, bundle_file_path: str) -> None:
+        """
+        Method Name :   add_lookup_table
+        Description :   Precomputes the prediction of every in-domain input combination into the bundle
+
+        Output      :   The bundle file is rewritten with its lookup table
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+            bundle = ModelBundle.load(bundle_file_path)
+            bundle.build_lookup_table(numerical_bounds=schema_config["numerical_bounds"],
+                                      categorical_levels=schema_config["categorical_levels"])
+            bundle.save(bundle_file_path)
+            logging.info(f"Lookup table with {len(bundle.arrays['lookup_class'])} entries added to {bundle_file_path}")
+        except Exception as e:
+            raise MyException(e, sys) from e
 
+    @instrumented
     def initiate_model_pusher(self):
         """
         Method Name :   initiate_model_evaluation
         Description :   This function is used to initiate all steps of the model pusher
-        
+
         Output      :   Returns model evaluation artifact
         On Failure  :   Write an exception log and then raise an exception
         """
@@ -36,16 +82,31 @@ class ModelPusher:
                 return None
             else:
                 logging.info("New model is better than the existing model in production stage. Proceeding with model pusher.")
-                logging.info("Loading the best model from the model evaluation artifact...")
-                with open(self.model_evaluation_artifact.trained_model_path, 'rb') as f:
-                    best_model = pickle.load(f)
-
-                self.s3.upload_file(
-                    bucket=self.model_pusher_config.bucket_name,
-                    key=self.model_evaluation_artifact.s3_model_path,
-                    body=pickle.dumps(best_model)
-                )
-                logging.info("Best model uploaded to S3 bucket successfully.")
-            
+
+                bundle_file_path = self.model_evaluation_artifact.bundle_file_path
+                if bundle_file_path is not None and self._lookup_table_config.get("enabled", False):
+                    self.add_lookup_table(bundle_file_path)
+
+                # The trained model file and its serving bundle are streamed to an immutable version as-is,
+                # then production is switched to it. The pointer swap fails if production changed since
+                # evaluation compared against it, so a concurrent push cannot be silently overwritten
+                manifest = self.registry.register_model(model_file_path=self.model_evaluation_artifact.trained_model_path,
+                                                        metadata=self.get_manifest_metadata(),
+                                                        bundle_file_path=bundle_file_path,
+                                                        feature_state_file_path=self.model_evaluation_artifact.feature_state_file_path)
+                self.registry.promote(manifest, expected_pointer_etag=self.model_evaluation_artifact.production_pointer_etag)
+                logging.info(f"Best model uploaded to S3 bucket successfully as version {manifest['version']}.")
+
+                # The new champion was already scored on this test set, so seed its score cache
+                if (self.model_evaluation_artifact.trained_model_scores is not None
+                        and self.model_evaluation_artifact.trained_model_predictions_file_path is not None):
+                    write_champion_scores(self.s3, self.model_pusher_config.bucket_name,
+                                          manifest["model_key"], manifest["model_etag"],
+                                          self.model_evaluation_artifact.test_set_fingerprint,
+                                          self.model_evaluation_artifact.trained_model_scores,
+                                          predictions=load_numpy_array_data(
+                                              self.model_evaluation_artifact.trained_model_predictions_file_path))
+                return manifest
+
         except Exception as e:
-            raise MyException(e, sys) from e
\ No newline at end of file
+            raise MyException(e, sys) from e
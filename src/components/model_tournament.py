@@ -0,0 +1,116 @@
+import os
+import sys
+import time
+import pickle
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from src.constants import INSTRUMENTATION_RSS_SAMPLE_SECONDS
+from src.exception import MyException
+from src.logger import logging
+from src.utils.estimator_factory import build_estimator
+from src.utils.instrumentation import RssSampler, rss_mb, max_rss_mb
+from src.utils.metrics import get_classification_metrics
+
+
+def _fit_candidate(candidate: dict, train_file_path: str, validation_fraction: float, scoring: str) -> dict:
+    """
+    Worker task: fits one candidate on the head of the memory-mapped training matrix and
+    scores it on the tail. Rows were shuffled by the train/test split, so the tail is a
+    random validation sample, and slicing a memmap leaves the matrix shared between
+    workers instead of pickling a copy into each of them.
+
+    Fit memory is the growth of the worker's RSS over the fit, so native allocations of the tree
+    and boosting models count. When the fit raises the process's lifetime peak, ru_maxrss gives
+    the exact peak; otherwise (a bigger candidate ran earlier in this worker) it is the highest
+    RSS sampled during the fit.
+    """
+    train = np.load(train_file_path, mmap_mode="r")
+    n_fit = train.shape[0] - max(1, int(train.shape[0] * validation_fraction))
+    x_fit, y_fit = train[:n_fit, :-1], train[:n_fit, -1]
+    x_validation, y_validation = train[n_fit:, :-1], train[n_fit:, -1]
+
+    model = build_estimator(candidate["estimator"], candidate.get("params"))
+    rss_start, max_rss_start = rss_mb(), max_rss_mb()
+    sampler = RssSampler(INSTRUMENTATION_RSS_SAMPLE_SECONDS)
+    sampler.start()
+    start = time.perf_counter()
+    model.fit(x_fit, y_fit)
+    fit_time = time.perf_counter() - start
+    peak_rss, max_rss_end = sampler.stop(), max_rss_mb()
+    if max_rss_end > max_rss_start:
+        peak_rss = max(peak_rss, max_rss_end)
+
+    start = time.perf_counter()
+    y_pred = model.predict(x_validation)
+    predict_time = time.perf_counter() - start
+
+    metrics = get_classification_metrics(y_validation, y_pred)
+    return {
+        "name": candidate["name"],
+        "estimator": candidate["estimator"],
+        "params": str(candidate.get("params") or {}),
+        "score": float(getattr(metrics, f"{scoring}_score")),
+        "accuracy": metrics.accuracy_score,
+        "f1": metrics.f1_score,
+        "precision": metrics.precision_score,
+        "recall": metrics.recall_score,
+        "fit_time": fit_time,
+        "fit_peak_memory_mb": max(0.0, peak_rss - rss_start),
+        "predict_us_per_row": predict_time / len(y_validation) * 1e6,
+        "model_size_kb": len(pickle.dumps(model)) / 1024,
+    }
+
+
+class ModelTournament:
+    """
+    Trains the candidate estimators listed under ``model_trainer.tournament`` in config/model.yaml
+    concurrently in worker processes, scores them with the shared metric code, and records the
+    fit time, fit memory, prediction latency and serialized size of each so accuracy can be
+    weighed against serving cost.
+    """
+
+    def __init__(self, tournament_config: dict, train_file_path: str):
+        """
+        :param tournament_config: ``model_trainer.tournament`` section of the model config
+        :param train_file_path: path to the .npy training matrix (target in the last column)
+        """
+        try:
+            self.candidates = tournament_config["candidates"]
+            self.train_file_path = train_file_path
+            self.scoring = tournament_config.get("scoring", "f1")
+            self.validation_fraction = float(tournament_config.get("validation_fraction", 0.2))
+            n_jobs = int(tournament_config.get("n_jobs", -1))
+            self.n_jobs = min(len(self.candidates), os.cpu_count() if n_jobs <= 0 else n_jobs)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def run(self) -> tuple:
+        """
+        Runs every candidate.
+
+        Output      :   Returns (winning candidate config, leaderboard dataframe sorted best first)
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            logging.info(f"Model tournament: {len(self.candidates)} candidates on {self.n_jobs} workers")
+            records = []
+            with ProcessPoolExecutor(max_workers=self.n_jobs) as executor:
+                futures = [executor.submit(_fit_candidate, candidate, self.train_file_path,
+                                           self.validation_fraction, self.scoring)
+                           for candidate in self.candidates]
+                for future in as_completed(futures):
+                    record = future.result()
+                    logging.info(f"Candidate {record['name']}: {self.scoring}={record['score']:.4f}, "
+                                 f"fit {record['fit_time']:.2f}s, {record['fit_peak_memory_mb']:.1f} MB")
+                    records.append(record)
+
+            leaderboard = pd.DataFrame(records).sort_values("score", ascending=False).reset_index(drop=True)
+            winner_name = leaderboard.loc[0, "name"]
+            winner = next(candidate for candidate in self.candidates if candidate["name"] == winner_name)
+            logging.info(f"Tournament winner: {winner_name}")
+            return winner, leaderboard
+        except Exception as e:
+            raise MyException(e, sys) from e
@@ -1,46 +1,283 @@
 import sys
-from typing import Tuple
+import copy
+import json
+import pickle
+from datetime import datetime
+from typing import Optional, Tuple
 import os
 import numpy as np
-from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
+import pandas as pd
 from sklearn.linear_model import LogisticRegression
+from src.constants import MODEL_CONFIG_FILE_PATH, TARGET_COLUMN
+from src.configuration.aws_connection import buckets
 from src.exception import MyException
 from src.logger import logging
-from src.utils.main_utils import load_numpy_array_data, save_object
-from src.entity.config_entity import ModelTrainerConfig
-from src.entity.artifact_entity import FeatureEngineeringArtifact, ModelTrainerArtifact, ClassificationMetricArtifact
+from src.utils.main_utils import load_numpy_array_data, save_object, read_yaml_file, read_numpy_array_header, iter_numpy_array_blocks
+from src.utils.estimator_factory import build_estimator
+from src.utils.metrics import get_classification_metrics
+from src.utils.training_state import next_training_state
+from src.utils.instrumentation import instrumented, record_rows
+from src.components.hyperparameter_search import HyperparameterSearch
+from src.components.model_tournament import ModelTournament
+from src.entity.config_entity import ModelTrainerConfig, ModelRegistryConfig
+from src.entity.artifact_entity import FeatureEngineeringArtifact, ModelTrainerArtifact, DataCleaningArtifact
 from src.entity.estimator import MyModel
+from src.entity.linear_scorer import LinearScorer
+from src.entity.model_registry import ModelRegistry
+from src.entity.model_bundle import ModelBundle
 
 class ModelTrainer:
     def __init__(self, feature_engineering_artifact: FeatureEngineeringArtifact,
-                 model_trainer_config: ModelTrainerConfig):
+                 model_trainer_config: ModelTrainerConfig,
+                 data_cleaning_artifact: DataCleaningArtifact):
         """
-        :param data_transformation_artifact: Output reference of data transformation artifact stage
+        :param feature_engineering_artifact: Output reference of feature engineering artifact stage
         :param model_trainer_config: Configuration for model training
+        :param data_cleaning_artifact: Output reference of the data cleaning stage the features were built from
         """
-        self.feature_engineering_artifact = feature_engineering_artifact
-        self.model_trainer_config = model_trainer_config
+        try:
+            self.feature_engineering_artifact = feature_engineering_artifact
+            self.model_trainer_config = model_trainer_config
+            self.data_cleaning_artifact = data_cleaning_artifact
+            model_config = read_yaml_file(file_path=MODEL_CONFIG_FILE_PATH)
+            self._training_config = model_config.get("model_trainer", {})
+            self._metrics_config = model_config.get("metrics", {})
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def search_hyperparameters(self) -> object:
+        """
+        Method Name :   search_hyperparameters
+        Description :   This function runs the successive-halving hyperparameter search configured in
+                        config/model.yaml and saves its leaderboard
+        
+        Output      :   Returns the unfitted estimator built with the best hyperparameters
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            search = HyperparameterSearch(search_config=self._training_config["search"],
+                                          train_file_path=self.feature_engineering_artifact.train_file_path)
+            best_params, leaderboard = search.run()
+            self.save_leaderboard(leaderboard)
+            return build_estimator(search.estimator_name, best_params)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def run_tournament(self) -> object:
+        """
+        Method Name :   run_tournament
+        Description :   This function trains the candidate estimators configured in config/model.yaml
+                        in parallel and saves their leaderboard
+        
+        Output      :   Returns the unfitted estimator of the winning candidate
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            tournament = ModelTournament(tournament_config=self._training_config["tournament"],
+                                         train_file_path=self.feature_engineering_artifact.train_file_path)
+            winner, leaderboard = tournament.run()
+            self.save_leaderboard(leaderboard)
+            return build_estimator(winner["estimator"], winner.get("params"))
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def load_production_model(self, version: str) -> object:
+        """
+        Method Name :   load_production_model
+        Description :   This function downloads the model of the production version the feature plan
+                        and scaler of this run were taken from
+        
+        Output      :   Returns the model object
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            bucket_name = self.model_trainer_config.bucket_name
+            registry = ModelRegistry(ModelRegistryConfig(bucket_name=bucket_name))
+            model_key = registry.read_manifest(version)["model_key"]
+            return pickle.loads(registry.client.download_file(bucket=bucket_name, key=model_key, as_object=True))
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def update_incrementally(self) -> Optional[object]:
+        """
+        Method Name :   update_incrementally
+        Description :   This function continues training the production model with partial_fit on the
+                        rows ingested since it was trained, so routine retraining costs O(new data).
+                        It only runs when ingestion planned an incremental run: then only the new rows
+                        were read, cleaned and transformed with that model's frozen parameters, so there
+                        is no data to fall back to a full retrain on
+        
+        Output      :   Returns the updated model, or None when a full retrain is due
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            incremental_config = self._training_config.get("incremental", {})
+            base_version = self.feature_engineering_artifact.base_version
+            if base_version is None:
+                logging.info("Full retrain scheduled for this run")
+                return None
+
+            partition = load_numpy_array_data(file_path=self.feature_engineering_artifact.partition_file_path)
+            production_model = self.load_production_model(base_version)
+            if not hasattr(production_model, "partial_fit"):
+                raise Exception(f"Production model {base_version} does not support partial_fit")
+            if production_model.n_features_in_ != partition.shape[1] - 1:
+                raise Exception(f"Production model {base_version} has {production_model.n_features_in_} features, "
+                                f"the new partition {partition.shape[1] - 1}")
+
+            model = copy.deepcopy(production_model)
+            logging.info(f"Updating production model {base_version} on {len(partition)} new rows")
+            record_rows(len(partition))
+            if len(partition) > 0:
+                for _ in range(int(incremental_config.get("epochs", 1))):
+                    model.partial_fit(partition[:, :-1], partition[:, -1])
+            return model
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def train_out_of_core(self, model: object) -> object:
+        """
+        Method Name :   train_out_of_core
+        Description :   This function fits a partial_fit capable estimator on mini-batches streamed from
+                        the training matrix on disk. Each epoch visits the row blocks in a fresh random
+                        order and shuffles rows within a block, so memory stays bounded by block_rows
+                        however large the training set is
+        
+        Output      :   Returns the fitted model
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            out_of_core_config = self._training_config.get("out_of_core", {})
+            epochs = int(out_of_core_config.get("epochs", 5))
+            block_rows = int(out_of_core_config.get("block_rows", 100000))
+            batch_size = int(out_of_core_config.get("batch_size", 10000))
+            rng = np.random.default_rng(out_of_core_config.get("random_state", 42))
+            train_file_path = self.feature_engineering_artifact.train_file_path
+
+            (n_rows, _), _, _ = read_numpy_array_header(train_file_path)
+            record_rows(n_rows)
+            n_blocks = -(-n_rows // block_rows)
+            classes = np.unique(np.concatenate([np.unique(block[:, -1])
+                                                for block in iter_numpy_array_blocks(train_file_path, block_rows)]))
+            logging.info(f"Out-of-core training on {n_rows} rows in {n_blocks} blocks for {epochs} epochs")
+
+            for epoch in range(epochs):
+                for block in iter_numpy_array_blocks(train_file_path, block_rows, block_order=rng.permutation(n_blocks)):
+                    block = block[rng.permutation(len(block))]
+                    for start in range(0, len(block), batch_size):
+                        batch = block[start:start + batch_size]
+                        model.partial_fit(batch[:, :-1], batch[:, -1], classes=classes)
+                logging.info(f"Epoch {epoch + 1}/{epochs} done")
+            return model
+        except Exception as e:
+            raise MyException(e, sys) from e
 
-    def get_model_object_and_report(self, train: np.array, test: np.array) -> Tuple[object, object]:
+    def predict_in_blocks(self, model: object, file_path: str) -> Tuple[np.array, np.array]:
+        """
+        Predicts a .npy matrix block by block.
+
+        Output      :   Returns (true labels, predicted labels)
+        """
+        try:
+            block_rows = int(self._training_config.get("out_of_core", {}).get("block_rows", 100000))
+            y_true, y_pred = [], []
+            for block in iter_numpy_array_blocks(file_path, block_rows):
+                y_true.append(block[:, -1])
+                y_pred.append(model.predict(block[:, :-1]))
+            return np.concatenate(y_true), np.concatenate(y_pred)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def export_linear_model(self, trained_model: object) -> Optional[str]:
+        """
+        Method Name :   export_linear_model
+        Description :   This function exports a binary linear model with its feature plan and scaler to the
+                        JSON bundle read by LinearScorer, then checks that the NumPy scorer, going from raw
+                        cleaned columns through its own feature and scaler arithmetic, reproduces the sklearn
+                        predictions on the training pipeline's transform for every cleaned row before
+                        keeping the export
+
+        Output      :   Returns the latest export path, or None for models that are not linear
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            if not LinearScorer.is_supported(trained_model):
+                logging.info(f"{type(trained_model).__name__} is not a binary logistic model, skipping linear export")
+                return None
+
+            scorer = LinearScorer.from_model(trained_model,
+                                             feature_plan=self.feature_engineering_artifact.feature_plan,
+                                             scaler=self.feature_engineering_artifact.scaler,
+                                             metadata={"feature_version": self.feature_engineering_artifact.feature_plan.version})
+            block_rows = int(self._training_config.get("out_of_core", {}).get("block_rows", 100000))
+            feature_plan, scaler = self.feature_engineering_artifact.feature_plan, self.feature_engineering_artifact.scaler
+            n_rows = 0
+            for chunk in pd.read_csv(self.data_cleaning_artifact.cleaned_data_file_path, chunksize=block_rows):
+                chunk = chunk.drop(columns=[TARGET_COLUMN])
+                expected = trained_model.predict(scaler.transform(feature_plan.transform(chunk)))
+                mismatches = int(np.sum(scorer.predict(scorer.transform(chunk)) != expected))
+                if mismatches:
+                    raise Exception(f"Linear export disagrees with {type(trained_model).__name__} on {mismatches} cleaned rows")
+                n_rows += len(chunk)
+            logging.info(f"Linear export matches {type(trained_model).__name__} on all {n_rows} cleaned rows")
+
+            scorer.save(self.model_trainer_config.linear_model_file_path)
+            scorer.save(self.model_trainer_config.latest_linear_model_file_path)
+            return self.model_trainer_config.latest_linear_model_file_path
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def export_model_bundle(self, trained_model: object) -> str:
+        """
+        Method Name :   export_model_bundle
+        Description :   This function writes the single-object serving bundle: the cleaning parameters
+                        saved by DataCleaning, the feature plan, the scaler statistics and the model
+
+        Output      :   Returns the latest bundle path
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            # The parameters of the cleaning run this model's data came from, which may be an earlier
+            # run's when the stage was skipped or resumed
+            with open(self.data_cleaning_artifact.cleaning_params_file_path, "r") as params_file:
+                cleaning_params = json.load(params_file)
+            bundle = ModelBundle.build(cleaning_params=cleaning_params,
+                                       feature_plan=self.feature_engineering_artifact.feature_plan,
+                                       scaler=self.feature_engineering_artifact.scaler,
+                                       model=trained_model,
+                                       metadata={"feature_version": self.feature_engineering_artifact.feature_plan.version})
+            bundle.save(self.model_trainer_config.bundle_file_path)
+            bundle.save(self.model_trainer_config.latest_bundle_file_path)
+            logging.info(f"Model bundle saved: {bundle}")
+            return self.model_trainer_config.latest_bundle_file_path
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def save_leaderboard(self, leaderboard: pd.DataFrame) -> None:
+        try:
+            logging.info(f"Saving leaderboard at {self.model_trainer_config.leaderboard_file_path}")
+            os.makedirs(self.model_trainer_config.folder_name, exist_ok=True)
+            os.makedirs(self.model_trainer_config.latest_folder_name, exist_ok=True)
+            leaderboard.to_csv(self.model_trainer_config.leaderboard_file_path, index=False)
+            leaderboard.to_csv(self.model_trainer_config.latest_leaderboard_file_path, index=False)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def get_model_object_and_report(self, model: object, train: np.array, test: np.array) -> Tuple[object, object]:
         """
         Method Name :   get_model_object_and_report
-        Description :   This function trains a RandomForestClassifier with specified parameters
+        Description :   This function fits the given estimator and scores it on the test set
         
         Output      :   Returns metric artifact object and trained model object
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
-            logging.info("Training RandomForestClassifier with specified parameters")
+            logging.info(f"Training {type(model).__name__} with specified parameters")
 
             # Splitting the train and test data into features and target variables
             x_train, y_train, x_test, y_test = train[:, :-1], train[:, -1], test[:, :-1], test[:, -1]
             logging.info("train-test split done.")
 
-            # Initialize RandomForestClassifier with specified parameters
-            model = LogisticRegression(max_iter=self.model_trainer_config.max_iter,
-                                       solver=self.model_trainer_config.solver,
-                                       C= self.model_trainer_config.c)
-
             # Fit the model
             logging.info("Model training going on...")
             model.fit(x_train, y_train)
@@ -48,18 +285,15 @@ class ModelTrainer:
 
             # Predictions and evaluation metrics
             y_pred = model.predict(x_test)
-            accuracy = accuracy_score(y_test, y_pred)
-            f1 = f1_score(y_test, y_pred)
-            precision = precision_score(y_test, y_pred)
-            recall = recall_score(y_test, y_pred)
 
             # Creating metric artifact
-            metric_artifact = ClassificationMetricArtifact(accuracy_score=accuracy, f1_score=f1, precision_score=precision, recall_score=recall)
+            metric_artifact = get_classification_metrics(y_test, y_pred, **self._metrics_config)
             return model, metric_artifact
         
         except Exception as e:
             raise MyException(e, sys) from e
 
+    @instrumented
     def initiate_model_trainer(self) -> ModelTrainerArtifact:
         logging.info("Entered initiate_model_trainer method of ModelTrainer class")
         """
@@ -72,17 +306,47 @@ class ModelTrainer:
         try:
             print("------------------------------------------------------------------------------------------------")
             print("Starting Model Trainer Component")
-            # Load transformed train and test data
-            train_arr = load_numpy_array_data(file_path=self.feature_engineering_artifact.train_file_path)
-            test_arr = load_numpy_array_data(file_path=self.feature_engineering_artifact.test_file_path)
-            logging.info("train-test data loaded")
-            
-            # Train model and get metrics
-            trained_model, metric_artifact = self.get_model_object_and_report(train=train_arr, test=test_arr)
-            logging.info("Model object and artifact loaded.")
+            leaderboard_file_path = None
+            incremental_model = None
+            mode = self._training_config.get("mode", "single")
+            if mode == "search":
+                model = self.search_hyperparameters()
+                leaderboard_file_path = self.model_trainer_config.latest_leaderboard_file_path
+            elif mode == "tournament":
+                model = self.run_tournament()
+                leaderboard_file_path = self.model_trainer_config.latest_leaderboard_file_path
+            elif mode == "out_of_core":
+                out_of_core_config = self._training_config.get("out_of_core", {})
+                model = build_estimator(out_of_core_config.get("estimator", "sgd_classifier"), out_of_core_config.get("params"))
+            elif mode == "incremental":
+                incremental_model = self.update_incrementally()
+                incremental_config = self._training_config.get("incremental", {})
+                model = build_estimator(incremental_config.get("estimator", "sgd_classifier"), incremental_config.get("params"))
+            else:
+                model = LogisticRegression(max_iter=self.model_trainer_config.max_iter,
+                                           solver=self.model_trainer_config.solver,
+                                           C= self.model_trainer_config.c)
+
+            if incremental_model is not None or mode == "out_of_core":
+                # The full training matrix is never loaded: incremental runs train on the new partition
+                # only and out-of-core runs stream it from disk
+                trained_model = incremental_model if incremental_model is not None else self.train_out_of_core(model)
+                y_test, y_pred = self.predict_in_blocks(trained_model, self.feature_engineering_artifact.test_file_path)
+                metric_artifact = get_classification_metrics(y_test, y_pred, **self._metrics_config)
+            else:
+                # Load transformed train and test data
+                train_arr = load_numpy_array_data(file_path=self.feature_engineering_artifact.train_file_path)
+                record_rows(len(train_arr))
+                test_arr = load_numpy_array_data(file_path=self.feature_engineering_artifact.test_file_path)
+                logging.info("train-test data loaded")
+
+                # Train model and get metrics
+                trained_model, metric_artifact = self.get_model_object_and_report(model=model, train=train_arr, test=test_arr)
+            logging.info(f"Model object and artifact loaded: {metric_artifact}")
 
-            # Check if the model's accuracy meets the expected threshold
-            if accuracy_score(train_arr[:, -1], trained_model.predict(train_arr[:, :-1])) < self.model_trainer_config.expecected_accuracy:
+            # Check if the model's held-out accuracy meets the expected threshold. It comes from the
+            # confusion matrix already built for the test metrics, so no extra predict pass is needed
+            if metric_artifact.accuracy_score < self.model_trainer_config.expecected_accuracy:
                 logging.info("No model found with score above the base score")
                 raise Exception("No model found with score above the base score")
 
@@ -95,11 +359,27 @@ class ModelTrainer:
             save_object(self.model_trainer_config.trained_model_file_path, trained_model)
             save_object(self.model_trainer_config.latest_trained_model_file_path, trained_model)
             logging.info("Saved final model object that includes both preprocessing and the trained model")
+            linear_model_file_path = self.export_linear_model(trained_model)
+            bundle_file_path = self.export_model_bundle(trained_model)
+            # The fitted feature parameters and the training state are recorded with the registry version
+            # when this model is promoted, so a rejected model never moves them forward
+            save_object(self.model_trainer_config.feature_state_file_path,
+                        {"feature_plan": self.feature_engineering_artifact.feature_plan,
+                         "scaler": self.feature_engineering_artifact.scaler})
+            training_state = next_training_state(self.feature_engineering_artifact.training_state or {},
+                                                 is_full_retrain=incremental_model is None,
+                                                 watermark=self.feature_engineering_artifact.watermark,
+                                                 mode=mode)
             
             # Create and return the ModelTrainerArtifact
             model_trainer_artifact = ModelTrainerArtifact(
                 trained_model_file_path=self.model_trainer_config.latest_trained_model_file_path,
                 metric_artifact=metric_artifact,
+                leaderboard_file_path=leaderboard_file_path,
+                linear_model_file_path=linear_model_file_path,
+                bundle_file_path=bundle_file_path,
+                feature_state_file_path=self.model_trainer_config.feature_state_file_path,
+                training_state=training_state,
             )
 
             logging.info(f"Model trainer artifact: {model_trainer_artifact}")
@@ -0,0 +1,136 @@
+import sys
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.entity.model_bundle import ModelBundle
+from src.exception import MyException
+from src.logger import logging
+from src.utils.main_utils import iter_numpy_array_blocks
+
+
+class StreamingEvaluator:
+    """
+    Scores several models on a .npy test matrix in one pass over fixed-size row blocks, so the
+    holdout never has to fit in memory. For every model it accumulates the overall confusion
+    counts and the counts per value of each slice column (e.g. Stage_fear_Yes), which is all
+    the metrics, bootstrap intervals and per-segment comparisons need. Slice values come from the
+    cleaned data, read in the same blocks, as the feature plan may not keep the slice columns and
+    the test matrix only holds them scaled. For a pair of models it
+    also counts their joint predictions, for the paired bootstrap, and it keeps every model's
+    predictions so they can be cached with its scores.
+
+    A model that brings its own cleaning parameters, feature plan and scaler, such as the bundle of
+    the production model, is scored on the raw test rows instead, read in the same blocks, so it
+    sees the test set in the feature space it was trained in and not in the one fitted for the
+    test matrix.
+    """
+
+    def __init__(self, models: Dict[str, object], slice_features: List[str] = None, block_rows: int = 100000,
+                 known_predictions: Dict[str, np.array] = None, pair: Tuple[str, str] = None,
+                 bundles: Dict[str, ModelBundle] = None):
+        """
+        :param models: model objects to score on the test matrix, keyed by the name used in the results
+        :param slice_features: cleaned data columns whose values define the evaluation segments
+        :param block_rows: rows read per block
+        :param known_predictions: cached predictions of models that are not re-scored, one per test row
+        :param pair: names of two models whose joint counts are returned under the first one's "paired" key
+        :param bundles: models to score on the raw test rows with their own preprocessing, keyed like models
+        """
+        try:
+            self.models = models
+            self.bundles = bundles or {}
+            self.known_predictions = known_predictions or {}
+            self.pair = pair
+            self.predictions: Dict[str, np.array] = {}
+            self.block_rows = block_rows
+            self.slice_features = list(slice_features or [])
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _slice_blocks(self, slices_file_path: str):
+        """Row blocks of the slice columns, rounded to integer levels; the dummies are stored as booleans."""
+        if not self.slice_features:
+            return None
+        header = pd.read_csv(slices_file_path, nrows=0).columns
+        missing = [name for name in self.slice_features if name not in header]
+        if missing:
+            raise ValueError(f"Slice columns {missing} are not in {slices_file_path}, which holds {list(header)}")
+        return (np.rint(block[self.slice_features].to_numpy(dtype=np.float64)).astype(np.int64)
+                for block in pd.read_csv(slices_file_path, usecols=self.slice_features, chunksize=self.block_rows))
+
+    def run(self, file_path: str, rows_file_path: str = None, slices_file_path: str = None) -> Dict[str, dict]:
+        """
+        :param file_path: .npy test matrix, features then target
+        :param rows_file_path: CSV of the raw input columns of the same rows in the same order, needed
+                               when bundles are scored
+        :param slices_file_path: CSV of the slice columns of the same rows in the same order, needed
+                                 when slice features are set
+
+        Output      :   Returns {model name: {"overall": [tn, fp, fn, tp],
+                                              "slices": {feature: {value: [tn, fp, fn, tp]}},
+                                              "paired": {other model name: 8 joint counts}}}, where
+                                "paired" is only set for the first model of the pair. The predictions
+                                of each scored model are left in self.predictions
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            scored = list(self.models) + list(self.bundles)
+            overall = {name: np.zeros(4, dtype=np.int64) for name in scored}
+            slices = {name: {feature: {} for feature in self.slice_features} for name in scored}
+            paired = np.zeros(8, dtype=np.int64)
+            predictions = {name: [] for name in scored}
+            row_blocks = iter(pd.read_csv(rows_file_path, chunksize=self.block_rows)) if self.bundles else None
+            slice_blocks = self._slice_blocks(slices_file_path)
+            n_rows = 0
+            for block in iter_numpy_array_blocks(file_path, self.block_rows):
+                x, y = block[:, :-1], block[:, -1].astype(np.int64)
+                slice_values = {}
+                if slice_blocks is not None:
+                    slice_block = next(slice_blocks, None)
+                    if slice_block is None or len(slice_block) != len(block):
+                        raise ValueError(f"{slices_file_path} does not hold the rows of {file_path}")
+                    slice_values = dict(zip(self.slice_features, slice_block.T))
+                block_predictions = {name: known[n_rows:n_rows + len(block)].astype(np.int64)
+                                     for name, known in self.known_predictions.items()}
+                for name, model in self.models.items():
+                    block_predictions[name] = model.predict(x).astype(np.int64)
+                if row_blocks is not None:
+                    rows = next(row_blocks, None)
+                    if rows is None or len(rows) != len(block):
+                        raise ValueError(f"{rows_file_path} does not hold the rows of {file_path}")
+                    columns = {column: rows[column].to_numpy() for column in rows.columns}
+                    for name, bundle in self.bundles.items():
+                        block_predictions[name] = bundle.predict_class_indices(columns)
+                for name in scored:
+                    predictions[name].append(block_predictions[name].astype(np.bool_))
+                    codes = 2 * y + block_predictions[name]
+                    overall[name] += np.bincount(codes, minlength=4)
+                    for feature, values in slice_values.items():
+                        levels, inverse = np.unique(values, return_inverse=True)
+                        counts = np.bincount(4 * inverse + codes, minlength=4 * len(levels)).reshape(-1, 4)
+                        for level, level_counts in zip(levels.tolist(), counts):
+                            accumulated = slices[name][feature].setdefault(str(level), np.zeros(4, dtype=np.int64))
+                            accumulated += level_counts
+                if self.pair is not None:
+                    first, second = self.pair
+                    paired += np.bincount(4 * y + 2 * block_predictions[first] + block_predictions[second], minlength=8)
+                n_rows += len(block)
+            if row_blocks is not None and next(row_blocks, None) is not None:
+                raise ValueError(f"{rows_file_path} holds more rows than {file_path}")
+            if slice_blocks is not None and next(slice_blocks, None) is not None:
+                raise ValueError(f"{slices_file_path} holds more rows than {file_path}")
+            logging.info(f"Streaming evaluation scored {len(scored)} models on {n_rows} rows")
+
+            self.predictions = {name: np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.bool_)
+                                for name, blocks in predictions.items()}
+            scores = {name: {"overall": overall[name].tolist(),
+                             "slices": {feature: {level: counts.tolist() for level, counts in levels.items()}
+                                        for feature, levels in slices[name].items()}}
+                      for name in scored}
+            if self.pair is not None:
+                scores[self.pair[0]]["paired"] = {self.pair[1]: paired.tolist()}
+            return scores
+        except Exception as e:
+            raise MyException(e, sys) from e
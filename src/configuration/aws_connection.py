@@ -2,6 +2,8 @@ import boto3
 from botocore.exceptions import ClientError
 import os
 
+from src.utils.instrumentation import record_s3_bytes
+
 class buckets():
     def __init__(self):
         self.s3_client = boto3.client(
@@ -34,16 +36,48 @@ class buckets():
             if file_path:
                 with open(file_path, 'rb') as f:
                     body = f.read()
-                self.s3_client.put_object(Bucket=bucket, Key=key, Body=body)
+                response = self.s3_client.put_object(Bucket=bucket, Key=key, Body=body)
                 print(f"✅ Uploaded file '{file_path}' as '{key}'")
             else:
                 body = kwargs["body"]
-                self.s3_client.put_object(Bucket=bucket, Key=key, Body=body)
+                response = self.s3_client.put_object(Bucket=bucket, Key=key, Body=body)
                 print(f"✅ Uploaded content to '{key}' in bucket '{bucket}'")
+            record_s3_bytes(written=len(body))
+            return response
+        except ClientError as e:
+            print(f"⚠️ Upload error: {e}")
+            raise
+
+    def upload_file_stream(self, bucket, key, file_path):
+        """
+        Streams a local file to S3 as-is (multipart for large files) without reading it into memory.
+        Returns the stored object's metadata.
+        """
+        try:
+            self.s3_client.upload_file(file_path, bucket, key)
+            record_s3_bytes(written=os.path.getsize(file_path))
+            print(f"✅ Streamed file '{file_path}' to '{key}'")
+            return self.s3_client.head_object(Bucket=bucket, Key=key)
         except ClientError as e:
             print(f"⚠️ Upload error: {e}")
             raise
 
+    def put_object_conditional(self, bucket, key, body, if_match=None):
+        """
+        Writes an object only if it is unchanged since it was read: with if_match the current
+        ETag must match, without it the key must not exist yet. Raises ClientError
+        (PreconditionFailed) when another writer got there first.
+        """
+        try:
+            condition = {"IfMatch": if_match} if if_match else {"IfNoneMatch": "*"}
+            response = self.s3_client.put_object(Bucket=bucket, Key=key, Body=body, **condition)
+            record_s3_bytes(written=len(body))
+            print(f"✅ Conditionally updated '{key}' in bucket '{bucket}'")
+            return response
+        except ClientError as e:
+            print(f"⚠️ Conditional upload error: {e}")
+            raise
+
     def list_bucket(self, bucket):
         print(f"\n📦 Contents of bucket '{bucket}':")
         response = self.s3_client.list_objects_v2(Bucket=bucket)
@@ -55,15 +89,30 @@ class buckets():
             if as_object:
                 response = self.s3_client.get_object(Bucket=bucket, Key=key)
                 content = response['Body'].read()
+                record_s3_bytes(read=len(content))
                 print(f"✅ Loaded object from '{key}'")
                 return content
             else:
                 self.s3_client.download_file(bucket, key, file_path)
+                record_s3_bytes(read=os.path.getsize(file_path))
                 print(f"✅ Downloaded '{key}' to '{file_path}'")
         except ClientError as e:
             print(f"⚠️ Download error: {e}")
             raise
     
+    def head_object(self, bucket, key):
+        """
+        Returns the object metadata (ETag, VersionId, ContentLength, ...) without downloading
+        the body, or None when the key does not exist.
+        """
+        try:
+            return self.s3_client.head_object(Bucket=bucket, Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            print(f"⚠️ Head object error: {e}")
+            raise
+
     def path_exists_in_s3(self, bucket_name: str, path: str) -> bool:
         """
         Check if a given path (prefix or full key) exists in the S3 bucket.
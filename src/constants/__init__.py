@@ -0,0 +1,111 @@
+import os
+
+# For MongoDB connection
+DATABASE_NAME = os.getenv("DB_NAME", "personality")
+MONGODB_URL_KEY = "MONGODB_URL"
+
+PIPELINE_NAME: str = "personality_classifier"
+ARTIFACT_DIR: str = "artifact"
+PIPELINE_STATE_DIR_NAME: str = "pipeline"
+
+MODEL_FILE_NAME = "model.pkl"
+
+TARGET_COLUMN = "Personality"
+
+SCHEMA_FILE_PATH = os.path.join("config", "schema.yaml")
+MODEL_CONFIG_FILE_PATH = os.path.join("config", "model.yaml")
+
+
+"""
+Data Ingestion related constant start with DATA_INGESTION VAR NAME
+"""
+DATA_INGESTION_COLLECTION_NAME: str = os.getenv("COLLECTION_NAME", "personality_data")
+DATA_INGESTION_DIR_NAME: str = "data_ingestion"
+DATA_INGESTION_LATEST_DIR_NAME: str = "latest"
+DATA_INGESTION_ARTIFACT_NAME: str = "data_ingestion_artifact.pkl"
+DATA_FILE_NAME: str = "data_file.csv"
+
+
+"""
+Data Validation related constant start with DATA_VALIDATION VAR NAME
+"""
+DATA_VALIDATION_DIR_NAME: str = "data_validation"
+DATA_VALIDATION_REPORT_FILE_NAME: str = "validation_report.json"
+
+
+"""
+Data Cleaning related constant start with DATA_CLEANING VAR NAME
+"""
+DATA_CLEANING_DIR_NAME: str = "data_cleaning"
+DATA_CLEANING_CLEANED_DATA_DIR: str = "cleaned"
+DATA_CLEANING_CLEANED_FILE_NAME: str = "cleaned_data.csv"
+DATA_CLEANING_PARAMS_FILE_NAME: str = "cleaning_params.json"
+
+
+"""
+Feature Engineering related constant start with FEATURE_ENGINEERING VAR NAME
+"""
+FEATURE_ENGINEERING_DIR_NAME: str = "feature_engineering"
+FEATURE_ENGINEERING_ARTIFACT_DIR: str = "feature_engineering_artifact.pkl"
+TRAIN_DIR_NAME: str = "train"
+TEST_DIR_NAME: str = "test"
+TEST_ROWS_FILE_NAME: str = "test_rows.csv"
+TEST_SLICES_FILE_NAME: str = "test_slices.csv"
+SPLIT_SIZE: float = 0.2
+
+
+"""
+MODEL TRAINER related constant start with MODEL_TRAINER var name
+"""
+MODEL_TRAINER_DIR_NAME: str = "model_trainer"
+MODEL_TRAINER_EXPECTED_SCORE: float = 0.6
+MODEL_TRAINER_MAX_ITER: int = 1000
+MODEL_TRAINER_SOLVER: str = "lbfgs"
+MODEL_TRAINER_C: float = 1.0
+MODEL_TRAINER_LEADERBOARD_FILE_NAME: str = "leaderboard.csv"
+MODEL_TRAINER_FEATURE_STATE_FILE_NAME: str = "feature_state.pkl"
+MODEL_TRAINER_LINEAR_MODEL_FILE_NAME: str = "linear_model.json"
+MODEL_TRAINER_BUNDLE_FILE_NAME: str = "model_bundle.bin"
+
+
+"""
+MODEL Evaluation related constants
+"""
+MODEL_BUCKET_NAME = "personality-classifier-model-bucket"
+MODEL_EVALUATION_DIR_NAME: str = "model_evaluation"
+MODEL_EVALUATION_PREDICTIONS_FILE_NAME: str = "challenger_predictions.npy"
+
+
+"""
+MODEL REGISTRY related constants start with MODEL_REGISTRY var name
+"""
+MODEL_REGISTRY_DIR_NAME: str = "registry"
+MODEL_REGISTRY_VERSIONS_DIR_NAME: str = "versions"
+MODEL_REGISTRY_POINTER_FILE_NAME: str = "production.json"
+MODEL_REGISTRY_MANIFEST_FILE_NAME: str = "manifest.json"
+MODEL_REGISTRY_FEATURE_STATE_FILE_NAME: str = "feature_state.pkl"
+
+
+"""
+Prediction service related constants
+"""
+APP_HOST: str = "0.0.0.0"
+APP_PORT: int = 5000
+ARROW_STREAM_MEDIA_TYPE: str = "application/vnd.apache.arrow.stream"
+
+
+"""
+Batch prediction related constants start with BATCH_PREDICTION var name
+"""
+BATCH_PREDICTION_CHUNK_ROWS: int = 100000
+
+
+"""
+Instrumentation related constants start with INSTRUMENTATION var name
+"""
+# Set to a directory to write a cProfile dump of every instrumented component call
+INSTRUMENTATION_PROFILE_DIR = os.getenv("PIPELINE_PROFILE_DIR")
+# Set to 1 to measure peak allocations with tracemalloc, which slows allocation down
+INSTRUMENTATION_TRACEMALLOC: bool = os.getenv("PIPELINE_TRACEMALLOC", "0") == "1"
+INSTRUMENTATION_RSS_SAMPLE_SECONDS: float = 0.05
+PIPELINE_METRICS_DIR_NAME: str = "pipeline_metrics"
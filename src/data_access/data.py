@@ -1,6 +1,7 @@
 import sys
 import pandas as pd
 import numpy as np
+from bson import ObjectId
 from typing import Optional
 
 from src.configuration.mongo_db_connection import MongoDBClient
@@ -21,9 +22,11 @@ class Data:
         except Exception as e:
             raise MyException(e, sys)
 
-    def export_collection_as_dataframe(self, collection_name: str, database_name: Optional[str] = None) -> pd.DataFrame:
+    def export_collection_as_dataframe(self, collection_name: str, database_name: Optional[str] = None,
+                                       after_id: Optional[str] = None) -> pd.DataFrame:
         """
-        Exports an entire MongoDB collection as a pandas DataFrame.
+        Exports an entire MongoDB collection as a pandas DataFrame, or only the documents inserted
+        after the one with _id after_id.
 
         Parameters:
         ----------
@@ -31,6 +34,9 @@ class Data:
             The name of the MongoDB collection to export.
         database_name : Optional[str]
             Name of the database (optional). Defaults to DATABASE_NAME.
+        after_id : Optional[str]
+            Hex string of an ObjectId. ObjectIds grow with insertion time, so the range query on the
+            _id index reads only the newer documents.
 
         Returns:
         -------
@@ -46,7 +52,8 @@ class Data:
 
             # Convert collection data to DataFrame and preprocess
             print("Fetching data from mongoDB")
-            df = pd.DataFrame(list(collection.find()))
+            query = {"_id": {"$gt": ObjectId(after_id)}} if after_id else {}
+            df = pd.DataFrame(list(collection.find(query)))
             print(f"Data fecthed with len: {len(df)}")
             if "id" in df.columns.to_list():
                 df = df.drop(columns=["id"], axis=1)
@@ -54,4 +61,20 @@ class Data:
             return df
 
         except Exception as e:
-            raise MyException(e, sys)
\ No newline at end of file
+            raise MyException(e, sys)
+
+    def collection_fingerprint(self, collection_name: str, database_name: Optional[str] = None) -> dict:
+        """
+        Cheap summary of a collection's contents: its document count and largest _id. Documents are
+        only ever inserted, and ObjectIds grow with insertion time, so new data changes it without
+        reading the collection.
+        """
+        try:
+            if database_name is None:
+                collection = self.mongo_client.database[collection_name]
+            else:
+                collection = self.mongo_client[database_name][collection_name]
+            last = collection.find_one(sort=[("_id", -1)], projection={"_id": 1})
+            return {"count": collection.count_documents({}), "last_id": str(last["_id"]) if last else None}
+        except Exception as e:
+            raise MyException(e, sys)
@@ -1,9 +1,16 @@
 from dataclasses import dataclass
+from typing import Optional
 
 @dataclass
 class DataIngestionArtifact:
     ingested_data_path: str
     bucket_name: str
+    new_row_count: Optional[int] = None
+    watermark: Optional[str] = None
+    # Production version this run updates on the new rows only, None when all data is retrained on;
+    # and the training state of the production version
+    base_version: Optional[str] = None
+    training_state: Optional[dict] = None
 
 @dataclass
 class DataValidationArtifact:
@@ -14,14 +21,22 @@ class DataValidationArtifact:
 @dataclass
 class DataCleaningArtifact:
     cleaned_data_file_path:str
+    cleaning_params_file_path: Optional[str] = None
 
 @dataclass
 class FeatureEngineeringArtifact:
     train_file_path: str
     test_file_path: str
-    time_alone_bins: list
-    scaler: object 
-    poly_features: object
+    feature_plan: object
+    scaler: object
+    # Training rows the production model is updated on in an incremental run
+    partition_file_path: Optional[str] = None
+    watermark: Optional[str] = None
+    # Production version whose feature plan and scaler were reused; None when they were refitted
+    base_version: Optional[str] = None
+    training_state: Optional[dict] = None
+    test_rows_file_path: Optional[str] = None
+    test_slices_file_path: Optional[str] = None
 
 @dataclass
 class ClassificationMetricArtifact:
@@ -29,15 +44,31 @@ class ClassificationMetricArtifact:
     f1_score:float
     precision_score:float
     recall_score:float
+    confusion_counts: Optional[list] = None
+    confidence_intervals: Optional[dict] = None
 
 @dataclass
 class ModelTrainerArtifact:
     trained_model_file_path:str 
     metric_artifact:ClassificationMetricArtifact
+    leaderboard_file_path: Optional[str] = None
+    linear_model_file_path: Optional[str] = None
+    bundle_file_path: Optional[str] = None
+    feature_state_file_path: Optional[str] = None
+    training_state: Optional[dict] = None
 
 @dataclass
 class ModelEvaluationArtifact:
     is_model_accepted:bool
     changed_accuracy:float
-    s3_model_path:str 
+    s3_model_path:Optional[str]
     trained_model_path:str
+    test_set_fingerprint: Optional[str] = None
+    trained_model_scores: Optional[dict] = None
+    trained_model_predictions_file_path: Optional[str] = None
+    production_pointer_etag: Optional[str] = None
+    feature_version: Optional[str] = None
+    data_fingerprint: Optional[dict] = None
+    bundle_file_path: Optional[str] = None
+    feature_state_file_path: Optional[str] = None
+    training_state: Optional[dict] = None
@@ -12,6 +12,10 @@ class TrainingPipelineConfig:
     latest_dir: str = os.path.join(ARTIFACT_DIR, DATA_INGESTION_LATEST_DIR_NAME)
     timestamp: str = TIMESTAMP
     latest: str = DATA_INGESTION_LATEST_DIR_NAME
+    # Last fingerprint and artifact of each training stage, used to skip stages that are up to date
+    pipeline_state_dir: str = os.path.join(latest_dir, PIPELINE_STATE_DIR_NAME)
+    # Per-run stage timings and component resource metrics
+    pipeline_metrics_dir: str = os.path.join(artifact_dir, PIPELINE_METRICS_DIR_NAME)
 
 training_pipeline_config: TrainingPipelineConfig = TrainingPipelineConfig()
 
@@ -34,6 +38,8 @@ class DataCleaningConfig:
     latest_cleaned_data_dir: str = os.path.join(latest_data_folder_name, DATA_CLEANING_CLEANED_DATA_DIR)
     cleaned_data_file_path: str = os.path.join(folder_name, cleaned_data_dir, DATA_CLEANING_CLEANED_FILE_NAME)
     latest_data_file_path: str = os.path.join(latest_cleaned_data_dir, DATA_CLEANING_CLEANED_FILE_NAME)
+    cleaning_params_file_path: str = os.path.join(folder_name, cleaned_data_dir, DATA_CLEANING_PARAMS_FILE_NAME)
+    latest_cleaning_params_file_path: str = os.path.join(latest_cleaned_data_dir, DATA_CLEANING_PARAMS_FILE_NAME)
 
 @dataclass
 class DataValidationConfig:
@@ -52,6 +58,10 @@ class FeatureEngineeringConfig:
     latest_train_dir: str = os.path.join(latest_folder_name, TRAIN_DIR_NAME)
     latest_test_dir: str = os.path.join(latest_folder_name, TEST_DIR_NAME)
     artifact_dir: str = os.path.join(latest_folder_name, FEATURE_ENGINEERING_ARTIFACT_DIR)
+    # Raw input columns and encoded target of the test rows, for models scored with their own bundle
+    test_rows_file_path: str = os.path.join(test_dir, TEST_ROWS_FILE_NAME)
+    # Cleaned values of the evaluation slice columns of the test rows
+    test_slices_file_path: str = os.path.join(test_dir, TEST_SLICES_FILE_NAME)
     split_size: float = SPLIT_SIZE
 
 @dataclass
@@ -61,6 +71,13 @@ class ModelTrainerConfig:
     latest_folder_name: str = os.path.join(training_pipeline_config.latest_dir, MODEL_TRAINER_DIR_NAME)
     trained_model_file_path: str = os.path.join(folder_name, MODEL_FILE_NAME)
     latest_trained_model_file_path: str = os.path.join(latest_folder_name, MODEL_FILE_NAME)
+    leaderboard_file_path: str = os.path.join(folder_name, MODEL_TRAINER_LEADERBOARD_FILE_NAME)
+    latest_leaderboard_file_path: str = os.path.join(latest_folder_name, MODEL_TRAINER_LEADERBOARD_FILE_NAME)
+    linear_model_file_path: str = os.path.join(folder_name, MODEL_TRAINER_LINEAR_MODEL_FILE_NAME)
+    latest_linear_model_file_path: str = os.path.join(latest_folder_name, MODEL_TRAINER_LINEAR_MODEL_FILE_NAME)
+    bundle_file_path: str = os.path.join(folder_name, MODEL_TRAINER_BUNDLE_FILE_NAME)
+    latest_bundle_file_path: str = os.path.join(latest_folder_name, MODEL_TRAINER_BUNDLE_FILE_NAME)
+    feature_state_file_path: str = os.path.join(folder_name, MODEL_TRAINER_FEATURE_STATE_FILE_NAME)
     max_iter: int = MODEL_TRAINER_MAX_ITER
     solver: str = MODEL_TRAINER_SOLVER
     c: float = MODEL_TRAINER_C
@@ -69,7 +86,39 @@ class ModelTrainerConfig:
 @dataclass
 class ModelEvaluationConfig:
     bucket_name: str = MODEL_BUCKET_NAME
+    folder_name: str = os.path.join(training_pipeline_config.artifact_dir, MODEL_EVALUATION_DIR_NAME)
+    # Challenger prediction of every test row, cached with its scores if it is promoted
+    predictions_file_path: str = os.path.join(folder_name, MODEL_EVALUATION_PREDICTIONS_FILE_NAME)
 
 @dataclass
 class ModelPusherConfig:
-    bucket_name: str = MODEL_BUCKET_NAME
\ No newline at end of file
+    bucket_name: str = MODEL_BUCKET_NAME
+
+@dataclass
+class ModelRegistryConfig:
+    bucket_name: str = MODEL_BUCKET_NAME
+    versions_dir: str = os.path.join(MODEL_REGISTRY_DIR_NAME, MODEL_REGISTRY_VERSIONS_DIR_NAME)
+    production_pointer_key: str = os.path.join(MODEL_REGISTRY_DIR_NAME, MODEL_REGISTRY_POINTER_FILE_NAME)
+    manifest_file_name: str = MODEL_REGISTRY_MANIFEST_FILE_NAME
+    model_file_name: str = MODEL_FILE_NAME
+    bundle_file_name: str = MODEL_TRAINER_BUNDLE_FILE_NAME
+    feature_state_file_name: str = MODEL_REGISTRY_FEATURE_STATE_FILE_NAME
+    # Single overwritten key used before the registry existed, read only when no version was promoted yet
+    legacy_model_key: str = os.path.join(training_pipeline_config.latest_dir, MODEL_TRAINER_DIR_NAME, MODEL_FILE_NAME)
+
+@dataclass
+class PersonalityPredictorConfig:
+    model_bucket_name: str = MODEL_BUCKET_NAME
+    # None serves the bundle the registry's production pointer refers to
+    model_file_path: str = None
+
+@dataclass
+class BatchPredictionConfig:
+    model_bucket_name: str = MODEL_BUCKET_NAME
+    # S3 key of the bundle to score with; None uses the registry's production bundle
+    model_file_path: str = None
+    # Local bundle file, used instead of S3 when set
+    local_bundle_file_path: str = None
+    chunk_rows: int = BATCH_PREDICTION_CHUNK_ROWS
+    # None uses one worker per CPU
+    n_workers: int = None
@@ -0,0 +1,221 @@
+import sys
+import json
+import hashlib
+from itertools import combinations, combinations_with_replacement
+from typing import Dict, List, Mapping
+
+import numpy as np
+
+from src.exception import MyException
+from src.logger import logging
+
+
+class FeaturePlan:
+    """
+    Compiles the declarative ``feature_engineering`` section of config/model.yaml
+    into a vectorized execution plan.
+
+    Every derived feature is lowered to nodes keyed by a canonical expression, so
+    identical subexpressions (e.g. a product that is both a named feature and a
+    polynomial term) are computed once. Only the nodes reachable from the
+    selected output features are kept, and each node runs as a single NumPy
+    operation over whole columns.
+    """
+
+    SUPPORTED_TYPES = ("ratio", "linear", "product", "quantile_bin", "polynomial")
+
+    def __init__(self, spec: dict):
+        try:
+            self.spec = spec
+            self.base_features: List[str] = list(spec["base_features"])
+            self.derived_features: List[dict] = list(spec.get("derived_features") or [])
+            self.bin_edges: Dict[str, List[float]] = {}
+            self._compile()
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    @classmethod
+    def from_config(cls, model_config: dict) -> "FeaturePlan":
+        return cls(spec=model_config["feature_engineering"])
+
+    @property
+    def version(self) -> str:
+        """Short content hash of the spec, used to tie trained models to the features they expect."""
+        payload = json.dumps(self.spec, sort_keys=True, default=str).encode()
+        return hashlib.sha1(payload).hexdigest()[:12]
+
+    def _compile(self) -> None:
+        self._nodes: List[tuple] = []
+        self._node_index: Dict[tuple, int] = {}
+        self._outputs: Dict[str, int] = {}
+        self._bin_specs: Dict[str, dict] = {}
+
+        for column in self.base_features:
+            self._outputs[column] = self._add_node(("column", column))
+
+        for feature in self.derived_features:
+            feature_type = feature["type"]
+            if feature_type not in self.SUPPORTED_TYPES:
+                raise ValueError(f"Unsupported feature type '{feature_type}' for feature '{feature['name']}'")
+            getattr(self, f"_compile_{feature_type}")(feature)
+
+        selected = self.spec.get("selected_features") or list(self._outputs)
+        unknown = [name for name in selected if name not in self._outputs]
+        if unknown:
+            raise ValueError(f"Selected features are not defined in the feature spec: {unknown}")
+        self.feature_names: List[str] = list(selected)
+        self._prune()
+
+    def _add_node(self, key: tuple) -> int:
+        if key not in self._node_index:
+            self._node_index[key] = len(self._nodes)
+            self._nodes.append(key)
+        return self._node_index[key]
+
+    def _ref(self, name: str) -> int:
+        if name not in self._outputs:
+            raise ValueError(f"Feature '{name}' is referenced before it is defined")
+        return self._outputs[name]
+
+    def _product(self, refs: List[int]) -> int:
+        return self._add_node(("product", tuple(sorted(refs))))
+
+    def _compile_ratio(self, feature: dict) -> None:
+        numerator = self._ref(feature["numerator"])
+        denominator = self._ref(feature["denominator"])
+        offset = float(feature.get("denominator_offset", 0.0))
+        if offset:
+            denominator = self._add_node(("offset", denominator, offset))
+        self._outputs[feature["name"]] = self._add_node(("ratio", numerator, denominator))
+
+    def _compile_linear(self, feature: dict) -> None:
+        divisor = float(feature.get("divisor", 1.0))
+        weights = tuple(sorted((self._ref(name), float(weight) / divisor)
+                               for name, weight in feature["weights"].items()))
+        self._outputs[feature["name"]] = self._add_node(("linear", weights))
+
+    def _compile_product(self, feature: dict) -> None:
+        self._outputs[feature["name"]] = self._product([self._ref(name) for name in feature["inputs"]])
+
+    def _compile_quantile_bin(self, feature: dict) -> None:
+        name = feature["name"]
+        labels = feature["labels"]
+        if len(labels) != int(feature["quantiles"]):
+            raise ValueError(f"Feature '{name}' needs one label per quantile bin")
+        self._bin_specs[name] = feature
+        bin_index = self._add_node(("bin", self._ref(feature["input"]), name))
+        start = 1 if feature.get("drop_first", True) else 0
+        for level in range(start, len(labels)):
+            self._outputs[f"{name}_{labels[level]}"] = self._add_node(("equals", bin_index, level))
+
+    def _compile_polynomial(self, feature: dict) -> None:
+        inputs = feature["inputs"]
+        combine = combinations if feature.get("interaction_only", False) else combinations_with_replacement
+        for degree in range(2, int(feature.get("degree", 2)) + 1):
+            for term in combine(inputs, degree):
+                counts = {name: term.count(name) for name in dict.fromkeys(term)}
+                term_name = " ".join(name if power == 1 else f"{name}^{power}" for name, power in counts.items())
+                self._outputs[term_name] = self._product([self._ref(name) for name in term])
+
+    def _dependencies(self, node: tuple) -> List[int]:
+        kind = node[0]
+        if kind == "column":
+            return []
+        if kind == "product":
+            return list(node[1])
+        if kind == "linear":
+            return [ref for ref, _ in node[1]]
+        if kind == "ratio":
+            return [node[1], node[2]]
+        return [node[1]]
+
+    def _prune(self) -> None:
+        """Keeps only the nodes needed for the selected features; nodes are already topologically ordered."""
+        needed = set()
+        stack = [self._outputs[name] for name in self.feature_names]
+        while stack:
+            ref = stack.pop()
+            if ref not in needed:
+                needed.add(ref)
+                stack.extend(self._dependencies(self._nodes[ref]))
+        self._steps: List[int] = sorted(needed)
+        self.input_columns: List[str] = [self._nodes[ref][1] for ref in self._steps if self._nodes[ref][0] == "column"]
+        self._active_bins: List[str] = [self._nodes[ref][2] for ref in self._steps if self._nodes[ref][0] == "bin"]
+        logging.info(f"Feature plan compiled: {len(self.feature_names)} features from "
+                     f"{len(self._steps)} of {len(self._nodes)} nodes")
+
+    def fit(self, columns: Mapping) -> "FeaturePlan":
+        """
+        Learns the data-dependent parameters of the plan (quantile bin edges). Later values
+        outside the fitted edges get 0 for every dummy of the bin, as pd.cut + get_dummies did.
+        """
+        try:
+            values = self._evaluate(columns, fitting=True)
+            for name in self._active_bins:
+                spec = self._bin_specs[name]
+                source = values[self._ref(spec["input"])]
+                quantiles = np.linspace(0, 1, int(spec["quantiles"]) + 1)
+                self.bin_edges[name] = np.nanquantile(source, quantiles).tolist()
+            return self
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def transform(self, columns: Mapping) -> np.ndarray:
+        """
+        Computes the selected features for a DataFrame or a mapping of column name to array.
+
+        :return: float64 matrix of shape (n_rows, len(feature_names))
+        """
+        try:
+            values = self._evaluate(columns)
+            return np.column_stack([values[self._outputs[name]] for name in self.feature_names])
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _evaluate(self, columns: Mapping, fitting: bool = False) -> Dict[int, np.ndarray]:
+        values: Dict[int, np.ndarray] = {}
+        for ref in self._steps:
+            node = self._nodes[ref]
+            kind = node[0]
+            if fitting and (kind in ("bin", "equals") or
+                            any(dep not in values for dep in self._dependencies(node))):
+                # Bin edges are not known yet while fitting
+                continue
+            if kind == "column":
+                values[ref] = np.asarray(columns[node[1]], dtype=np.float64)
+            elif kind == "offset":
+                values[ref] = values[node[1]] + node[2]
+            elif kind == "ratio":
+                values[ref] = values[node[1]] / values[node[2]]
+            elif kind == "product":
+                result = values[node[1][0]]
+                for other in node[1][1:]:
+                    result = result * values[other]
+                values[ref] = result
+            elif kind == "linear":
+                result = np.zeros_like(values[node[1][0][0]])
+                for other, weight in node[1]:
+                    result += weight * values[other]
+                values[ref] = result
+            elif kind == "bin":
+                # Matches pd.cut(..., include_lowest=True): bins are right-closed, and values outside
+                # the fitted edges or missing fall in no bin (-1), so all of their dummies are 0
+                edges = np.asarray(self.bin_edges[node[2]])
+                source = values[node[1]]
+                bins = np.searchsorted(edges[1:-1], source, side="left")
+                values[ref] = np.where((source >= edges[0]) & (source <= edges[-1]), bins, -1)
+            elif kind == "equals":
+                values[ref] = (values[node[1]] == node[2]).astype(np.float64)
+        return values
+
+    def to_dict(self) -> dict:
+        return {"spec": self.spec, "bin_edges": self.bin_edges}
+
+    @classmethod
+    def from_dict(cls, payload: dict) -> "FeaturePlan":
+        plan = cls(spec=payload["spec"])
+        plan.bin_edges = {name: list(edges) for name, edges in payload["bin_edges"].items()}
+        return plan
+
+    def __repr__(self):
+        return f"FeaturePlan(version={self.version}, features={len(self.feature_names)})"
@@ -0,0 +1,140 @@
+import sys
+import json
+from typing import List, Mapping, Optional
+
+import numpy as np
+
+from src.exception import MyException
+from src.entity.feature_plan import FeaturePlan
+
+
+class LinearScorer:
+    """
+    Dependency-free scorer for binary logistic models (LogisticRegression, SGDClassifier with
+    loss="log_loss").
+
+    The exported bundle is a small JSON document holding the coefficients, intercept, class
+    mapping, the fitted feature plan and the scaler statistics, so serving only needs NumPy to
+    go from raw columns to predictions and never unpickles or imports sklearn.
+    """
+
+    FORMAT_VERSION = 1
+    # Models whose probability is the sigmoid of the decision value, as predict_proba assumes. Other
+    # linear models (e.g. hinge-loss SGD) predict the same labels but not the same probabilities.
+    # Matched by name so serving never imports sklearn
+    SUPPORTED_MODELS = {"LogisticRegression": None, "SGDClassifier": "log_loss"}
+
+    def __init__(self, coef: np.array, intercept: float, classes: list, feature_plan: FeaturePlan,
+                 scaler_mean: np.array, scaler_scale: np.array, class_labels: Optional[list] = None,
+                 metadata: Optional[dict] = None):
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.classes = np.asarray(classes)
+        self.class_labels = class_labels
+        self.feature_plan = feature_plan
+        self.scaler_mean = np.asarray(scaler_mean, dtype=np.float64)
+        self.scaler_scale = np.asarray(scaler_scale, dtype=np.float64)
+        self.metadata = metadata or {}
+
+    @classmethod
+    def is_supported(cls, model: object) -> bool:
+        model_name = type(model).__name__
+        if model_name not in cls.SUPPORTED_MODELS:
+            return False
+        loss = cls.SUPPORTED_MODELS[model_name]
+        if loss is not None and getattr(model, "loss", None) != loss:
+            return False
+        coef = getattr(model, "coef_", None)
+        return coef is not None and coef.shape[0] == 1 and len(getattr(model, "classes_", [])) == 2
+
+    @classmethod
+    def from_model(cls, model: object, feature_plan: FeaturePlan, scaler: object,
+                   class_labels: Optional[list] = None, metadata: Optional[dict] = None) -> "LinearScorer":
+        try:
+            if not cls.is_supported(model):
+                raise ValueError(f"{type(model).__name__} is not a binary logistic classifier")
+            return cls(coef=model.coef_.ravel(), intercept=model.intercept_[0], classes=model.classes_.tolist(),
+                       feature_plan=feature_plan, scaler_mean=scaler.mean_, scaler_scale=scaler.scale_,
+                       class_labels=class_labels,
+                       metadata={"model_type": type(model).__name__, **(metadata or {})})
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def to_dict(self) -> dict:
+        return {
+            "format_version": self.FORMAT_VERSION,
+            "coef": self.coef.tolist(),
+            "intercept": self.intercept,
+            "classes": self.classes.tolist(),
+            "class_labels": self.class_labels,
+            "feature_names": self.feature_plan.feature_names,
+            "feature_plan": self.feature_plan.to_dict(),
+            "scaler": {"mean": self.scaler_mean.tolist(), "scale": self.scaler_scale.tolist()},
+            "metadata": self.metadata,
+        }
+
+    @classmethod
+    def from_dict(cls, payload: dict) -> "LinearScorer":
+        try:
+            if payload.get("format_version") != cls.FORMAT_VERSION:
+                raise ValueError(f"Unsupported linear model format {payload.get('format_version')}")
+            return cls(coef=payload["coef"], intercept=payload["intercept"], classes=payload["classes"],
+                       feature_plan=FeaturePlan.from_dict(payload["feature_plan"]),
+                       scaler_mean=payload["scaler"]["mean"], scaler_scale=payload["scaler"]["scale"],
+                       class_labels=payload.get("class_labels"), metadata=payload.get("metadata"))
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def save(self, file_path: str) -> None:
+        try:
+            with open(file_path, "w") as file_obj:
+                # json writes floats with repr, so coefficients round-trip exactly
+                json.dump(self.to_dict(), file_obj)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    @classmethod
+    def load(cls, file_path: str) -> "LinearScorer":
+        try:
+            with open(file_path, "r") as file_obj:
+                return cls.from_dict(json.load(file_obj))
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    @property
+    def feature_names(self) -> List[str]:
+        return self.feature_plan.feature_names
+
+    def transform(self, columns: Mapping) -> np.array:
+        """Raw cleaned columns -> scaled feature matrix, same arithmetic as StandardScaler.transform."""
+        features = self.feature_plan.transform(columns)
+        features -= self.scaler_mean
+        features /= self.scaler_scale
+        return features
+
+    def decision_function(self, features: np.array) -> np.array:
+        return features @ self.coef + self.intercept
+
+    def contributions(self, features: np.array) -> np.array:
+        """
+        Per-feature contribution of each row to its decision value: coef x scaled feature. Each row
+        plus the intercept sums to decision_function, positive values pushing towards classes[1].
+        """
+        return features * self.coef
+
+    def predict_proba(self, features: np.array) -> np.array:
+        """Probability of classes[1] for each row of a scaled feature matrix."""
+        return 1.0 / (1.0 + np.exp(-self.decision_function(features)))
+
+    def predict(self, features: np.array) -> np.array:
+        return self.classes[(self.decision_function(features) > 0).astype(np.int64)]
+
+    def predict_labels(self, features: np.array) -> np.array:
+        """Predictions mapped to the original target labels when a class mapping was exported."""
+        predictions = (self.decision_function(features) > 0).astype(np.int64)
+        if self.class_labels is None:
+            return self.classes[predictions]
+        return np.asarray(self.class_labels, dtype=object)[predictions]
+
+    def __repr__(self):
+        return f"LinearScorer({self.metadata.get('model_type')}, features={len(self.coef)})"
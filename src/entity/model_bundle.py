@@ -0,0 +1,357 @@
+import sys
+import json
+import pickle
+import struct
+from typing import Dict, Mapping, Optional
+
+import numpy as np
+
+from src.exception import MyException
+from src.entity.feature_plan import FeaturePlan
+from src.entity.linear_scorer import LinearScorer
+
+BUNDLE_MAGIC = b"PCBUNDLE"
+BUNDLE_FORMAT_VERSION = 1
+# magic, format version, header length
+_PREFIX = struct.Struct("<8sIQ")
+_ALIGNMENT = 64
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+class ModelBundle:
+    """
+    Everything needed to go from a raw record to a prediction, in one object: the cleaning
+    parameters, the fitted feature plan, the scaler statistics and the model.
+
+    Binary layout (little endian)::
+
+        [0:8]    magic b"PCBUNDLE"
+        [8:12]   uint32 format version
+        [12:20]  uint64 header length H
+        [20:20+H] UTF-8 JSON header: cleaning params, feature plan, model description and the
+                 offset/dtype/shape of every array in the data section
+        data section, starting at the next 64-byte boundary: the arrays (float64 unless the
+                 header says otherwise), each 64-byte aligned
+
+    Arrays are read with np.frombuffer straight from the loaded bytes, so parsing costs one JSON
+    decode of a few kilobytes. Linear models need neither sklearn nor pickle to load; any other
+    model is embedded as a pickle in the data section.
+
+    Optionally the bundle also carries a lookup table with the class and probability of every
+    combination of in-domain raw inputs, indexed by their mixed-radix encoding. Records inside
+    the domain are then answered with an array lookup; the others go through the model.
+    """
+
+    def __init__(self, cleaning_params: dict, feature_plan: FeaturePlan, arrays: Dict[str, np.array],
+                 model_info: dict, estimator: object = None, metadata: Optional[dict] = None,
+                 lookup: Optional[dict] = None):
+        try:
+            self.cleaning_params = cleaning_params
+            self.feature_plan = feature_plan
+            self.arrays = arrays
+            self.model_info = model_info
+            self.metadata = metadata or {}
+            self.lookup = lookup
+            self.class_labels = cleaning_params.get("target_classes")
+            self.scaler_mean = arrays["scaler_mean"]
+            self.scaler_scale = arrays["scaler_scale"]
+            if model_info["kind"] == "linear":
+                self.model = LinearScorer(coef=arrays["coef"], intercept=model_info["intercept"],
+                                          classes=model_info["classes"], feature_plan=feature_plan,
+                                          scaler_mean=self.scaler_mean, scaler_scale=self.scaler_scale,
+                                          class_labels=self.class_labels,
+                                          metadata={"model_type": model_info["model_type"]})
+            else:
+                self.model = estimator
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    @classmethod
+    def build(cls, cleaning_params: dict, feature_plan: FeaturePlan, scaler: object, model: object,
+              metadata: Optional[dict] = None) -> "ModelBundle":
+        try:
+            arrays = {"scaler_mean": np.asarray(scaler.mean_, dtype=np.float64),
+                      "scaler_scale": np.asarray(scaler.scale_, dtype=np.float64)}
+            model_info = {"model_type": type(model).__name__, "classes": model.classes_.tolist()}
+            estimator = None
+            if LinearScorer.is_supported(model):
+                arrays["coef"] = np.asarray(model.coef_.ravel(), dtype=np.float64)
+                model_info.update(kind="linear", intercept=float(model.intercept_[0]))
+            else:
+                model_info["kind"] = "pickle"
+                estimator = model
+            return cls(cleaning_params=cleaning_params, feature_plan=feature_plan, arrays=arrays,
+                       model_info=model_info, estimator=estimator, metadata=metadata)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def to_bytes(self) -> bytes:
+        try:
+            sections = {name: np.ascontiguousarray(array) for name, array in self.arrays.items()}
+            if self.model_info["kind"] == "pickle":
+                sections["model_pickle"] = np.frombuffer(pickle.dumps(self.model), dtype=np.uint8)
+
+            layout, offset = {}, 0
+            for name, array in sections.items():
+                offset = _aligned(offset)
+                layout[name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+                offset += array.nbytes
+
+            header = json.dumps({
+                "cleaning": self.cleaning_params,
+                "feature_plan": self.feature_plan.to_dict(),
+                "model": self.model_info,
+                "metadata": self.metadata,
+                "lookup": self.lookup,
+                "arrays": layout,
+            }).encode()
+            data_start = _aligned(_PREFIX.size + len(header))
+            buffer = bytearray(data_start + offset)
+            _PREFIX.pack_into(buffer, 0, BUNDLE_MAGIC, BUNDLE_FORMAT_VERSION, len(header))
+            buffer[_PREFIX.size:_PREFIX.size + len(header)] = header
+            for name, array in sections.items():
+                start = data_start + layout[name]["offset"]
+                buffer[start:start + array.nbytes] = array.tobytes()
+            return bytes(buffer)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    @classmethod
+    def from_bytes(cls, buffer: bytes) -> "ModelBundle":
+        try:
+            magic, format_version, header_length = _PREFIX.unpack_from(buffer, 0)
+            if magic != BUNDLE_MAGIC:
+                raise ValueError("Not a model bundle")
+            if format_version != BUNDLE_FORMAT_VERSION:
+                raise ValueError(f"Unsupported model bundle format {format_version}")
+            header = json.loads(bytes(buffer[_PREFIX.size:_PREFIX.size + header_length]))
+            data_start = _aligned(_PREFIX.size + header_length)
+
+            arrays = {}
+            for name, spec in header["arrays"].items():
+                dtype = np.dtype(spec["dtype"])
+                count = int(np.prod(spec["shape"], dtype=np.int64))
+                arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count,
+                                             offset=data_start + spec["offset"]).reshape(spec["shape"])
+            estimator = None
+            if header["model"]["kind"] == "pickle":
+                estimator = pickle.loads(arrays.pop("model_pickle").tobytes())
+            return cls(cleaning_params=header["cleaning"], feature_plan=FeaturePlan.from_dict(header["feature_plan"]),
+                       arrays=arrays, model_info=header["model"], estimator=estimator, metadata=header["metadata"],
+                       lookup=header.get("lookup"))
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def save(self, file_path: str) -> None:
+        try:
+            with open(file_path, "wb") as file_obj:
+                file_obj.write(self.to_bytes())
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    @classmethod
+    def load(cls, file_path: str) -> "ModelBundle":
+        try:
+            with open(file_path, "rb") as file_obj:
+                return cls.from_bytes(file_obj.read())
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def clean(self, columns: Mapping) -> Dict[str, np.array]:
+        """
+        Applies the training-time cleaning to raw columns: outlier caps, then median / mode
+        imputation, then the dummy columns kept by get_dummies(drop_first=True).
+        """
+        try:
+            cleaned = {}
+            for col, (lower, upper) in self.cleaning_params["caps"].items():
+                values = np.clip(np.asarray(columns[col], dtype=np.float64), lower, upper)
+                cleaned[col] = np.where(np.isnan(values), self.cleaning_params["medians"][col], values)
+            for col, levels in self.cleaning_params["dummy_levels"].items():
+                values = np.asarray(columns[col], dtype=object)
+                # None and NaN are both missing; NaN is the only value not equal to itself
+                missing = (values == None) | (values != values)  # noqa: E711
+                values = np.where(missing, self.cleaning_params["modes"][col], values).astype(str)
+                for level in levels:
+                    cleaned[f"{col}_{level}"] = (values == level).astype(np.float64)
+            return cleaned
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def transform(self, columns: Mapping) -> np.array:
+        """Raw columns -> scaled feature matrix."""
+        try:
+            features = self.feature_plan.transform(self.clean(columns))
+            features -= self.scaler_mean
+            features /= self.scaler_scale
+            return features
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _model_scores(self, columns: Mapping) -> tuple:
+        """Class indices and probabilities of the second class from one transform of raw columns."""
+        features = self.transform(columns)
+        if self.model_info["kind"] == "linear":
+            decision = self.model.decision_function(features)
+            return (self.model.classes[(decision > 0).astype(np.int64)].astype(np.int64),
+                    1.0 / (1.0 + np.exp(-decision)))
+        return self.model.predict(features).astype(np.int64), self.model.predict_proba(features)[:, 1]
+
+    def _model_class_indices(self, columns: Mapping) -> np.array:
+        return self.model.predict(self.transform(columns)).astype(np.int64)
+
+    def _model_probabilities(self, columns: Mapping) -> np.array:
+        features = self.transform(columns)
+        if self.model_info["kind"] == "linear":
+            return self.model.predict_proba(features)
+        return self.model.predict_proba(features)[:, 1]
+
+    def build_lookup_table(self, numerical_bounds: Dict[str, list], categorical_levels: Dict[str, list],
+                           chunk_size: int = 100000) -> None:
+        """
+        Precomputes the class and probability of every combination of integer numerical values within
+        numerical_bounds and categorical values in categorical_levels, in mixed-radix order.
+        """
+        try:
+            columns = list(numerical_bounds) + list(categorical_levels)
+            radices = [int(high) - int(low) + 1 for low, high in numerical_bounds.values()] + \
+                      [len(levels) for levels in categorical_levels.values()]
+            n_combinations = int(np.prod(radices, dtype=np.int64))
+            lookup_class = np.empty(n_combinations, dtype=np.uint8)
+            lookup_proba = np.empty(n_combinations, dtype=np.float32)
+            n_numerical = len(numerical_bounds)
+            for start in range(0, n_combinations, chunk_size):
+                digits = np.unravel_index(np.arange(start, min(start + chunk_size, n_combinations)), radices)
+                chunk = {}
+                for position, (column, (low, _)) in enumerate(numerical_bounds.items()):
+                    chunk[column] = (digits[position] + int(low)).astype(np.float64)
+                for position, (column, levels) in enumerate(categorical_levels.items()):
+                    chunk[column] = np.asarray(levels, dtype=object)[digits[n_numerical + position]]
+                class_indices, probabilities = self._model_scores(chunk)
+                lookup_proba[start:start + len(probabilities)] = probabilities
+                lookup_class[start:start + len(probabilities)] = class_indices
+
+            self.arrays["lookup_class"] = lookup_class
+            self.arrays["lookup_proba"] = lookup_proba
+            self.lookup = {"columns": columns, "radices": radices,
+                           "numerical_bounds": {column: [int(low), int(high)] for column, (low, high) in numerical_bounds.items()},
+                           "categorical_levels": {column: [str(level) for level in levels] for column, levels in categorical_levels.items()}}
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def lookup_index(self, columns: Mapping) -> tuple:
+        """
+        Mixed-radix index of each record in the lookup table.
+
+        :return: (index array, mask of records inside the table's domain)
+        """
+        digits, in_domain = [], None
+        for column, (low, high) in self.lookup["numerical_bounds"].items():
+            values = np.asarray(columns[column], dtype=np.float64)
+            valid = (values >= low) & (values <= high) & (values == np.rint(values))
+            digits.append(np.where(valid, values - low, 0).astype(np.int64))
+            in_domain = valid if in_domain is None else in_domain & valid
+        for column, levels in self.lookup["categorical_levels"].items():
+            values = np.asarray(columns[column], dtype=object)
+            digit = np.full(len(values), -1, dtype=np.int64)
+            for position, level in enumerate(levels):
+                digit[values == level] = position
+            valid = digit >= 0
+            digits.append(np.where(valid, digit, 0))
+            in_domain = in_domain & valid
+        return np.ravel_multi_index(digits, self.lookup["radices"]), in_domain
+
+    def _lookup_or_model(self, columns: Mapping, table_name: str, fallback) -> np.array:
+        index, in_domain = self.lookup_index(columns)
+        table = self.arrays[table_name]
+        if in_domain.all():
+            return table[index]
+        result = np.empty(len(index), dtype=np.float64)
+        result[in_domain] = table[index[in_domain]]
+        outside = ~in_domain
+        result[outside] = fallback({column: np.asarray(values, dtype=object)[outside] for column, values in columns.items()})
+        return result
+
+    def predict_class_indices(self, columns: Mapping) -> np.array:
+        """Index into class_labels of the prediction for raw columns."""
+        try:
+            if self.lookup is None:
+                return self._model_class_indices(columns)
+            return self._lookup_or_model(columns, "lookup_class", self._model_class_indices).astype(np.int64)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def predict_proba(self, columns: Mapping) -> np.array:
+        """Probability of the second class (e.g. Introvert) for raw columns."""
+        try:
+            if self.lookup is None:
+                return self._model_probabilities(columns)
+            return self._lookup_or_model(columns, "lookup_proba", self._model_probabilities)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def predict(self, columns: Mapping) -> np.array:
+        """Predicted target labels (e.g. Extrovert / Introvert) for raw columns."""
+        try:
+            predictions = self.predict_class_indices(columns)
+            if self.class_labels is None:
+                return predictions
+            return np.asarray(self.class_labels, dtype=object)[predictions]
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def predict_with_proba(self, columns: Mapping) -> tuple:
+        """
+        Predicted target labels and probability of the second class for raw columns, from a single
+        transform or table lookup where calling predict and predict_proba would make two.
+        """
+        try:
+            if self.lookup is None:
+                class_indices, probabilities = self._model_scores(columns)
+            else:
+                index, in_domain = self.lookup_index(columns)
+                class_indices = self.arrays["lookup_class"][index].astype(np.int64)
+                probabilities = self.arrays["lookup_proba"][index].astype(np.float64)
+                outside = ~in_domain
+                if outside.any():
+                    class_indices[outside], probabilities[outside] = self._model_scores(
+                        {column: np.asarray(values, dtype=object)[outside] for column, values in columns.items()})
+            if self.class_labels is None:
+                return class_indices, probabilities
+            return np.asarray(self.class_labels, dtype=object)[class_indices], probabilities
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def explain(self, columns: Mapping) -> dict:
+        """
+        Explains the linear model's predictions for a whole batch: the contribution of every
+        engineered feature (coef x scaled feature) in one vectorized pass over the feature matrix.
+
+        :return: {"feature_names", "contributions" (rows x features), "intercept", "probabilities"
+                  (of the second class), "predictions" (labels), "positive_class"}
+        """
+        try:
+            if self.model_info["kind"] != "linear":
+                raise ValueError(f"Explanations are only available for linear models, not {self.model_info['model_type']}")
+            contributions = self.model.contributions(self.transform(columns))
+            decision = contributions.sum(axis=1) + self.model.intercept
+            predictions = self.model.classes[(decision > 0).astype(np.int64)]
+            positive_class = self.model.classes[1]
+            if self.class_labels is not None:
+                predictions = np.asarray(self.class_labels, dtype=object)[predictions.astype(np.int64)]
+                positive_class = self.class_labels[int(positive_class)]
+            return {"feature_names": self.feature_plan.feature_names,
+                    "contributions": contributions,
+                    "intercept": self.model.intercept,
+                    "probabilities": 1.0 / (1.0 + np.exp(-decision)),
+                    "predictions": predictions,
+                    "positive_class": positive_class}
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def __repr__(self):
+        return (f"ModelBundle({self.model_info['model_type']}, kind={self.model_info['kind']}, "
+                f"features={self.feature_plan.version})")
@@ -0,0 +1,206 @@
+import sys
+import json
+import posixpath
+from datetime import datetime
+from typing import Optional, Tuple
+
+import dill
+from botocore.exceptions import ClientError
+
+from src.configuration.aws_connection import buckets
+from src.entity.config_entity import ModelRegistryConfig
+from src.exception import MyException
+from src.logger import logging
+from src.utils.main_utils import file_fingerprint
+
+
+class ModelRegistry:
+    """
+    Versioned model store in the model bucket.
+
+    Every pushed model gets an immutable prefix ``registry/versions/<version>/`` holding the model
+    object exactly as trained and a manifest with its metrics, data fingerprint and feature-spec
+    version. ``registry/production.json`` is a small pointer to the production version; promotion
+    and rollback rewrite only the pointer, with a conditional put so two concurrent promotions
+    cannot silently overwrite each other, and readers resolve the production model with one GET.
+    """
+
+    def __init__(self, model_registry_config: ModelRegistryConfig = None, client: buckets = None):
+        try:
+            self.config = model_registry_config or ModelRegistryConfig()
+            self.client = client or buckets()
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def version_key(self, version: str, file_name: str) -> str:
+        return posixpath.join(self.config.versions_dir, version, file_name)
+
+    def read_production_pointer(self) -> Tuple[Optional[dict], Optional[str]]:
+        """
+        Output      :   Returns (pointer dict, pointer ETag), or (None, None) before the first promotion
+        """
+        try:
+            response = self.client.s3_client.get_object(Bucket=self.config.bucket_name,
+                                                        Key=self.config.production_pointer_key)
+            return json.loads(response["Body"].read()), response["ETag"]
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None, None
+            raise MyException(e, sys) from e
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def get_production_model_key(self) -> Optional[str]:
+        """
+        Resolves the S3 key of the production model, falling back to the pre-registry key.
+        """
+        try:
+            pointer, _ = self.read_production_pointer()
+            if pointer is not None:
+                return pointer["model_key"]
+            if self.client.head_object(bucket=self.config.bucket_name, key=self.config.legacy_model_key) is not None:
+                return self.config.legacy_model_key
+            return None
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def get_production_manifest(self) -> Optional[dict]:
+        """
+        Manifest of the production version, or None before the first promotion.
+        """
+        try:
+            pointer, _ = self.read_production_pointer()
+            return self.read_manifest(pointer["version"]) if pointer is not None else None
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def read_manifest(self, version: str) -> dict:
+        try:
+            body = self.client.download_file(bucket=self.config.bucket_name, as_object=True,
+                                             key=self.version_key(version, self.config.manifest_file_name))
+            return json.loads(body)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def load_feature_state(self, manifest: dict) -> Optional[dict]:
+        """
+        The fitted feature plan and scaler a version was trained with, or None when it has none.
+        """
+        try:
+            if not manifest.get("feature_state_key"):
+                return None
+            return dill.loads(self.client.download_file(bucket=self.config.bucket_name,
+                                                        key=manifest["feature_state_key"], as_object=True))
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def register_model(self, model_file_path: str, metadata: dict, bundle_file_path: Optional[str] = None,
+                       feature_state_file_path: Optional[str] = None) -> dict:
+        """
+        Method Name :   register_model
+        Description :   This function streams the model file, and the serving bundle and the fitted feature
+                        plan and scaler when given, unchanged to a new immutable version and writes its
+                        manifest. The version id is the push time plus a content hash
+
+        Output      :   Returns the manifest of the new version
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            model_sha256 = file_fingerprint(model_file_path)
+            version = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{model_sha256[:12]}"
+            model_key = self.version_key(version, self.config.model_file_name)
+            if self.client.head_object(bucket=self.config.bucket_name, key=model_key) is not None:
+                raise Exception(f"Model version {version} is already registered")
+
+            model_metadata = self.client.upload_file_stream(bucket=self.config.bucket_name, key=model_key,
+                                                            file_path=model_file_path)
+            bundle_key = None
+            if bundle_file_path is not None:
+                bundle_key = self.version_key(version, self.config.bundle_file_name)
+                self.client.upload_file_stream(bucket=self.config.bucket_name, key=bundle_key, file_path=bundle_file_path)
+            feature_state_key = None
+            if feature_state_file_path is not None:
+                feature_state_key = self.version_key(version, self.config.feature_state_file_name)
+                self.client.upload_file_stream(bucket=self.config.bucket_name, key=feature_state_key,
+                                               file_path=feature_state_file_path)
+            manifest = {
+                "version": version,
+                "model_key": model_key,
+                "model_etag": model_metadata["ETag"],
+                "model_sha256": model_sha256,
+                "bundle_key": bundle_key,
+                "feature_state_key": feature_state_key,
+                "created_at": datetime.now().isoformat(),
+                **metadata,
+            }
+            self.client.upload_file(bucket=self.config.bucket_name,
+                                    key=self.version_key(version, self.config.manifest_file_name),
+                                    body=json.dumps(manifest, indent=4).encode())
+            logging.info(f"Registered model version {version}")
+            return manifest
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def promote(self, manifest: dict, expected_pointer_etag: Optional[str]) -> dict:
+        """
+        Method Name :   promote
+        Description :   This function points production at a registered version. The pointer is only
+                        replaced if it still has the ETag read before the decision to promote (or still
+                        does not exist), so a concurrent promotion makes this one fail instead of being lost
+
+        Output      :   Returns the new production pointer
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            current, _ = self.read_production_pointer()
+            history = self.promotion_history(current) + [current["version"]] if current else []
+            return self._write_production_pointer(manifest, history, expected_pointer_etag)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    @staticmethod
+    def promotion_history(pointer: Optional[dict]) -> list:
+        """Versions that were in production before the pointer's one, oldest first."""
+        if pointer is None:
+            return []
+        if "history" in pointer:
+            return list(pointer["history"])
+        # Pointers written before the history was kept only know the version they replaced
+        return [pointer["previous_version"]] if pointer.get("previous_version") else []
+
+    def _write_production_pointer(self, manifest: dict, history: list, expected_pointer_etag: Optional[str]) -> dict:
+        try:
+            pointer = {
+                "version": manifest["version"],
+                "model_key": manifest["model_key"],
+                "model_etag": manifest["model_etag"],
+                "bundle_key": manifest.get("bundle_key"),
+                "feature_version": manifest.get("feature_version"),
+                "previous_version": history[-1] if history else None,
+                "history": history,
+                "promoted_at": datetime.now().isoformat(),
+            }
+            self.client.put_object_conditional(bucket=self.config.bucket_name, key=self.config.production_pointer_key,
+                                               body=json.dumps(pointer, indent=4).encode(),
+                                               if_match=expected_pointer_etag)
+            logging.info(f"Promoted model version {manifest['version']} to production")
+            return pointer
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def rollback(self) -> dict:
+        """
+        Points production back at the version it replaced, and takes that version off the promotion
+        history, so rolling back again goes one more version back instead of re-promoting this one.
+        """
+        try:
+            pointer, pointer_etag = self.read_production_pointer()
+            history = self.promotion_history(pointer)
+            if not history:
+                raise Exception("No previous production version to roll back to")
+            target_version = history.pop()
+            pointer = self._write_production_pointer(self.read_manifest(target_version), history, pointer_etag)
+            logging.info(f"Rolled production back to model version {target_version}")
+            return pointer
+        except Exception as e:
+            raise MyException(e, sys) from e
@@ -1,28 +1,56 @@
 from src.cloud_storage.aws_storage import SimpleStorageService
 from src.exception import MyException
-from src.entity.estimator import MyModel
+from src.entity.config_entity import ModelRegistryConfig
+from src.entity.model_registry import ModelRegistry
 import sys
-from pandas import DataFrame
+import threading
+from typing import Mapping, Optional
 from src.logger import logging
-import pandas as pd
-from sklearn.preprocessing import PolynomialFeatures, StandardScaler
+import numpy as np
 
 
 class Proj1Estimator:
     """
     This class is used to save and retrieve our model from s3 bucket and to do prediction
+
+    The model is loaded lazily and cached in-process. With start_polling, a background thread
+    checks the ETag of the production pointer (or of model_path) with a HEAD request and, when
+    it changed, loads the new model off the request path and swaps it in atomically: the model
+    and its version are replaced together as one tuple, so a prediction always runs on one
+    complete model and requests never wait on a load.
     """
 
-    def __init__(self,bucket_name,model_path,):
+    def __init__(self,bucket_name,model_path: Optional[str]=None,):
         """
         :param bucket_name: Name of your model bucket
-        :param model_path: Location of your model in bucket
+        :param model_path: Location of your model in bucket. By default the bundle of the
+                           registry's production version is used
         """
         self.bucket_name = bucket_name
         self.s3 = SimpleStorageService()
         self.model_path = model_path
-        self.loaded_model:MyModel=None
+        self.registry = ModelRegistry(ModelRegistryConfig(bucket_name=bucket_name), client=self.s3.client)
+        # (model, version, ETag it was loaded at); replaced as a whole, never mutated
+        self._current = (None, None, None)
+        self._load_lock = threading.RLock()
+        self._stop_polling = threading.Event()
+        self._poll_thread: Optional[threading.Thread] = None
+
+    def reconnect(self) -> None:
+        """
+        Replaces the S3 client. A process forked after the model was loaded must not share the
+        parent's pooled connections.
+        """
+        self.s3 = SimpleStorageService()
+        self.registry = ModelRegistry(ModelRegistryConfig(bucket_name=self.bucket_name), client=self.s3.client)
 
+    @property
+    def loaded_model(self):
+        return self._current[0]
+
+    @property
+    def model_version(self) -> Optional[str]:
+        return self._current[1]
 
     def is_model_present(self,model_path):
         try:
@@ -31,13 +59,97 @@ class Proj1Estimator:
             print(e)
             return False
 
-    def load_model(self,)->MyModel:
+    def watched_key(self) -> str:
+        """The key whose ETag changes when a new model should be served."""
+        return self.model_path or self.registry.config.production_pointer_key
+
+    def current_etag(self) -> Optional[str]:
+        """
+        ETag of the watched key with a HEAD request, no body download.
+        """
+        try:
+            head = self.s3.client.head_object(bucket=self.bucket_name, key=self.watched_key())
+            return None if head is None else head["ETag"]
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def resolve_model_path(self) -> tuple:
+        """
+        Resolves the registry's production pointer to the key of the production bundle. Versions
+        registered without a bundle only hold the raw sklearn model, which cannot score raw records,
+        so they are refused here instead of failing on the first request.
+
+        :return: (bundle key, version, pointer ETag)
         """
-        Load the model from the model_path
+        try:
+            pointer, etag = self.registry.read_production_pointer()
+            if pointer is None:
+                raise Exception(f"No production model registered in bucket {self.bucket_name}")
+            if not pointer.get("bundle_key"):
+                raise Exception(f"Production version {pointer['version']} in bucket {self.bucket_name} has no model "
+                                f"bundle; retrain and promote a version with a bundle to serve it")
+            return pointer["bundle_key"], pointer["version"], etag
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def load_model(self,):
+        """
+        Load the model from the model_path, or the production model, and make it the served one
         :return:
         """
+        try:
+            with self._load_lock:
+                if self.model_path is not None:
+                    model_path, etag = self.model_path, self.current_etag()
+                    version = etag.strip('"') if etag else None
+                else:
+                    model_path, version, etag = self.resolve_model_path()
+                model = self.s3.load_model(model_path, bucket_name=self.bucket_name)
+                self._current = (model, version, etag)
+            logging.info(f"Model {version or model_path} loaded")
+            return model
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def refresh(self) -> bool:
+        """
+        Loads and swaps in the model when the watched ETag changed since the last load.
 
-        return self.s3.load_model(self.model_path,bucket_name=self.bucket_name)
+        :return: whether a new model was swapped in
+        """
+        try:
+            etag = self.current_etag()
+            if etag is None or etag == self._current[2]:
+                return False
+            previous_version = self.model_version
+            self.load_model()
+            logging.info(f"Hot reloaded model: {previous_version} -> {self.model_version}")
+            return True
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _poll(self, interval_seconds: float) -> None:
+        while not self._stop_polling.wait(interval_seconds):
+            try:
+                self.refresh()
+            except Exception:
+                # Keep serving the current model; the next poll retries
+                logging.exception("Model refresh failed")
+
+    def start_polling(self, interval_seconds: float = 30.0) -> None:
+        """Starts the background thread that hot reloads new model versions."""
+        if self._poll_thread is not None and self._poll_thread.is_alive():
+            return
+        self._stop_polling.clear()
+        self._poll_thread = threading.Thread(target=self._poll, args=(interval_seconds,),
+                                             name="model-refresh", daemon=True)
+        self._poll_thread.start()
+
+    def stop_polling(self) -> None:
+        self._stop_polling.set()
+        if self._poll_thread is not None:
+            self._poll_thread.join()
+            self._poll_thread = None
 
     def save_model(self,from_file,remove:bool=False)->None:
         """
@@ -56,68 +168,51 @@ class Proj1Estimator:
             raise MyException(e, sys)
 
 
-    def interaction_feature_engineering(self, df: pd.DataFrame) -> pd.DataFrame:
-        try:
-            df['Alone_to_Social_Ratio'] = df['Time_spent_Alone'] / (df['Social_event_attendance'] + 1)
-            df['Social_Comfort_Index'] = (df['Friends_circle_size'] + df['Post_frequency'] - df['Stage_fear_Yes']) / 3
-            df['Social_Overload'] = df['Drained_after_socializing_Yes'] * df['Social_event_attendance']
-            return df
-        except Exception as e:
-            raise MyException(e, sys)
-        
-    def binned_feature_engineering(self, df: pd.DataFrame, time_alone_bins) -> pd.DataFrame:
-        try:
-            df['Time_spent_Alone_Binned'] = pd.cut(df['Time_spent_Alone'], bins=time_alone_bins, labels=['Low', 'Medium', 'High'], include_lowest=True)
-            df = pd.get_dummies(df, columns=['Time_spent_Alone_Binned'], drop_first=True)
-            return df
-        except Exception as e:
-            raise MyException(e, sys)
-    
-    def polynomial_feature_engineering(self, df: pd.DataFrame, poly = PolynomialFeatures) -> pd.DataFrame:
-        try:
-            poly = poly
-            df = poly.fit_transform(df[['Time_spent_Alone', 'Social_event_attendance', 'Friends_circle_size']])
-            poly_feature_names = poly.get_feature_names_out(['Time_spent_Alone', 'Social_event_attendance', 'Friends_circle_size'])
-            df[poly_feature_names] = df
-            return df
-        except Exception as e:
-            raise MyException(e, sys)
-        
-    def scaler(self, df: pd.DataFrame, scaler: StandardScaler) -> pd.DataFrame:
+    def snapshot(self) -> tuple:
+        """
+        The current model and its version, loading it on first use. Callers that use the model more
+        than once for one response take a snapshot, so a hot reload in between cannot mix versions.
+        :return: (model, version)
+        """
+        model, version, _ = self._current
+        if model is None:
+            # Concurrent first requests share one load
+            with self._load_lock:
+                if self._current[0] is None:
+                    self.load_model()
+            model, version, _ = self._current
+        return model, version
+
+    def explain_with_version(self, df: Mapping) -> tuple:
+        """
+        Per-feature explanations of the current model's predictions (see ModelBundle.explain).
+        :return: (explanation, version of the model that made it)
+        """
         try:
-            scaler = scaler
-            df = scaler.fit(df)
-            return df
+            model, version = self.snapshot()
+            if not hasattr(model, "explain"):
+                raise ValueError(f"Explanations are not available for {type(model).__name__}")
+            return model.explain(df), version
         except Exception as e:
-            raise MyException(e, sys)
+            raise MyException(e, sys) from e
 
-    def predict(self, df: pd.DataFrame) -> DataFrame:
+    def predict_with_version(self, df: Mapping) -> tuple:
         """
-        Function accepts preprocessed inputs (with all custom transformations already applied),
-        applies scaling using preprocessing_object, and performs prediction on transformed features.
+        Predicts with the current model, loading it on first use.
+        :return: (predictions, version of the model that made them)
         """
         try:
-            logging.info("Starting prediction process.")
-
-            # Step 1: Apply scaling transformations using the pre-trained preprocessing object
-            df = self.interaction_feature_engineering(df)
-            df = self.binned_feature_engineering(df, self.feature_engineering_artifact.time_alone_bins)
-            df = self.polynomial_feature_engineering(df, self.feature_engineering_artifact.ploy_features)
-            transformed_feature = self.scaler(df, self.feature_engineering_artifact.scaler)
-
-            # Step 2: Perform prediction using the trained model
-            logging.info("Using the trained model to get predictions")
-            predictions = self.trained_model_object.predict(transformed_feature)
-
-            return predictions
-
+            model, version = self.snapshot()
+            return model.predict(df), version
         except Exception as e:
-            logging.error("Error occurred in predict method", exc_info=True)
             raise MyException(e, sys) from e
 
-
-    def __repr__(self):
-        return f"{type(self.trained_model_object).__name__}()"
-
-    def __str__(self):
-        return f"{type(self.trained_model_object).__name__}()"
\ No newline at end of file
+    def predict(self, df: Mapping) -> np.ndarray:
+        """
+        Loads the production model on first use and delegates prediction to it.
+        :param df: DataFrame or mapping of column name to values, with the raw input columns
+        """
+        try:
+            return self.predict_with_version(df)[0]
+        except Exception as e:
+            raise MyException(e, sys)
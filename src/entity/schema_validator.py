@@ -0,0 +1,204 @@
+import sys
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from src.exception import MyException
+
+# Python and NumPy scalar types accepted for a numerical value; None is a missing value
+_NUMBER_TYPES = frozenset({int, float, type(None), np.float64, np.float32, np.int64, np.int32})
+
+
+class SchemaValidationError(ValueError):
+    """
+    Raised with the list of problems found in a request, each {"row", "column", "message"};
+    row and column are None for problems that concern the whole request or column.
+    """
+
+    def __init__(self, errors: List[dict], n_errors: int):
+        self.errors = errors
+        self.n_errors = n_errors
+        super().__init__(f"{n_errors} validation error(s): {errors[:3]}")
+
+
+class SchemaValidator:
+    """
+    Request validator compiled once from config/schema.yaml: the input columns in order, numeric
+    columns with their accepted limits and categorical columns with their allowed levels.
+
+    A whole batch is checked column by column: value types and categories through the set of
+    distinct values, limits with NumPy comparisons, so valid input costs no per-row Python work.
+    Only a column that holds a wrong value is walked row by row, to report exactly which rows
+    are wrong.
+    """
+
+    def __init__(self, numerical_columns: Sequence[str], categorical_levels: Mapping[str, Sequence[str]],
+                 numerical_limits: Optional[Mapping[str, Sequence]] = None, max_errors: int = 100):
+        """
+        :param numerical_columns: numeric input columns; missing values (None / NaN) are allowed
+        :param categorical_levels: allowed values of each categorical input column
+        :param numerical_limits: inclusive [low, high] per numeric column, None meaning unbounded
+        :param max_errors: most errors reported in one SchemaValidationError
+        """
+        try:
+            self.numerical_columns = list(numerical_columns)
+            self.categorical_levels = {column: np.asarray(list(levels), dtype=object)
+                                       for column, levels in categorical_levels.items()}
+            self._level_sets = {column: frozenset(levels.tolist()) for column, levels in self.categorical_levels.items()}
+            self.columns = self.numerical_columns + list(self.categorical_levels)
+            self._column_set = frozenset(self.columns)
+            limits = numerical_limits or {}
+            self.lower = {column: limits[column][0] for column in self.numerical_columns
+                          if column in limits and limits[column][0] is not None}
+            self.upper = {column: limits[column][1] for column in self.numerical_columns
+                          if column in limits and limits[column][1] is not None}
+            # Limits as column vectors, for checking all numerical columns of a batch as one block
+            self._lower_block = np.array([[self.lower.get(column, -np.inf)] for column in self.numerical_columns])
+            self._upper_block = np.array([[self.upper.get(column, np.inf)] for column in self.numerical_columns])
+            self.max_errors = max_errors
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    @classmethod
+    def from_schema_config(cls, schema_config: dict) -> "SchemaValidator":
+        return cls(numerical_columns=schema_config["numerical_columns"],
+                   categorical_levels={column: schema_config["categorical_levels"][column]
+                                       for column in schema_config["categorical_columns"]},
+                   numerical_limits=schema_config.get("numerical_limits"))
+
+    @staticmethod
+    def _as_object_array(values) -> np.ndarray:
+        # fromiter keeps one element per row even when the values are themselves sequences
+        if isinstance(values, np.ndarray) and values.ndim == 1:
+            return values.astype(object, copy=False)
+        return np.fromiter(values, dtype=object, count=len(values))
+
+    @staticmethod
+    def _rows_error(errors: list, rows: np.ndarray, column: str, message: str, row_offset: int) -> None:
+        errors.extend({"row": int(row) + row_offset, "column": column, "message": message} for row in rows)
+
+    def _check_numerical(self, column: str, values, errors: list, row_offset: int) -> np.ndarray:
+        if isinstance(values, np.ndarray) and values.ndim == 1 and values.dtype.kind in "iuf":
+            array = values.astype(np.float64, copy=False)
+        else:
+            values = values.tolist() if isinstance(values, np.ndarray) else values
+            # The set of value types is built in C; only a column with a wrong type is walked per row
+            if set(map(type, values)) <= _NUMBER_TYPES:
+                array = np.array(values, dtype=np.float64)
+            else:
+                is_number = np.fromiter((type(value) in _NUMBER_TYPES for value in values), dtype=bool, count=len(values))
+                self._rows_error(errors, np.flatnonzero(~is_number), column, "must be a number", row_offset)
+                array = np.array([value if valid else None for value, valid in zip(values, is_number)], dtype=np.float64)
+
+        # NaN (missing) compares False with every limit, so it passes
+        checks = [(np.isinf(array), "must be finite")]
+        if column in self.lower:
+            checks.append((array < self.lower[column], f"must be >= {self.lower[column]}"))
+        if column in self.upper:
+            checks.append((array > self.upper[column], f"must be <= {self.upper[column]}"))
+        if np.logical_or.reduce([failed for failed, _ in checks]).any():
+            for failed, message in checks:
+                self._rows_error(errors, np.flatnonzero(failed), column, message, row_offset)
+        return array
+
+    def _check_numerical_block(self, columns: Mapping) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Fast path for JSON input: every numerical column is a list of numbers or None, checked as
+        one (columns x rows) block with a handful of NumPy calls whatever the number of columns.
+        Returns None when the columns are not lists or any value fails, to be checked per column.
+        """
+        lists = [columns[column] for column in self.numerical_columns]
+        types = set()
+        for values in lists:
+            if not isinstance(values, list):
+                return None
+            types.update(map(type, values))
+        if not types <= _NUMBER_TYPES:
+            return None
+        block = np.array(lists, dtype=np.float64)
+        if (np.isinf(block) | (block < self._lower_block) | (block > self._upper_block)).any():
+            return None
+        return dict(zip(self.numerical_columns, block))
+
+    def _check_categorical(self, column: str, values, errors: list, row_offset: int) -> np.ndarray:
+        array = self._as_object_array(values)
+        try:
+            distinct = set(values if isinstance(values, list) else array.tolist())
+        except TypeError:
+            distinct = None
+        # Only the distinct values are compared with the levels; None and NaN are both missing,
+        # NaN being the only value not equal to itself
+        levels = self._level_sets[column]
+        if distinct is not None and all(value in levels or value is None or value != value for value in distinct):
+            return array
+        valid = (array == None) | (array != array) | np.isin(array, self.categorical_levels[column])  # noqa: E711
+        self._rows_error(errors, np.flatnonzero(~valid), column,
+                         f"must be one of {self.categorical_levels[column].tolist()} or null", row_offset)
+        return array
+
+    def _raise(self, errors: list) -> None:
+        raise SchemaValidationError(errors[:self.max_errors], len(errors))
+
+    def validate_columns(self, columns: Mapping, allow_extra_columns: bool = False, row_offset: int = 0) -> Dict[str, np.ndarray]:
+        """
+        Checks a batch given as column name -> values.
+
+        :param allow_extra_columns: ignore columns that are not model inputs (e.g. an id column)
+        :param row_offset: added to reported row numbers, for batches that are part of a stream
+        :return: numeric columns as float64 arrays (missing as NaN), categorical columns as object arrays
+        """
+        errors = []
+        missing = [column for column in self.columns if column not in columns]
+        if missing:
+            errors.append({"row": None, "column": None, "message": f"missing columns {missing}"})
+        if not allow_extra_columns:
+            extra = [column for column in columns if column not in self._column_set]
+            if extra:
+                errors.append({"row": None, "column": None, "message": f"unexpected columns {extra}"})
+        not_arrays = [column for column in self.columns if column in columns
+                      and not isinstance(columns[column], (list, tuple, np.ndarray))]
+        if not_arrays:
+            errors.append({"row": None, "column": None, "message": f"columns {not_arrays} must be arrays"})
+            self._raise(errors)
+        lengths = {len(columns[column]) for column in self.columns if column in columns}
+        if len(lengths) > 1:
+            errors.append({"row": None, "column": None, "message": "columns have different lengths"})
+        if errors:
+            self._raise(errors)
+
+        validated = self._check_numerical_block(columns)
+        if validated is None:
+            validated = {column: self._check_numerical(column, columns[column], errors, row_offset)
+                         for column in self.numerical_columns}
+        for column in self.categorical_levels:
+            validated[column] = self._check_categorical(column, columns[column], errors, row_offset)
+        if errors:
+            errors.sort(key=lambda error: error["row"])
+            self._raise(errors)
+        return validated
+
+    def validate_records(self, records: Sequence[Mapping]) -> Dict[str, np.ndarray]:
+        """
+        Checks a batch given as row-oriented records, each with exactly the input columns.
+
+        :return: the validated columns, as validate_columns
+        """
+        try:
+            n_fields = np.fromiter(map(len, records), dtype=np.int64, count=len(records))
+            columns = {column: [record[column] for record in records] for column in self.columns}
+        except (KeyError, TypeError):
+            n_fields = None
+        if n_fields is None or (n_fields != len(self.columns)).any():
+            errors = []
+            for row, record in enumerate(records):
+                if not isinstance(record, dict):
+                    errors.append({"row": row, "column": None, "message": "must be an object"})
+                    continue
+                missing = [column for column in self.columns if column not in record]
+                extra = [column for column in record if column not in self._column_set]
+                if missing:
+                    errors.append({"row": row, "column": None, "message": f"missing columns {missing}"})
+                if extra:
+                    errors.append({"row": row, "column": None, "message": f"unexpected columns {extra}"})
+            self._raise(errors)
+        return self.validate_columns(columns)
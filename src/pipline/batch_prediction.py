@@ -0,0 +1,198 @@
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+from collections import deque
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.entity.config_entity import BatchPredictionConfig
+from src.entity.model_bundle import ModelBundle
+from src.entity.s3_estimator import Proj1Estimator
+from src.exception import MyException
+from src.logger import logging
+
+# Set in the parent before the pool forks, so workers share the loaded bundle's pages
+# copy-on-write instead of each unpickling their own copy
+_BUNDLE: Optional[ModelBundle] = None
+
+
+def _init_worker(bundle_bytes: Optional[bytes]) -> None:
+    # Only used where fork is unavailable: each worker parses its own copy of the bundle
+    global _BUNDLE
+    if bundle_bytes is not None:
+        _BUNDLE = ModelBundle.from_bytes(bundle_bytes)
+
+
+def _score_chunk(columns: Dict[str, np.ndarray]) -> tuple:
+    """Worker task: raw columns -> (predicted labels, probability of the second class)."""
+    return _BUNDLE.predict_with_proba(columns)
+
+
+def is_parquet(file_path: str) -> bool:
+    return os.path.splitext(file_path)[1].lower() in (".parquet", ".pq")
+
+
+class BatchPrediction:
+    """
+    Scores a large CSV or Parquet file chunk by chunk with the model bundle, so the cleaning,
+    features and model are the exact fitted transforms used in serving. Chunks are scored in a
+    process pool and written in input order as soon as they are ready; memory stays bounded by a
+    few chunks whatever the file size.
+    """
+
+    def __init__(self, batch_prediction_config: BatchPredictionConfig = BatchPredictionConfig()):
+        """
+        :param batch_prediction_config: Configuration for batch prediction
+        """
+        try:
+            self.batch_prediction_config = batch_prediction_config
+            self.bundle: Optional[ModelBundle] = None
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def load_bundle(self) -> ModelBundle:
+        try:
+            config = self.batch_prediction_config
+            if config.local_bundle_file_path is not None:
+                bundle = ModelBundle.load(config.local_bundle_file_path)
+            else:
+                bundle = Proj1Estimator(bucket_name=config.model_bucket_name,
+                                        model_path=config.model_file_path).load_model()
+            if not isinstance(bundle, ModelBundle):
+                raise Exception("Batch prediction requires a model bundle, not a pickled model")
+            self.bundle = bundle
+            return bundle
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def read_chunks(self, file_path: str, input_columns: list) -> Iterator[tuple]:
+        """
+        Yields (chunk, raw input columns) where chunk is the original DataFrame (CSV) or
+        RecordBatch (Parquet) kept for writing the output.
+        """
+        try:
+            chunk_rows = self.batch_prediction_config.chunk_rows
+            if is_parquet(file_path):
+                import pyarrow.parquet as pq
+                for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunk_rows):
+                    yield batch, {col: batch.column(col).to_numpy(zero_copy_only=False) for col in input_columns}
+            else:
+                for chunk in pd.read_csv(file_path, chunksize=chunk_rows):
+                    yield chunk, {col: chunk[col].to_numpy() for col in input_columns}
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def predict_file(self, input_file_path: str, output_file_path: str) -> dict:
+        """
+        Method Name :   predict_file
+        Description :   This function scores every row of the input file and writes it with a
+                        prediction and probability column to the output file (CSV or Parquet)
+
+        Output      :   Returns the number of rows, the elapsed seconds and the rows per second
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        global _BUNDLE
+        try:
+            bundle = self.bundle or self.load_bundle()
+            input_columns = list(bundle.cleaning_params["caps"]) + list(bundle.cleaning_params["dummy_levels"])
+            n_workers = self.batch_prediction_config.n_workers or os.cpu_count() or 1
+
+            if "fork" in multiprocessing.get_all_start_methods():
+                context, init_args = multiprocessing.get_context("fork"), (None,)
+                _BUNDLE = bundle
+            else:
+                context, init_args = multiprocessing.get_context(), (bundle.to_bytes(),)
+
+            start, n_rows = time.perf_counter(), 0
+            writer = _OutputWriter(output_file_path)
+            try:
+                with context.Pool(processes=n_workers, initializer=_init_worker, initargs=init_args) as pool:
+                    # At most two chunks per worker are in flight, and results are taken in submission
+                    # order, so output order matches the input and memory stays bounded
+                    pending = deque()
+                    for chunk, columns in self.read_chunks(input_file_path, input_columns):
+                        pending.append((chunk, pool.apply_async(_score_chunk, (columns,))))
+                        if len(pending) >= 2 * n_workers:
+                            n_rows += writer.write(*pending.popleft())
+                    while pending:
+                        n_rows += writer.write(*pending.popleft())
+            finally:
+                writer.close()
+                _BUNDLE = None
+
+            elapsed = time.perf_counter() - start
+            summary = {"rows": n_rows, "seconds": round(elapsed, 3),
+                       "rows_per_second": round(n_rows / elapsed, 1) if elapsed > 0 else None}
+            logging.info(f"Batch prediction of {input_file_path} -> {output_file_path} with {n_workers} workers: {summary}")
+            return summary
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+
+class _OutputWriter:
+    """Appends scored chunks to a CSV or Parquet file."""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.parquet = is_parquet(file_path)
+        self._parquet_writer = None
+        self._header_written = False
+        dir_path = os.path.dirname(file_path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+
+    def write(self, chunk, result) -> int:
+        """Waits for the chunk's scores, appends it and returns its row count."""
+        labels, probabilities = result.get()
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            if isinstance(chunk, pd.DataFrame):
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+            else:
+                table = pa.Table.from_batches([chunk])
+            table = table.append_column("prediction", pa.array(labels.astype(str)))
+            table = table.append_column("probability", pa.array(probabilities, type=pa.float64()))
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.file_path, table.schema)
+            else:
+                # CSV chunks infer their own dtypes, e.g. an all-null column in one chunk
+                table = table.cast(self._parquet_writer.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            if not isinstance(chunk, pd.DataFrame):
+                chunk = chunk.to_pandas()
+            chunk = chunk.assign(prediction=labels, probability=probabilities)
+            chunk.to_csv(self.file_path, mode="a" if self._header_written else "w",
+                         header=not self._header_written, index=False)
+            self._header_written = True
+        return len(labels)
+
+    def close(self) -> None:
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def main(argv: Optional[list] = None) -> dict:
+    parser = argparse.ArgumentParser(description="Score a CSV or Parquet file with the personality model bundle")
+    parser.add_argument("input", help="CSV or Parquet file with the raw input columns")
+    parser.add_argument("output", help="Output file; .parquet writes Parquet, anything else CSV")
+    parser.add_argument("--bundle", default=None, help="Local model bundle file instead of the production bundle in S3")
+    parser.add_argument("--model-key", default=None, help="S3 key of the bundle instead of the production bundle")
+    parser.add_argument("--chunk-rows", type=int, default=BatchPredictionConfig.chunk_rows)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    config = BatchPredictionConfig(model_file_path=args.model_key, local_bundle_file_path=args.bundle,
+                                   chunk_rows=args.chunk_rows, n_workers=args.workers)
+    summary = BatchPrediction(config).predict_file(args.input, args.output)
+    print(f"Scored {summary['rows']} rows in {summary['seconds']}s ({summary['rows_per_second']} rows/s)")
+    return summary
+
+
+if __name__ == "__main__":
+    main()
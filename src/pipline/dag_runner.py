@@ -0,0 +1,357 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import importlib
+import importlib.util
+from datetime import datetime
+from dataclasses import dataclass, field, fields, is_dataclass
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.exception import MyException
+from src.logger import logging
+from src.utils.main_utils import read_yaml_file, save_object, load_object, file_fingerprint
+
+
+@dataclass
+class Stage:
+    """
+    One node of the training DAG.
+
+    run receives the artifacts of the stages in deps by name and returns this stage's artifact.
+    Everything that can change the artifact is declared so it can be fingerprinted: the source
+    modules of the component, the config keys it reads (dotted paths into a YAML file, so one
+    stage is not invalidated by another stage's section), plain config values, the files it
+    reads (a function of the upstream artifacts) and, for inputs outside the artifact store
+    such as a MongoDB collection, an external fingerprint function.
+    """
+    name: str
+    run: Callable[[Dict[str, object]], object]
+    deps: Tuple[str, ...] = ()
+    code_modules: Tuple[str, ...] = ()
+    config_keys: Tuple[Tuple[str, str], ...] = ()
+    config_values: dict = field(default_factory=dict)
+    input_files: Optional[Callable[[Dict[str, object]], List[str]]] = None
+    external: Optional[Callable[[], object]] = None
+    output_files: Optional[Callable[[object], List[str]]] = None
+
+
+def config_fields(config: object, exclude_suffixes: Sequence[str] = ("_path", "_dir", "folder_name")) -> dict:
+    """
+    Values of a config dataclass that affect results: file locations are left out because the
+    timestamped artifact directory changes between runs without changing anything computed.
+    """
+    return {name: value for name, value in vars(config).items() if not name.endswith(tuple(exclude_suffixes))}
+
+
+def artifact_files(artifact: object) -> List[str]:
+    """Every *_path field of an artifact dataclass that is set."""
+    if not is_dataclass(artifact):
+        return []
+    return [value for name, value in vars(artifact).items() if name.endswith("_path") and isinstance(value, str)]
+
+
+def _write_json(file_path: str, content: dict) -> None:
+    # Written to a temporary file and renamed, so a crash never leaves a truncated record
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    temp_file_path = f"{file_path}.tmp"
+    with open(temp_file_path, "w") as file_obj:
+        json.dump(content, file_obj, indent=4, default=str)
+    os.replace(temp_file_path, file_path)
+
+
+def _is_json(value) -> bool:
+    if is_dataclass(value):
+        return False
+    try:
+        json.dumps(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+class DagRunner:
+    """
+    Runs a DAG of stages in-process, skipping every stage whose fingerprint matches the one
+    recorded by its last successful run and whose output files still exist.
+
+    A stage's fingerprint hashes its code, config, input files, external inputs and the
+    fingerprints of the stages it depends on, so a change invalidates exactly the stages
+    downstream of it. Stages whose dependencies are satisfied run concurrently in a thread pool.
+
+    Every completed stage writes a checkpoint: a JSON record of its fingerprint and artifact
+    dataclass fields, with fields that are not JSON (fitted objects, nested dataclasses) in a
+    pickle beside it. run.json records which stages of the current run completed and which one
+    failed, so a resumed run reloads those artifacts as they were and continues from the failure
+    without fingerprinting them again, e.g. without re-reading a source that has changed since.
+    """
+
+    def __init__(self, stages: Sequence[Stage], state_dir: str, max_workers: Optional[int] = None):
+        """
+        :param stages: the stages; deps must name other stages of the list
+        :param state_dir: directory holding each stage's checkpoint and the record of the last run
+        :param max_workers: most stages run at once (default: one per CPU)
+        """
+        try:
+            self.stages = {stage.name: stage for stage in stages}
+            unknown = {dep for stage in stages for dep in stage.deps if dep not in self.stages}
+            if unknown:
+                raise ValueError(f"Stages depend on undeclared stages {sorted(unknown)}")
+            self.order = self._topological_order()
+            self.state_dir = state_dir
+            self.max_workers = max_workers or os.cpu_count() or 1
+            # Content hashes keyed by (path, size, mtime), so a file read by several stages is hashed once
+            self._file_hashes: Dict[tuple, str] = {}
+            self._config_files: Dict[str, dict] = {}
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _topological_order(self) -> List[str]:
+        order, visiting, done = [], set(), set()
+
+        def visit(name: str) -> None:
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage graph has a cycle through {name}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def checkpoint_file_path(self, name: str) -> str:
+        return os.path.join(self.state_dir, f"{name}.json")
+
+    def objects_file_path(self, name: str) -> str:
+        return os.path.join(self.state_dir, f"{name}.objects.pkl")
+
+    @property
+    def run_file_path(self) -> str:
+        return os.path.join(self.state_dir, "run.json")
+
+    def hash_file(self, file_path: str) -> Optional[str]:
+        if not os.path.exists(file_path):
+            return None
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        if key not in self._file_hashes:
+            self._file_hashes[key] = file_fingerprint(file_path)
+        return self._file_hashes[key]
+
+    def config_value(self, file_path: str, dotted_key: str):
+        if file_path not in self._config_files:
+            self._config_files[file_path] = read_yaml_file(file_path=file_path)
+        value = self._config_files[file_path]
+        for part in dotted_key.split("."):
+            if not isinstance(value, dict):
+                return None
+            value = value.get(part)
+        return value
+
+    @staticmethod
+    def code_hash(module_names: Sequence[str]) -> Dict[str, str]:
+        hashes = {}
+        for module_name in module_names:
+            spec = importlib.util.find_spec(module_name)
+            hashes[module_name] = file_fingerprint(spec.origin) if spec is not None and spec.origin else None
+        return hashes
+
+    def fingerprint(self, stage: Stage, artifacts: Dict[str, object], fingerprints: Dict[str, str]) -> str:
+        """
+        Method Name :   fingerprint
+        Description :   This function hashes everything the stage's artifact depends on
+
+        Output      :   Returns the sha256 hex digest
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            upstream = {dep: artifacts[dep] for dep in stage.deps}
+            inputs = {
+                "stage": stage.name,
+                "code": self.code_hash(stage.code_modules),
+                "config": {f"{file_path}:{key}": self.config_value(file_path, key) for file_path, key in stage.config_keys},
+                "config_values": stage.config_values,
+                "files": {path: self.hash_file(path) for path in (stage.input_files(upstream) if stage.input_files else [])},
+                "external": stage.external() if stage.external else None,
+                "deps": {dep: fingerprints[dep] for dep in stage.deps},
+            }
+            return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def save_checkpoint(self, name: str, fingerprint: str, artifact: object) -> None:
+        """
+        Method Name :   save_checkpoint
+        Description :   This function records a completed stage's fingerprint and artifact
+
+        Output      :   <stage>.json, and <stage>.objects.pkl for fields that are not JSON
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            values = {item.name: getattr(artifact, item.name) for item in fields(artifact)} if is_dataclass(artifact) \
+                else {"value": artifact}
+            objects = {key: value for key, value in values.items() if not _is_json(value)}
+            if objects:
+                save_object(self.objects_file_path(name), objects)
+            _write_json(self.checkpoint_file_path(name), {
+                "stage": name,
+                "run_id": self.run_id,
+                "fingerprint": fingerprint,
+                "completed_at": datetime.now().isoformat(),
+                "artifact_class": f"{type(artifact).__module__}.{type(artifact).__qualname__}" if is_dataclass(artifact) else None,
+                "fields": {key: value for key, value in values.items() if key not in objects},
+                "objects_file_path": self.objects_file_path(name) if objects else None,
+            })
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def load_checkpoint(self, name: str) -> Optional[Tuple[dict, object]]:
+        """Returns (checkpoint record, artifact rebuilt from it), or None if there is no usable checkpoint."""
+        file_path = self.checkpoint_file_path(name)
+        if not os.path.exists(file_path):
+            return None
+        try:
+            with open(file_path, "r") as file_obj:
+                record = json.load(file_obj)
+            values = dict(record["fields"])
+            if record["objects_file_path"] is not None:
+                values.update(load_object(file_path=record["objects_file_path"]))
+            if record["artifact_class"] is None:
+                return record, values["value"]
+            module_name, class_name = record["artifact_class"].rsplit(".", 1)
+            return record, getattr(importlib.import_module(module_name), class_name)(**values)
+        except Exception:
+            logging.warning(f"Ignoring unreadable checkpoint {file_path}")
+            return None
+
+    def read_run(self) -> Optional[dict]:
+        if not os.path.exists(self.run_file_path):
+            return None
+        with open(self.run_file_path, "r") as file_obj:
+            return json.load(file_obj)
+
+    def outputs_exist(self, stage: Stage, artifact: object) -> bool:
+        output_files = stage.output_files(artifact) if stage.output_files else artifact_files(artifact)
+        return all(os.path.exists(path) for path in output_files)
+
+    def _execute(self, stage: Stage, artifacts: Dict[str, object], fingerprints: Dict[str, str],
+                 force: bool) -> Tuple[object, str, bool]:
+        start = time.perf_counter()
+        timings = self.stage_timings[stage.name] = {"status": "running"}
+        fingerprint = self.fingerprint(stage, artifacts, fingerprints)
+        checkpoint = None if force else self.load_checkpoint(stage.name)
+        timings["fingerprint_seconds"] = round(time.perf_counter() - start, 4)
+        if checkpoint is not None and checkpoint[0]["fingerprint"] == fingerprint and self.outputs_exist(stage, checkpoint[1]):
+            logging.info(f"Stage {stage.name} is up to date, skipping")
+            timings["status"] = "skipped"
+            return checkpoint[1], fingerprint, False
+
+        logging.info(f"Running stage {stage.name}")
+        start = time.perf_counter()
+        try:
+            artifact = stage.run({dep: artifacts[dep] for dep in stage.deps})
+        except Exception:
+            timings.update(status="failed", run_seconds=round(time.perf_counter() - start, 4))
+            raise
+        self.save_checkpoint(stage.name, fingerprint, artifact)
+        timings.update(status="ran", run_seconds=round(time.perf_counter() - start, 4))
+        logging.info(f"Stage {stage.name} finished in {timings['run_seconds']:.2f}s")
+        return artifact, fingerprint, True
+
+    def _resume(self, artifacts: Dict[str, object], fingerprints: Dict[str, str]) -> Optional[dict]:
+        """
+        Loads the checkpoints of the stages the last unfinished run completed; returns that run's record.
+        A run that crashed or was killed never recorded its failure and is still "running" in run.json,
+        so every run that did not complete can be resumed.
+        """
+        run = self.read_run()
+        if run is None or run["status"] == "completed":
+            logging.info("No unfinished run to resume, running normally")
+            return None
+        for name in run["completed"]:
+            checkpoint = self.load_checkpoint(name)
+            if checkpoint is None or not self.outputs_exist(self.stages[name], checkpoint[1]):
+                logging.info(f"Checkpoint of stage {name} is missing or incomplete, it will run again")
+                break
+            fingerprints[name], artifacts[name] = checkpoint[0]["fingerprint"], checkpoint[1]
+        ending = f"failed at {run['failed_stage']}" if run["status"] == "failed" else "did not finish"
+        logging.info(f"Resuming run {run['run_id']} after stages {list(artifacts)}, which {ending}")
+        return run
+
+    def run(self, force: bool = False, resume: bool = False) -> Dict[str, object]:
+        """
+        Method Name :   run
+        Description :   This function runs every stage once its dependencies are done, skipping
+                        stages that are up to date unless force is set. A failed stage stops
+                        the run after the stages already running finish. With resume, the
+                        stages completed by the last run, if it failed or was interrupted, are
+                        reloaded from their checkpoints and the run continues from there
+
+        Output      :   Returns the artifact of every stage by name; self.ran lists the stages
+                        that ran, self.skipped those that were up to date and self.resumed
+                        those reloaded from the unfinished run, self.stage_timings their timings
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            artifacts, fingerprints = {}, {}
+            self.ran, self.skipped, self.resumed = [], [], []
+            # Per stage: ran / skipped / resumed / failed, and seconds spent fingerprinting and running
+            self.stage_timings: Dict[str, dict] = {}
+            run = self._resume(artifacts, fingerprints) if resume else None
+            if run is None:
+                run = {"run_id": datetime.now().strftime("%Y_%m_%d_%H_%M_%S"), "started_at": datetime.now().isoformat()}
+            self.run_id = run["run_id"]
+            self.resumed = list(artifacts)
+            self.stage_timings.update({name: {"status": "resumed"} for name in self.resumed})
+            run.update(status="running", completed=list(artifacts), failed_stage=None, error=None)
+            _write_json(self.run_file_path, run)
+
+            pending = [name for name in self.order if name not in artifacts]
+            running = {}
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                while pending or running:
+                    for name in [name for name in pending if all(dep in artifacts for dep in self.stages[name].deps)]:
+                        if len(running) >= self.max_workers:
+                            break
+                        pending.remove(name)
+                        running[executor.submit(self._execute, self.stages[name], artifacts, fingerprints, force)] = name
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    failed = None
+                    for future in done:
+                        name = running.pop(future)
+                        if future.exception() is not None:
+                            failed = failed or (name, future.exception())
+                            continue
+                        artifacts[name], fingerprints[name], did_run = future.result()
+                        (self.ran if did_run else self.skipped).append(name)
+                        run["completed"].append(name)
+                    if failed is not None:
+                        # Stages already running still finish and are checkpointed
+                        done, _ = wait(running)
+                        for future in done:
+                            name = running.pop(future)
+                            if future.exception() is None:
+                                artifacts[name], fingerprints[name], _ = future.result()
+                                run["completed"].append(name)
+                    _write_json(self.run_file_path, run)
+                    if failed is not None:
+                        name, error = failed
+                        run.update(status="failed", failed_stage=name, error=str(error), finished_at=datetime.now().isoformat())
+                        _write_json(self.run_file_path, run)
+                        raise Exception(f"Stage {name} failed: {error}") from error
+
+            run.update(status="completed", finished_at=datetime.now().isoformat())
+            _write_json(self.run_file_path, run)
+            logging.info(f"Pipeline finished: ran {self.ran}, skipped {self.skipped}, resumed {self.resumed}")
+            return artifacts
+        except Exception as e:
+            raise MyException(e, sys) from e
@@ -0,0 +1,99 @@
+import sys
+import asyncio
+from typing import Callable, List, Mapping, Sequence
+
+from src.exception import MyException
+from src.logger import logging
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-record predictions in an asyncio queue and scores them as one
+    vectorized batch, then resolves each caller's future with its own result.
+
+    A batch is flushed when it reaches max_batch_size or when max_wait_ms has passed since its
+    first record. The wait is adaptive: while requests arrive one at a time the batcher flushes
+    immediately, so an idle service adds no latency, and it only holds a batch open once the
+    previous flush showed concurrent load.
+    """
+
+    def __init__(self, predict_batch: Callable[[List[Mapping]], Sequence], max_batch_size: int = 64,
+                 max_wait_ms: float = 2.0):
+        """
+        :param predict_batch: scores a list of records, returning one result per record in order
+        :param max_batch_size: most records scored in one call
+        :param max_wait_ms: longest time the first record of a batch waits for others
+        """
+        try:
+            self.predict_batch = predict_batch
+            self.max_batch_size = int(max_batch_size)
+            self.max_wait = float(max_wait_ms) / 1000
+            self._queue: asyncio.Queue = None
+            self._worker: asyncio.Task = None
+            self._last_batch_size = 0
+            self.batches = 0
+            self.records = 0
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Prediction service is shutting down"))
+
+    async def submit(self, record: Mapping):
+        """Queues one record and waits for its result."""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((record, future))
+        return await future
+
+    async def _collect(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        # Let handlers that are already runnable enqueue their records before deciding to wait
+        await asyncio.sleep(0)
+        wait = self.max_wait if self._last_batch_size > 1 else 0.0
+        deadline = loop.time() + wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            self._last_batch_size = len(batch)
+            self.batches += 1
+            self.records += len(batch)
+            records = [record for record, _ in batch]
+            try:
+                results = self.predict_batch(records)
+            except Exception as e:
+                logging.exception("Micro-batch prediction failed")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                # The caller may have gone away (cancelled request)
+                if not future.done():
+                    future.set_result(result)
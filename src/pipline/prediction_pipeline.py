@@ -0,0 +1,232 @@
+import sys
+from typing import Dict, Iterator, List, Literal, Mapping, Optional
+
+import numpy as np
+import pyarrow as pa
+from pydantic import ConfigDict, Field, create_model
+
+from src.constants import SCHEMA_FILE_PATH
+from src.entity.config_entity import PersonalityPredictorConfig
+from src.entity.s3_estimator import Proj1Estimator
+from src.entity.schema_validator import SchemaValidationError, SchemaValidator
+from src.exception import MyException
+from src.logger import logging
+from src.utils.main_utils import read_yaml_file
+from src.utils.prediction_cache import PredictionCache
+
+
+def build_input_models(schema_config: dict) -> tuple:
+    """
+    Builds the request models from config/schema.yaml: every input column must be present,
+    numerical columns are numbers within their configured limits and categorical columns one of
+    their configured levels. Null is accepted for both and imputed the way the training data was.
+
+    return: (single record model, batch model)
+    """
+    try:
+        fields = {}
+        limits = schema_config.get("numerical_limits", {})
+        for column in schema_config["numerical_columns"]:
+            low, high = limits.get(column, [None, None])
+            fields[column] = (Optional[float], Field(..., ge=low, le=high, allow_inf_nan=False))
+        for column in schema_config["categorical_columns"]:
+            levels = tuple(schema_config["categorical_levels"][column])
+            fields[column] = (Optional[Literal[levels]], ...)
+        record_model = create_model("PersonalityData", __config__=ConfigDict(extra="forbid"), **fields)
+        batch_model = create_model("PersonalityBatch", __config__=ConfigDict(extra="forbid"),
+                                   records=(List[record_model], ...))
+        return record_model, batch_model
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+
+schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+PersonalityData, PersonalityBatch = build_input_models(schema_config)
+schema_validator = SchemaValidator.from_schema_config(schema_config)
+
+
+class PersonalityClassifier:
+    """
+    In-memory predictor for the prediction service. The production bundle is fetched once
+    and every request is scored with NumPy on columnar input, without building a DataFrame.
+    With a prediction cache, records whose features were already scored by the current model
+    version are answered from the cache and only the rest are scored.
+    """
+
+    def __init__(self, prediction_pipeline_config: PersonalityPredictorConfig = PersonalityPredictorConfig(),
+                 prediction_cache: Optional[PredictionCache] = None) -> None:
+        """
+        :param prediction_pipeline_config: Configuration for prediction the value
+        :param prediction_cache: LRU cache of predictions by feature values, None to disable
+        """
+        try:
+            self.prediction_pipeline_config = prediction_pipeline_config
+            self.prediction_cache = prediction_cache
+            self.numerical_columns = list(schema_config["numerical_columns"])
+            self.categorical_columns = list(schema_config["categorical_columns"])
+            self.estimator = Proj1Estimator(bucket_name=prediction_pipeline_config.model_bucket_name,
+                                            model_path=prediction_pipeline_config.model_file_path)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def load(self) -> None:
+        try:
+            self.estimator.load_model()
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.estimator.loaded_model is not None
+
+    def after_fork(self) -> None:
+        """Called in a worker forked from the process that loaded the model."""
+        self.estimator.reconnect()
+
+    def start_hot_reload(self, poll_interval_seconds: float) -> None:
+        """Polls for new production versions and swaps them in without interrupting requests."""
+        self.estimator.start_polling(interval_seconds=poll_interval_seconds)
+
+    def stop_hot_reload(self) -> None:
+        self.estimator.stop_polling()
+
+    @property
+    def model_version(self) -> Optional[str]:
+        return self.estimator.model_version
+
+    @staticmethod
+    def records_to_columns(records: List[Mapping]) -> Dict[str, list]:
+        """Row-oriented records -> column name to list of values."""
+        columns = list(records[0]) if records else []
+        return {column: [record[column] for record in records] for column in columns}
+
+    def feature_key(self, record: Mapping) -> tuple:
+        """
+        Normalized feature tuple of a record: numerical values as floats, missing values (None or
+        NaN) as None, in schema column order.
+        """
+        key = []
+        for column in self.numerical_columns:
+            value = record[column]
+            key.append(None if value is None or value != value else float(value))
+        for column in self.categorical_columns:
+            key.append(record[column])
+        return tuple(key)
+
+    def predict_records(self, records: List[Mapping]) -> List[str]:
+        """Scores row-oriented records in one vectorized call, serving repeats from the cache."""
+        if self.prediction_cache is None:
+            return [str(label) for label in self.predict(self.records_to_columns(records))]
+
+        # One model for the whole response: cache hits are looked up and misses scored under the
+        # same version even if a hot reload swaps the model in between
+        model, model_version = self.estimator.snapshot()
+        keys = [self.feature_key(record) for record in records]
+        results, missing = [], {}
+        for position, key in enumerate(keys):
+            result = None if key in missing else self.prediction_cache.get(model_version, key)
+            if result is None:
+                # Each distinct missing feature tuple is scored once, at its first position
+                missing.setdefault(key, position)
+            results.append(result)
+        if missing:
+            labels = model.predict(self.records_to_columns([records[position] for position in missing.values()]))
+            scored = dict(zip(missing, (str(label) for label in labels)))
+            for key, label in scored.items():
+                self.prediction_cache.put(model_version, key, label)
+            results = [scored[key] if result is None else result for key, result in zip(keys, results)]
+        return results
+
+    def read_arrow_stream(self, payload: bytes) -> List[Dict[str, np.ndarray]]:
+        """
+        Reads and validates every record batch of an Arrow IPC stream of raw input records.
+        The batches reference the payload's memory, they are not copied, and numerical columns
+        without nulls are handed to NumPy zero-copy. Columns that are not model inputs are ignored.
+
+        :return: the validated input columns of each batch
+        """
+        try:
+            reader = pa.ipc.open_stream(pa.py_buffer(payload))
+            batches, errors, n_errors, row_offset = [], [], 0, 0
+            for batch in reader:
+                columns = {name: batch.column(name).to_numpy(zero_copy_only=False) for name in batch.schema.names}
+                try:
+                    batches.append(schema_validator.validate_columns(columns, allow_extra_columns=True,
+                                                                     row_offset=row_offset))
+                except SchemaValidationError as e:
+                    errors.extend(e.errors)
+                    n_errors += e.n_errors
+                row_offset += batch.num_rows
+            if n_errors:
+                raise SchemaValidationError(errors[:schema_validator.max_errors], n_errors)
+            return batches
+        except SchemaValidationError:
+            raise
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def snapshot(self) -> tuple:
+        """The served model and its version, loading it on first use (see Proj1Estimator.snapshot)."""
+        try:
+            return self.estimator.snapshot()
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def iter_arrow_predictions(self, batches: List[Dict[str, np.ndarray]], model: object) -> Iterator[bytes]:
+        """
+        Scores the input batches one at a time with model, a snapshot taken before the stream
+        started, and yields the Arrow IPC stream of predictions, one record batch per input batch.
+        The whole stream comes from one model version even if a hot reload happens while it is sent.
+        """
+        schema = pa.schema([("prediction", pa.string())])
+        yield schema.serialize().to_pybytes()
+        for columns in batches:
+            predictions = model.predict(columns)
+            yield pa.record_batch([pa.array(predictions.astype(str))], schema=schema).serialize().to_pybytes()
+        # End-of-stream marker
+        yield b"\xff\xff\xff\xff\x00\x00\x00\x00"
+
+    @property
+    def can_explain(self) -> bool:
+        """Whether the served model supports explanations (linear models)."""
+        model = self.estimator.loaded_model
+        return model is not None and getattr(model, "model_info", {}).get("kind") == "linear"
+
+    def explain(self, columns: Mapping) -> dict:
+        """
+        Method Name :   explain
+        Description :   This function predicts every record in the input together with the
+                        contribution of each engineered feature to its prediction
+
+        Output      :   Returns the predictions, one explanation per record, the class that positive
+                        contributions push towards and the model version
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            explanation, model_version = self.estimator.explain_with_version(columns)
+            names = explanation["feature_names"]
+            explanations = [{"probability": probability, "base_value": explanation["intercept"],
+                             "contributions": dict(zip(names, row))}
+                            for probability, row in zip(explanation["probabilities"].tolist(),
+                                                        explanation["contributions"].tolist())]
+            return {"predictions": [str(label) for label in explanation["predictions"]],
+                    "explanations": explanations,
+                    "positive_class": str(explanation["positive_class"]),
+                    "model_version": model_version}
+        except Exception as e:
+            logging.exception("Explanation failed")
+            raise MyException(e, sys) from e
+
+    def predict(self, columns: Mapping) -> np.ndarray:
+        """
+        Method Name :   predict
+        Description :   This function predicts the personality of every record in the input
+
+        Output      :   Returns the predicted labels
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            return self.estimator.predict(columns)
+        except Exception as e:
+            logging.exception("Prediction failed")
+            raise MyException(e, sys) from e
@@ -1,41 +1,67 @@
+import os
 import sys
+import argparse
+from typing import Dict, Optional
+
 from src.exception import MyException
 from src.logger import logging
 
 from src.components.data_ingestion import DataIngestion
 from src.components.data_validation import DataValidation
-from src.components.data_transformation import DataTransformation
+from src.components.data_cleaning import DataCleaning
+from src.components.feature_engineering import FeatureEngineering
 from src.components.model_trainer import ModelTrainer
 from src.components.model_evaluation import ModelEvaluation
 from src.components.model_pusher import ModelPusher
 
-from src.entity.config_entity import (DataIngestionConfig,
-                                          DataValidationConfig,
-                                          DataTransformationConfig,
-                                          ModelTrainerConfig,
-                                          ModelEvaluationConfig,
-                                          ModelPusherConfig)
-                                          
-from src.entity.artifact_entity import (DataIngestionArtifact,
-                                            DataValidationArtifact,
-                                            DataTransformationArtifact,
-                                            ModelTrainerArtifact,
-                                            ModelEvaluationArtifact,
-                                            ModelPusherArtifact)
+from src.constants import SCHEMA_FILE_PATH, MODEL_CONFIG_FILE_PATH
+from src.data_access.data import Data
+from src.entity.config_entity import (training_pipeline_config,
+                                      DataIngestionConfig,
+                                      DataValidationConfig,
+                                      DataCleaningConfig,
+                                      FeatureEngineeringConfig,
+                                      ModelTrainerConfig,
+                                      ModelEvaluationConfig,
+                                      ModelPusherConfig,
+                                      ModelRegistryConfig)
 
+from src.entity.artifact_entity import (DataIngestionArtifact,
+                                        DataValidationArtifact,
+                                        DataCleaningArtifact,
+                                        FeatureEngineeringArtifact,
+                                        ModelTrainerArtifact,
+                                        ModelEvaluationArtifact)
+from src.entity.model_registry import ModelRegistry
+from src.pipline.dag_runner import DagRunner, Stage, config_fields
+from src.utils.main_utils import read_yaml_file
+from src.utils.instrumentation import collect_metrics, configure_instrumentation, write_metrics
 
 
 class TrainPipeline:
-    def __init__(self):
+    """
+    The training pipeline as a DAG of the components in src/components:
+
+        data_ingestion -> data_validation ----------------------.
+                       -> data_cleaning -> feature_engineering -> model_trainer -> model_evaluation -> model_pusher
+
+    Cleaning runs alongside validation and feature engineering waits for both, so it only uses
+    data that passed validation. Each stage is skipped while its fingerprint (code, the config
+    keys it reads, its input data and upstream stages) is unchanged, so a run after changing only
+    model_trainer settings starts at ModelTrainer.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
         self.data_ingestion_config = DataIngestionConfig()
         self.data_validation_config = DataValidationConfig()
-        self.data_transformation_config = DataTransformationConfig()
+        self.data_cleaning_config = DataCleaningConfig()
+        self.feature_engineering_config = FeatureEngineeringConfig()
         self.model_trainer_config = ModelTrainerConfig()
         self.model_evaluation_config = ModelEvaluationConfig()
         self.model_pusher_config = ModelPusherConfig()
+        self.runner = DagRunner(self.stages(), state_dir=training_pipeline_config.pipeline_state_dir,
+                                max_workers=max_workers)
 
-
-    
     def start_data_ingestion(self) -> DataIngestionArtifact:
         """
         This method of TrainPipeline class is responsible for starting data ingestion component
@@ -45,12 +71,12 @@ class TrainPipeline:
             logging.info("Getting the data from mongodb")
             data_ingestion = DataIngestion(data_ingestion_config=self.data_ingestion_config)
             data_ingestion_artifact = data_ingestion.initiate_data_ingestion()
-            logging.info("Got the train_set and test_set from mongodb")
+            logging.info("Got the data from mongodb")
             logging.info("Exited the start_data_ingestion method of TrainPipeline class")
             return data_ingestion_artifact
         except Exception as e:
             raise MyException(e, sys) from e
-        
+
     def start_data_validation(self, data_ingestion_artifact: DataIngestionArtifact) -> DataValidationArtifact:
         """
         This method of TrainPipeline class is responsible for starting data validation component
@@ -70,49 +96,63 @@ class TrainPipeline:
             return data_validation_artifact
         except Exception as e:
             raise MyException(e, sys) from e
-        
-    def start_data_transformation(self, data_ingestion_artifact: DataIngestionArtifact, data_validation_artifact: DataValidationArtifact) -> DataTransformationArtifact:
+
+    def start_data_cleaning(self, data_ingestion_artifact: DataIngestionArtifact) -> DataCleaningArtifact:
         """
-        This method of TrainPipeline class is responsible for starting data transformation component
+        This method of TrainPipeline class is responsible for starting data cleaning component.
+        Validation is checked by start_feature_engineering, so cleaning can run while it is pending
         """
         try:
-            data_transformation = DataTransformation(data_ingestion_artifact=data_ingestion_artifact,
-                                                     data_transformation_config=self.data_transformation_config,
-                                                     data_validation_artifact=data_validation_artifact)
-            data_transformation_artifact = data_transformation.initiate_data_transformation()
-            return data_transformation_artifact
+            data_cleaning = DataCleaning(data_ingestion_artifact=data_ingestion_artifact,
+                                         data_cleaning_config=self.data_cleaning_config)
+            return data_cleaning.initiate_data_cleaning()
         except Exception as e:
-            raise MyException(e, sys)
-        
-    def start_model_trainer(self, data_transformation_artifact: DataTransformationArtifact) -> ModelTrainerArtifact:
+            raise MyException(e, sys) from e
+
+    def start_feature_engineering(self, data_ingestion_artifact: DataIngestionArtifact,
+                                  data_validation_artifact: DataValidationArtifact,
+                                  data_cleaning_artifact: DataCleaningArtifact) -> FeatureEngineeringArtifact:
+        """
+        This method of TrainPipeline class is responsible for starting feature engineering component
+        """
+        try:
+            if not data_validation_artifact.validation_status:
+                raise Exception(data_validation_artifact.message)
+            feature_engineering = FeatureEngineering(data_ingestion_artifact=data_ingestion_artifact,
+                                                     feature_engineering_config=self.feature_engineering_config,
+                                                     data_cleaning_artifact=data_cleaning_artifact)
+            return feature_engineering.initiate_feature_engineering()
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def start_model_trainer(self, feature_engineering_artifact: FeatureEngineeringArtifact,
+                            data_cleaning_artifact: DataCleaningArtifact) -> ModelTrainerArtifact:
         """
         This method of TrainPipeline class is responsible for starting model training
         """
         try:
-            model_trainer = ModelTrainer(data_transformation_artifact=data_transformation_artifact,
-                                         model_trainer_config=self.model_trainer_config
+            model_trainer = ModelTrainer(feature_engineering_artifact=feature_engineering_artifact,
+                                         model_trainer_config=self.model_trainer_config,
+                                         data_cleaning_artifact=data_cleaning_artifact
                                          )
-            model_trainer_artifact = model_trainer.initiate_model_trainer()
-            return model_trainer_artifact
-
+            return model_trainer.initiate_model_trainer()
         except Exception as e:
-            raise MyException(e, sys)
+            raise MyException(e, sys) from e
 
-    def start_model_evaluation(self, data_ingestion_artifact: DataIngestionArtifact,
-                               model_trainer_artifact: ModelTrainerArtifact) -> ModelEvaluationArtifact:
+    def start_model_evaluation(self, model_trainer_artifact: ModelTrainerArtifact,
+                               feature_engineering_artifact: FeatureEngineeringArtifact) -> ModelEvaluationArtifact:
         """
-        This method of TrainPipeline class is responsible for starting modle evaluation
+        This method of TrainPipeline class is responsible for starting model evaluation
         """
         try:
             model_evaluation = ModelEvaluation(model_eval_config=self.model_evaluation_config,
-                                               data_ingestion_artifact=data_ingestion_artifact,
-                                               model_trainer_artifact=model_trainer_artifact)
-            model_evaluation_artifact = model_evaluation.initiate_model_evaluation()
-            return model_evaluation_artifact
+                                               model_trainer_artifact=model_trainer_artifact,
+                                               feature_engineering_artifact=feature_engineering_artifact)
+            return model_evaluation.initiate_model_evaluation()
         except Exception as e:
-            raise MyException(e, sys)
+            raise MyException(e, sys) from e
 
-    def start_model_pusher(self, model_evaluation_artifact: ModelEvaluationArtifact) -> ModelPusherArtifact:
+    def start_model_pusher(self, model_evaluation_artifact: ModelEvaluationArtifact) -> Optional[dict]:
         """
         This method of TrainPipeline class is responsible for starting model pushing
         """
@@ -120,27 +160,156 @@ class TrainPipeline:
             model_pusher = ModelPusher(model_evaluation_artifact=model_evaluation_artifact,
                                        model_pusher_config=self.model_pusher_config
                                        )
-            model_pusher_artifact = model_pusher.initiate_model_pusher()
-            return model_pusher_artifact
+            return model_pusher.initiate_model_pusher()
         except Exception as e:
-            raise MyException(e, sys)
+            raise MyException(e, sys) from e
+
+    def collection_fingerprint(self) -> dict:
+        return Data().collection_fingerprint(collection_name=self.data_ingestion_config.collection_name,
+                                             database_name=self.data_ingestion_config.database_name)
+
+    def production_pointer_etag(self) -> Optional[str]:
+        registry = ModelRegistry(ModelRegistryConfig(bucket_name=self.model_evaluation_config.bucket_name))
+        return registry.read_production_pointer()[1]
+
+    def ingestion_fingerprint(self) -> dict:
+        return {"collection": self.collection_fingerprint(), "production": self.production_pointer_etag()}
+
+    def stages(self) -> list:
+        """
+        Declares every stage with what its artifact depends on. Config keys are the parts of
+        config/schema.yaml and config/model.yaml each component reads.
+        """
+        incremental = read_yaml_file(file_path=MODEL_CONFIG_FILE_PATH).get("model_trainer", {}).get("mode") == "incremental"
+        # Incremental runs continue from the production version: its watermark, schedule, feature
+        # parameters and model, all of which change only when a new version is promoted
+
+        return [
+            Stage(name="data_ingestion",
+                  run=lambda a: self.start_data_ingestion(),
+                  code_modules=("src.components.data_ingestion", "src.data_access.data"),
+                  # Whether an incremental run reads only the new documents depends on the schedule and the feature spec
+                  config_keys=((MODEL_CONFIG_FILE_PATH, "model_trainer.mode"),) + (
+                      ((MODEL_CONFIG_FILE_PATH, "model_trainer.incremental.full_retrain_every_n_runs"),
+                       (MODEL_CONFIG_FILE_PATH, "model_trainer.incremental.full_retrain_max_age_days"),
+                       (MODEL_CONFIG_FILE_PATH, "model_trainer.incremental.min_new_rows"),
+                       (MODEL_CONFIG_FILE_PATH, "feature_engineering")) if incremental else ()),
+                  config_values=config_fields(self.data_ingestion_config),
+                  external=self.ingestion_fingerprint if incremental else self.collection_fingerprint),
+            Stage(name="data_validation",
+                  run=lambda a: self.start_data_validation(a["data_ingestion"]),
+                  deps=("data_ingestion",),
+                  code_modules=("src.components.data_validation",),
+                  config_keys=((SCHEMA_FILE_PATH, "columns"), (SCHEMA_FILE_PATH, "numerical_columns"),
+                               (SCHEMA_FILE_PATH, "categorical_columns"), (SCHEMA_FILE_PATH, "target_column")),
+                  input_files=lambda a: [a["data_ingestion"].ingested_data_path]),
+            Stage(name="data_cleaning",
+                  run=lambda a: self.start_data_cleaning(a["data_ingestion"]),
+                  deps=("data_ingestion",),
+                  # Incremental runs clean the new rows with the production bundle's parameters
+                  code_modules=("src.components.data_cleaning", "src.entity.model_bundle"),
+                  config_keys=((SCHEMA_FILE_PATH, "numerical_columns"), (SCHEMA_FILE_PATH, "categorical_columns"),
+                               (SCHEMA_FILE_PATH, "target_column")),
+                  input_files=lambda a: [a["data_ingestion"].ingested_data_path]),
+            Stage(name="feature_engineering",
+                  run=lambda a: self.start_feature_engineering(a["data_ingestion"], a["data_validation"],
+                                                               a["data_cleaning"]),
+                  deps=("data_ingestion", "data_validation", "data_cleaning"),
+                  code_modules=("src.components.feature_engineering", "src.entity.feature_plan"),
+                  config_keys=((SCHEMA_FILE_PATH, "target_column"),
+                               (MODEL_CONFIG_FILE_PATH, "feature_engineering"),
+                               (MODEL_CONFIG_FILE_PATH, "model_evaluation.slices"),
+                               (MODEL_CONFIG_FILE_PATH, "model_trainer.mode")),
+                  config_values=config_fields(self.feature_engineering_config),
+                  # The raw test rows are saved for scoring the production model with its own bundle
+                  input_files=lambda a: [a["data_cleaning"].cleaned_data_file_path,
+                                         a["data_ingestion"].ingested_data_path]),
+            Stage(name="model_trainer",
+                  run=lambda a: self.start_model_trainer(a["feature_engineering"], a["data_cleaning"]),
+                  deps=("feature_engineering", "data_cleaning"),
+                  code_modules=("src.components.model_trainer", "src.components.hyperparameter_search",
+                                "src.components.model_tournament", "src.utils.estimator_factory",
+                                "src.utils.metrics", "src.entity.model_bundle", "src.entity.linear_scorer"),
+                  config_keys=((MODEL_CONFIG_FILE_PATH, "model_trainer"), (MODEL_CONFIG_FILE_PATH, "metrics")),
+                  config_values=config_fields(self.model_trainer_config),
+                  # The bundle embeds the fitted cleaning parameters
+                  input_files=lambda a: [a["feature_engineering"].train_file_path, a["feature_engineering"].test_file_path,
+                                         a["data_cleaning"].cleaning_params_file_path],
+                  external=self.production_pointer_etag if incremental else None),
+            Stage(name="model_evaluation",
+                  run=lambda a: self.start_model_evaluation(a["model_trainer"], a["feature_engineering"]),
+                  deps=("model_trainer", "feature_engineering"),
+                  code_modules=("src.components.model_evaluation", "src.components.streaming_evaluator",
+                                "src.utils.metrics", "src.utils.score_cache", "src.entity.model_bundle"),
+                  config_keys=((MODEL_CONFIG_FILE_PATH, "model_evaluation"), (MODEL_CONFIG_FILE_PATH, "metrics")),
+                  input_files=lambda a: [a["model_trainer"].trained_model_file_path,
+                                         a["feature_engineering"].test_file_path,
+                                         a["feature_engineering"].test_rows_file_path,
+                                         a["feature_engineering"].test_slices_file_path],
+                  # The challenger is compared with whatever is in production
+                  external=self.production_pointer_etag,
+                  # s3_model_path is a key in the bucket, not a local file
+                  output_files=lambda artifact: [artifact.trained_model_path, artifact.trained_model_predictions_file_path]),
+            Stage(name="model_pusher",
+                  run=lambda a: self.start_model_pusher(a["model_evaluation"]),
+                  deps=("model_evaluation",),
+                  code_modules=("src.components.model_pusher", "src.entity.model_registry"),
+                  config_keys=((MODEL_CONFIG_FILE_PATH, "serving.lookup_table"),
+                               (SCHEMA_FILE_PATH, "numerical_bounds"), (SCHEMA_FILE_PATH, "categorical_levels")),
+                  # Its output lives in the registry; the bundle file it adds the lookup table to is
+                  # the trainer's, covered by the upstream fingerprints
+                  output_files=lambda manifest: []),
+        ]
 
-    def run_pipeline(self, ) -> None:
+    def run_pipeline(self, force: bool = False, resume: bool = False) -> Dict[str, object]:
         """
-        This method of TrainPipeline class is responsible for running complete pipeline
+        This method of TrainPipeline class is responsible for running complete pipeline.
+        Stages that are up to date are skipped unless force is set. With resume, a run that failed or
+        was interrupted continues after the stages it completed, with their checkpointed artifacts.
+        Returns the artifact of every stage by name
         """
+        status = "failed"
         try:
-            data_ingestion_artifact = self.start_data_ingestion()
-            data_validation_artifact = self.start_data_validation(data_ingestion_artifact=data_ingestion_artifact)
-            data_transformation_artifact = self.start_data_transformation(
-                data_ingestion_artifact=data_ingestion_artifact, data_validation_artifact=data_validation_artifact)
-            model_trainer_artifact = self.start_model_trainer(data_transformation_artifact=data_transformation_artifact)
-            model_evaluation_artifact = self.start_model_evaluation(data_ingestion_artifact=data_ingestion_artifact,
-                                                                    model_trainer_artifact=model_trainer_artifact)
-            if not model_evaluation_artifact.is_model_accepted:
-                logging.info(f"Model not accepted.")
-                return None
-            model_pusher_artifact = self.start_model_pusher(model_evaluation_artifact=model_evaluation_artifact)
-            
+            artifacts = self.runner.run(force=force, resume=resume)
+            status = "completed"
+            if not artifacts["model_evaluation"].is_model_accepted:
+                logging.info("Model not accepted.")
+            return artifacts
         except Exception as e:
-            raise MyException(e, sys)
\ No newline at end of file
+            raise MyException(e, sys) from e
+        finally:
+            self.write_run_metrics(status)
+
+    def write_run_metrics(self, status: str) -> str:
+        """
+        Writes the run's metrics artifact: each stage's status and timings from the runner and the
+        resource metrics of every instrumented component call. Returns its file path
+        """
+        run_id = getattr(self.runner, "run_id", None) or "unknown"
+        self.metrics_file_path = os.path.join(training_pipeline_config.pipeline_metrics_dir, f"{run_id}.json")
+        write_metrics(self.metrics_file_path, {"run_id": run_id, "status": status,
+                                               "stages": getattr(self.runner, "stage_timings", {}),
+                                               "components": collect_metrics()})
+        return self.metrics_file_path
+
+
+def main(argv: Optional[list] = None) -> Dict[str, object]:
+    parser = argparse.ArgumentParser(description="Run the personality classifier training pipeline")
+    parser.add_argument("--force", action="store_true", help="Rerun every stage even if it is up to date")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the last run if it failed or was interrupted, reusing the stages it completed")
+    parser.add_argument("--max-workers", type=int, default=None, help="Most stages run at once (default: one per CPU)")
+    parser.add_argument("--profile-dir", default=None, help="Write a cProfile dump of every stage that runs to this directory")
+    parser.add_argument("--trace-allocations", action="store_true", help="Measure each stage's peak allocations with tracemalloc")
+    args = parser.parse_args(argv)
+    configure_instrumentation(profile_dir=args.profile_dir, trace_allocations=args.trace_allocations or None)
+
+    pipeline = TrainPipeline(max_workers=args.max_workers)
+    artifacts = pipeline.run_pipeline(force=args.force, resume=args.resume)
+    print(f"Ran {pipeline.runner.ran}, skipped {pipeline.runner.skipped}, resumed {pipeline.runner.resumed}")
+    print(f"Run metrics: {pipeline.metrics_file_path}")
+    return artifacts
+
+
+if __name__ == "__main__":
+    main()
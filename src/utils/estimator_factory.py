@@ -0,0 +1,30 @@
+import sys
+
+from sklearn.ensemble import ExtraTreesClassifier, HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+
+from src.exception import MyException
+
+# Estimators that can be referenced by name from config/model.yaml
+ESTIMATORS = {
+    "logistic_regression": LogisticRegression,
+    "random_forest": RandomForestClassifier,
+    "extra_trees": ExtraTreesClassifier,
+    "hist_gradient_boosting": HistGradientBoostingClassifier,
+    "sgd_classifier": SGDClassifier,
+}
+
+
+def build_estimator(name: str, params: dict = None) -> object:
+    """
+    Creates an unfitted estimator from its config name and hyperparameters.
+    name: str key of ESTIMATORS
+    params: dict hyperparameters passed to the estimator constructor
+    return: estimator object
+    """
+    try:
+        if name not in ESTIMATORS:
+            raise ValueError(f"Unknown estimator '{name}', expected one of {sorted(ESTIMATORS)}")
+        return ESTIMATORS[name](**(params or {}))
+    except Exception as e:
+        raise MyException(e, sys) from e
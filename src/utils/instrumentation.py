@@ -0,0 +1,213 @@
+import os
+import sys
+import json
+import time
+import resource
+import threading
+import functools
+import contextvars
+import tracemalloc
+import cProfile
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from src.constants import INSTRUMENTATION_PROFILE_DIR, INSTRUMENTATION_TRACEMALLOC, INSTRUMENTATION_RSS_SAMPLE_SECONDS
+from src.exception import MyException
+from src.logger import logging
+
+# Metrics of the instrumented call running in the current thread, for record_rows / record_s3_bytes
+_current: contextvars.ContextVar = contextvars.ContextVar("stage_metrics", default=None)
+_records: List[dict] = []
+_records_lock = threading.Lock()
+# Metrics of every instrumented call in progress, to tell which calls overlapped another one
+_active: List[dict] = []
+_active_lock = threading.Lock()
+# Whether tracemalloc was started by an instrumented call, and so is stopped once none is active
+_tracing = {"owned": False}
+_settings = {"profile_dir": INSTRUMENTATION_PROFILE_DIR, "tracemalloc": INSTRUMENTATION_TRACEMALLOC}
+_PAGE_MB = os.sysconf("SC_PAGE_SIZE") / (1024 * 1024) if hasattr(os, "sysconf") else None
+
+
+def configure_instrumentation(profile_dir: Optional[str] = None, trace_allocations: Optional[bool] = None) -> None:
+    """
+    Turns on the opt-in, costlier measurements for the following calls.
+    profile_dir: directory for one cProfile dump (pstats format) per instrumented call
+    trace_allocations: measure peak Python/NumPy allocations with tracemalloc, which slows allocation while
+                       instrumented calls run
+    """
+    if profile_dir is not None:
+        _settings["profile_dir"] = profile_dir
+    if trace_allocations is not None:
+        _settings["tracemalloc"] = trace_allocations
+
+
+def record_rows(n_rows: int) -> None:
+    """Adds to the rows processed by the instrumented call running in this thread, if any."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics["rows"] = (metrics["rows"] or 0) + int(n_rows)
+
+
+def record_s3_bytes(read: int = 0, written: int = 0) -> None:
+    """Adds to the bytes transferred from / to S3 by the instrumented call running in this thread, if any."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics["s3_read_bytes"] += int(read)
+        metrics["s3_written_bytes"] += int(written)
+
+
+def max_rss_mb() -> float:
+    """Lifetime peak RSS of this process, from ru_maxrss (KB, but bytes on macOS)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def rss_mb() -> Optional[float]:
+    """Current RSS of this process in MB."""
+    try:
+        with open("/proc/self/statm") as file_obj:
+            return int(file_obj.read().split()[1]) * _PAGE_MB
+    except (OSError, TypeError):
+        # The lifetime peak is the best available without /proc
+        return max_rss_mb()
+
+
+def _thread_io() -> Optional[dict]:
+    # Bytes passed to read / write system calls by this thread: local files as well as sockets
+    try:
+        with open("/proc/thread-self/io") as file_obj:
+            fields = dict(line.split(": ") for line in file_obj.read().splitlines())
+        return {"read": int(fields["rchar"]), "written": int(fields["wchar"])}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+class RssSampler(threading.Thread):
+    """Samples the process RSS in the background, as the OS peak cannot be read per interval."""
+
+    def __init__(self, interval: float):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = rss_mb()
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        while not self._done.wait(self.interval):
+            rss = rss_mb()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def stop(self) -> Optional[float]:
+        self._done.set()
+        self.join()
+        return self.peak
+
+
+def instrumented(func: Callable) -> Callable:
+    """
+    Decorator for the initiate_* methods of the pipeline components. Each call appends a record to
+    the run's metrics: wall and CPU time, RSS at start, end and sampled peak, rows processed, and
+    bytes read and written, to files and sockets and to S3.
+
+    CPU time is the calling thread's. RSS is the whole process's, so it includes stages running at
+    the same time. Child process CPU time and the tracemalloc peak are process-wide counters too, but
+    cannot be told apart between calls: they are only recorded for calls that did not overlap another
+    instrumented call, and are None (with "overlapped" set) otherwise.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        metrics = {"component": func.__qualname__, "started_at": datetime.now().isoformat(), "status": "running",
+                   "pid": os.getpid(), "thread_id": threading.get_native_id(),
+                   "rows": None, "s3_read_bytes": 0, "s3_written_bytes": 0, "overlapped": False}
+        with _active_lock:
+            for other in _active:
+                other["overlapped"] = metrics["overlapped"] = True
+            _active.append(metrics)
+        token = _current.set(metrics)
+        sampler = RssSampler(INSTRUMENTATION_RSS_SAMPLE_SECONDS)
+        sampler.start()
+        metrics["rss_start_mb"] = rss_mb()
+        io_start = _thread_io()
+        children_start = resource.getrusage(resource.RUSAGE_CHILDREN)
+        trace_allocations = _settings["tracemalloc"]
+        if trace_allocations:
+            with _active_lock:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    _tracing["owned"] = True
+            if not metrics["overlapped"]:
+                tracemalloc.reset_peak()
+        profiler = None
+        if _settings["profile_dir"]:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Only one profiler can be active at a time, e.g. when stages run concurrently
+                logging.warning(f"Not profiling {func.__qualname__}: another call is being profiled")
+                profiler = None
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            result = func(*args, **kwargs)
+            metrics["status"] = "completed"
+            return result
+        except Exception as e:
+            metrics["status"] = "failed"
+            metrics["error"] = str(e)[:500]
+            raise
+        finally:
+            metrics["wall_seconds"] = round(time.perf_counter() - wall_start, 4)
+            children_end = resource.getrusage(resource.RUSAGE_CHILDREN)
+            metrics["cpu_seconds"] = round(time.thread_time() - cpu_start, 4)
+            traced_peak = tracemalloc.get_traced_memory()[1] if trace_allocations else None
+            with _active_lock:
+                _active.remove(metrics)
+                # Tracing slows every allocation, so it does not outlive the outermost instrumented call
+                if not _active and _tracing["owned"]:
+                    tracemalloc.stop()
+                    _tracing["owned"] = False
+            metrics["children_cpu_seconds"] = None
+            if not metrics["overlapped"]:
+                metrics["children_cpu_seconds"] = round((children_end.ru_utime + children_end.ru_stime)
+                                                        - (children_start.ru_utime + children_start.ru_stime), 4)
+            if profiler is not None:
+                profiler.disable()
+                os.makedirs(_settings["profile_dir"], exist_ok=True)
+                metrics["profile_file_path"] = os.path.join(
+                    _settings["profile_dir"], f"{func.__qualname__}.{datetime.now().strftime('%Y%m%d_%H%M%S')}.prof")
+                profiler.dump_stats(metrics["profile_file_path"])
+            if trace_allocations:
+                metrics["tracemalloc_peak_mb"] = None if metrics["overlapped"] else round(traced_peak / (1024 * 1024), 2)
+            io_end = _thread_io()
+            if io_start is not None and io_end is not None:
+                metrics["read_bytes"] = io_end["read"] - io_start["read"]
+                metrics["written_bytes"] = io_end["written"] - io_start["written"]
+            metrics["rss_end_mb"] = rss_mb()
+            metrics["rss_peak_mb"] = max(value for value in (sampler.stop(), metrics["rss_start_mb"], metrics["rss_end_mb"])
+                                         if value is not None)
+            for key in ("rss_start_mb", "rss_end_mb", "rss_peak_mb"):
+                metrics[key] = round(metrics[key], 1)
+            _current.reset(token)
+            with _records_lock:
+                _records.append(metrics)
+            logging.info(f"{func.__qualname__}: {metrics['wall_seconds']}s wall, {metrics['cpu_seconds']}s CPU, "
+                         f"peak RSS {metrics['rss_peak_mb']} MB, {metrics['rows']} rows")
+    return wrapper
+
+
+def collect_metrics(reset: bool = True) -> List[dict]:
+    """Returns the records of the instrumented calls so far, in completion order."""
+    with _records_lock:
+        records = list(_records)
+        if reset:
+            _records.clear()
+    return records
+
+
+def write_metrics(file_path: str, content: dict) -> None:
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "w") as file_obj:
+            json.dump(content, file_obj, indent=4, default=str)
+        logging.info(f"Run metrics written to {file_path}")
+    except Exception as e:
+        raise MyException(e, sys) from e
@@ -1,5 +1,8 @@
 import os
 import sys
+import hashlib
+
+from typing import Iterable, Iterator, Tuple
 
 import numpy as np
 import dill
@@ -56,19 +59,59 @@ def save_numpy_array_data(file_path: str, array: np.array):
         raise MyException(e, sys) from e
 
 
-def load_numpy_array_data(file_path: str) -> np.array:
+def load_numpy_array_data(file_path: str, mmap_mode: str = None) -> np.array:
     """
     load numpy array data from file
     file_path: str location of file to load
+    mmap_mode: str e.g. "r" to memory-map the file instead of reading it into memory
     return: np.array data loaded
     """
     try:
+        if mmap_mode:
+            return np.load(file_path, mmap_mode=mmap_mode)
         with open(file_path, 'rb') as file_obj:
             return np.load(file_obj)
     except Exception as e:
         raise MyException(e, sys) from e
 
 
+def read_numpy_array_header(file_path: str) -> Tuple[tuple, np.dtype, int]:
+    """
+    Read the header of a 2D C-ordered .npy file without loading its data
+    file_path: str location of file
+    return: (shape, dtype, byte offset of the data)
+    """
+    try:
+        array = np.load(file_path, mmap_mode="r")
+        if array.ndim != 2 or not array.flags.c_contiguous:
+            raise ValueError(f"{file_path} must hold a C-ordered 2D array")
+        return array.shape, array.dtype, array.offset
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+
+def iter_numpy_array_blocks(file_path: str, block_rows: int, block_order: Iterable[int] = None) -> Iterator[np.array]:
+    """
+    Stream row blocks of a 2D .npy file with plain reads, so at most one block is resident in memory
+    file_path: str location of file
+    block_rows: int rows per block
+    block_order: optional order in which to visit the blocks, defaults to sequential
+    return: iterator of np.array blocks
+    """
+    try:
+        (n_rows, n_cols), dtype, offset = read_numpy_array_header(file_path)
+        row_bytes = n_cols * dtype.itemsize
+        n_blocks = -(-n_rows // block_rows)
+        with open(file_path, 'rb') as file_obj:
+            for block in (range(n_blocks) if block_order is None else block_order):
+                start = block * block_rows
+                count = min(block_rows, n_rows - start)
+                file_obj.seek(offset + start * row_bytes)
+                yield np.fromfile(file_obj, dtype=dtype, count=count * n_cols).reshape(count, n_cols)
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+
 def save_object(file_path: str, obj: object) -> None:
     logging.info("Entered the save_object method of utils")
 
@@ -83,6 +126,42 @@ def save_object(file_path: str, obj: object) -> None:
         raise MyException(e, sys) from e
 
 
+def file_fingerprint(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Content hash of a file, read in chunks so large artifacts are never held in memory.
+    file_path: str location of file
+    return: str sha256 hex digest
+    """
+    try:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as file_obj:
+            for chunk in iter(lambda: file_obj.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+
+def stable_test_mask(row_keys: np.array, test_size: float) -> np.array:
+    """
+    Test-set membership of each row that does not change from run to run, unlike a re-drawn random
+    split, whichever rows the run reads and in whatever order. Row keys (e.g. a hash of the raw row)
+    are hashed (splitmix64 finalizer) into uniform values in [0, 1).
+    row_keys: uint64 array, one key per row
+    test_size: float fraction of rows in the test set
+    return: boolean array, True for test rows
+    """
+    try:
+        with np.errstate(over="ignore"):
+            h = np.asarray(row_keys, dtype=np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+            h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+            h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+            h = h ^ (h >> np.uint64(31))
+        return (h >> np.uint64(11)).astype(np.float64) / float(1 << 53) < test_size
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+
 # def drop_columns(df: DataFrame, cols: list)-> DataFrame:
 
 #     """
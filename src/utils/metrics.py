@@ -0,0 +1,151 @@
+import sys
+from typing import Dict
+
+import numpy as np
+
+from src.exception import MyException
+from src.entity.artifact_entity import ClassificationMetricArtifact
+
+METRIC_NAMES = ("accuracy", "f1", "precision", "recall")
+
+
+def confusion_counts(y_true: np.array, y_pred: np.array) -> np.array:
+    """
+    Builds the binary confusion matrix in a single pass over the predictions.
+    y_true: np.array ground truth labels (0/1)
+    y_pred: np.array predicted labels (0/1)
+    return: np.array of int64 counts ordered [tn, fp, fn, tp]
+    """
+    try:
+        codes = 2 * np.asarray(y_true, dtype=np.int64) + np.asarray(y_pred, dtype=np.int64)
+        return np.bincount(codes, minlength=4)
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+
+def metrics_from_counts(counts: np.array) -> Dict[str, np.array]:
+    """
+    Derives every metric from confusion counts. Works on a single [tn, fp, fn, tp] vector
+    or on any stack of them (e.g. bootstrap resamples of shape (n_resamples, 4)).
+    Ratios with an empty denominator are 0, as with sklearn's zero_division default.
+    """
+    try:
+        tn, fp, fn, tp = np.moveaxis(np.asarray(counts, dtype=np.float64), -1, 0)
+
+        def ratio(numerator, denominator):
+            return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
+
+        return {
+            "accuracy": ratio(tp + tn, tp + tn + fp + fn),
+            "f1": ratio(2 * tp, 2 * tp + fp + fn),
+            "precision": ratio(tp, tp + fp),
+            "recall": ratio(tp, tp + fn),
+        }
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+
+def bootstrap_counts(counts: np.array, n_resamples: int, random_state: int = 42) -> np.array:
+    """
+    Bootstrap resamples of a confusion matrix. Resampling n rows with replacement only changes how
+    many rows land in each of the four cells, so each resample is drawn directly as a multinomial
+    over the cell counts, which costs O(n_resamples) instead of O(n_resamples * n_rows).
+    return: np.array of shape (n_resamples, 4)
+    """
+    try:
+        counts = np.asarray(counts, dtype=np.int64)
+        total = counts.sum()
+        if total == 0:
+            return np.zeros((n_resamples, 4), dtype=np.int64)
+        rng = np.random.default_rng(random_state)
+        return rng.multinomial(total, counts / total, size=n_resamples)
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+
+def get_classification_metrics_from_counts(counts: np.array, n_resamples: int = 0, confidence_level: float = 0.95,
+                                           random_state: int = 42) -> ClassificationMetricArtifact:
+    """
+    Builds the metric artifact from confusion counts, with bootstrap confidence intervals
+    when n_resamples > 0.
+    """
+    try:
+        point = metrics_from_counts(counts)
+        confidence_intervals = None
+        if n_resamples > 0:
+            resampled = metrics_from_counts(bootstrap_counts(counts, n_resamples, random_state))
+            tail = (1 - confidence_level) / 2
+            confidence_intervals = {name: [float(value) for value in np.quantile(resampled[name], [tail, 1 - tail])]
+                                    for name in METRIC_NAMES}
+        return ClassificationMetricArtifact(accuracy_score=float(point["accuracy"]),
+                                            f1_score=float(point["f1"]),
+                                            precision_score=float(point["precision"]),
+                                            recall_score=float(point["recall"]),
+                                            confusion_counts=[int(count) for count in counts],
+                                            confidence_intervals=confidence_intervals)
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+
+def get_classification_metrics(y_true: np.array, y_pred: np.array, n_resamples: int = 0,
+                               confidence_level: float = 0.95, random_state: int = 42) -> ClassificationMetricArtifact:
+    """
+    Scores predictions with the metrics reported for every trained model.
+    y_true: np.array ground truth labels
+    y_pred: np.array predicted labels
+    n_resamples: int bootstrap resamples for confidence intervals, 0 to skip them
+    return: ClassificationMetricArtifact
+    """
+    try:
+        return get_classification_metrics_from_counts(confusion_counts(y_true, y_pred), n_resamples=n_resamples,
+                                                      confidence_level=confidence_level, random_state=random_state)
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+
+def paired_confusion_counts(y_true: np.array, challenger_pred: np.array, champion_pred: np.array) -> np.array:
+    """
+    Joint counts of (label, challenger prediction, champion prediction) over the same rows.
+    return: np.array of 8 int64 counts, cell 4 * y + 2 * challenger + champion
+    """
+    try:
+        codes = (4 * np.asarray(y_true, dtype=np.int64) + 2 * np.asarray(challenger_pred, dtype=np.int64)
+                 + np.asarray(champion_pred, dtype=np.int64))
+        return np.bincount(codes, minlength=8)
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+
+def split_paired_counts(paired_counts: np.array) -> tuple:
+    """
+    Confusion counts [tn, fp, fn, tp] of the challenger and of the champion from joint counts, or from
+    any stack of them (e.g. bootstrap resamples of shape (n_resamples, 8)).
+    """
+    cells = np.asarray(paired_counts).reshape(np.shape(paired_counts)[:-1] + (2, 2, 2))
+    challenger = cells.sum(axis=-1).reshape(cells.shape[:-3] + (4,))
+    champion = cells.sum(axis=-2).reshape(cells.shape[:-3] + (4,))
+    return challenger, champion
+
+
+def win_probability(paired_counts: np.array, metric: str = "f1", n_resamples: int = 2000, random_state: int = 42) -> float:
+    """
+    Probability that the challenger's metric beats the champion's. Both models were scored on the same
+    test rows, so rows are resampled together: each resample is a multinomial draw over the joint
+    (label, challenger prediction, champion prediction) counts and both metrics come from the same
+    draw, which keeps the correlation between the models. Ties count as half a win, so two models
+    with identical predictions get 0.5. Without resamples it reduces to comparing point estimates.
+    paired_counts: np.array of 8 counts from paired_confusion_counts
+    """
+    try:
+        paired_counts = np.asarray(paired_counts, dtype=np.int64)
+        total = paired_counts.sum()
+        if n_resamples <= 0 or total == 0:
+            draws = paired_counts
+        else:
+            rng = np.random.default_rng(random_state)
+            draws = rng.multinomial(total, paired_counts / total, size=n_resamples)
+        challenger, champion = split_paired_counts(draws)
+        challenger_metric, champion_metric = metrics_from_counts(challenger)[metric], metrics_from_counts(champion)[metric]
+        return float(np.mean(challenger_metric > champion_metric) + 0.5 * np.mean(challenger_metric == champion_metric))
+    except Exception as e:
+        raise MyException(e, sys) from e
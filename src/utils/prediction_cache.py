@@ -0,0 +1,57 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of predictions keyed by the normalized feature tuple of a record.
+
+    Entries belong to one model version: the first lookup or insert with a different version
+    empties the cache, so a hot reload never serves predictions of the previous model.
+    """
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = int(max_entries)
+        self.model_version: Optional[str] = None
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _use_version(self, model_version: Optional[str]) -> None:
+        if model_version != self.model_version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.model_version = model_version
+
+    def get(self, model_version: Optional[str], key: Hashable):
+        """The cached prediction for key under model_version, or None."""
+        with self._lock:
+            self._use_version(model_version)
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, model_version: Optional[str], key: Hashable, value) -> None:
+        with self._lock:
+            self._use_version(model_version)
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"model_version": self.model_version, "size": len(self._entries), "max_entries": self.max_entries,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None}
@@ -0,0 +1,85 @@
+import sys
+import json
+import base64
+from typing import Optional, Tuple
+
+import numpy as np
+
+from src.exception import MyException
+from src.logger import logging
+
+SCORE_CACHE_SUFFIX = ".scores.json"
+MAX_CACHED_TEST_SETS = 16
+
+
+def score_cache_key(model_key: str) -> str:
+    """S3 key of the champion score cache stored next to the model object."""
+    return model_key + SCORE_CACHE_SUFFIX
+
+
+def _read_cache(client, bucket: str, model_key: str) -> dict:
+    cache_key = score_cache_key(model_key)
+    if client.head_object(bucket=bucket, key=cache_key) is None:
+        return {}
+    return json.loads(client.download_file(bucket=bucket, key=cache_key, as_object=True))
+
+
+def _pack_predictions(predictions: np.array) -> dict:
+    # One bit per test row keeps even large holdouts small in the cache
+    return {"n_rows": int(len(predictions)),
+            "bits": base64.b64encode(np.packbits(np.asarray(predictions, dtype=np.bool_)).tobytes()).decode()}
+
+
+def _unpack_predictions(packed: dict) -> np.array:
+    bits = np.frombuffer(base64.b64decode(packed["bits"]), dtype=np.uint8)
+    return np.unpackbits(bits, count=packed["n_rows"]).astype(np.bool_)
+
+
+def read_champion_scores(client, bucket: str, model_key: str, model_etag: str,
+                         test_fingerprint: str) -> Tuple[Optional[dict], Optional[np.array]]:
+    """
+    Returns the cached scores (overall and per-slice confusion counts) of the model stored at model_key
+    on the given test set and its prediction for every test row, or (None, None) when the model object
+    changed since they were computed or that test set was never scored. The predictions are needed to
+    pair the champion with a challenger row by row; entries cached without them are not returned.
+    client: buckets S3 wrapper
+    model_etag: str ETag of the current model object
+    test_fingerprint: str content hash of the raw test rows
+    """
+    try:
+        cache = _read_cache(client, bucket, model_key)
+        if cache.get("model_etag") != model_etag:
+            return None, None
+        scores = cache.get("scores", {}).get(test_fingerprint)
+        packed = cache.get("predictions", {}).get(test_fingerprint)
+        if scores is None or packed is None:
+            return None, None
+        return scores, _unpack_predictions(packed)
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+
+def write_champion_scores(client, bucket: str, model_key: str, model_etag: str, test_fingerprint: str,
+                          model_scores: dict, predictions: np.array) -> None:
+    """
+    Records the scores and the per-row predictions of the model stored at model_key on a test set.
+    Scores of a previous model object are dropped, and only the most recent test sets are kept.
+    """
+    try:
+        cache = _read_cache(client, bucket, model_key)
+        is_same_model = cache.get("model_etag") == model_etag
+        scores = cache.get("scores", {}) if is_same_model else {}
+        packed = cache.get("predictions", {}) if is_same_model else {}
+        scores.pop(test_fingerprint, None)
+        packed.pop(test_fingerprint, None)
+        scores[test_fingerprint] = model_scores
+        packed[test_fingerprint] = _pack_predictions(predictions)
+        kept = list(scores)[-MAX_CACHED_TEST_SETS:]
+        client.upload_file(bucket=bucket, key=score_cache_key(model_key),
+                           body=json.dumps({"model_etag": model_etag,
+                                            "scores": {fingerprint: scores[fingerprint] for fingerprint in kept},
+                                            "predictions": {fingerprint: packed[fingerprint] for fingerprint in kept
+                                                            if fingerprint in packed}}).encode())
+        logging.info(f"Cached champion scores for model {model_etag} on test set {test_fingerprint[:12]}")
+    except Exception as e:
+        raise MyException(e, sys) from e
@@ -0,0 +1,65 @@
+import sys
+from datetime import datetime
+from typing import Optional, Tuple
+
+from src.entity.config_entity import ModelRegistryConfig
+from src.entity.model_registry import ModelRegistry
+from src.exception import MyException
+from src.logger import logging
+
+
+def read_training_state(bucket_name: str) -> Tuple[dict, Optional[str]]:
+    """
+    Returns the incremental training state recorded in the manifest of the production version, and
+    that version. The state only moves forward when a model is promoted, so a rejected challenger
+    leaves the watermark and the full retrain schedule of the model it was compared with.
+    bucket_name: str model bucket holding the registry
+    """
+    try:
+        manifest = ModelRegistry(ModelRegistryConfig(bucket_name=bucket_name)).get_production_manifest()
+        if manifest is None:
+            return {}, None
+        return manifest.get("training_state") or {}, manifest["version"]
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+
+def next_training_state(state: dict, is_full_retrain: bool, watermark: Optional[str], mode: Optional[str] = None) -> dict:
+    """
+    The training state of a model trained up to watermark, recorded in its manifest when it is promoted.
+    state: dict training state of the production version it was trained from
+    mode: str model_trainer.mode it was trained in; only a model trained incrementally is updated on new rows
+    """
+    now = datetime.now().isoformat()
+    state = dict(state)
+    if is_full_retrain:
+        state["last_full_retrain"] = now
+        state["incremental_runs"] = 0
+    else:
+        state["incremental_runs"] = state.get("incremental_runs", 0) + 1
+    state["last_run"] = now
+    state["watermark"] = watermark
+    state["mode"] = mode
+    return state
+
+
+def is_full_retrain_due(state: dict, incremental_config: dict) -> bool:
+    """
+    A full retrain is due on the first run, after full_retrain_every_n_runs incremental runs,
+    or once the last full retrain is older than full_retrain_max_age_days.
+    state: dict training state from read_training_state
+    incremental_config: dict ``model_trainer.incremental`` section of the model config
+    """
+    try:
+        if not state.get("last_full_retrain"):
+            return True
+        if state.get("incremental_runs", 0) >= int(incremental_config.get("full_retrain_every_n_runs", 10)):
+            logging.info("Full retrain due: incremental run limit reached")
+            return True
+        age = datetime.now() - datetime.fromisoformat(state["last_full_retrain"])
+        if age.days >= int(incremental_config.get("full_retrain_max_age_days", 7)):
+            logging.info(f"Full retrain due: last full retrain is {age.days} days old")
+            return True
+        return False
+    except Exception as e:
+        raise MyException(e, sys) from e
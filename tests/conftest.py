@@ -0,0 +1,21 @@
+import socket
+from urllib.request import Request, urlopen
+
+import pytest
+
+
+@pytest.fixture
+def moto_s3(monkeypatch):
+    """An in-process moto S3 server that buckets() connects to through AWS_ENDPOINT_URL."""
+    server_module = pytest.importorskip("moto.server", reason="moto[server] is needed for the S3 tests")
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = server_module.ThreadedMotoServer(ip_address="127.0.0.1", port=port)
+    server.start()
+    endpoint = f"http://127.0.0.1:{port}"
+    monkeypatch.setenv("AWS_ENDPOINT_URL", endpoint)
+    yield
+    # The server keeps its buckets in the process-wide moto backend, which outlives the server
+    urlopen(Request(f"{endpoint}/moto-api/reset", method="POST")).close()
+    server.stop()
@@ -0,0 +1,63 @@
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from src.constants import MODEL_CONFIG_FILE_PATH
+from src.entity.feature_plan import FeaturePlan
+from src.utils.main_utils import read_yaml_file
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# What DataCleaning would save for raw data like cleaned_data's
+CLEANING_PARAMS = {
+    "medians": {"Time_spent_Alone": 4.0, "Social_event_attendance": 5.0, "Going_outside": 3.0,
+                "Friends_circle_size": 5.0, "Post_frequency": 3.0},
+    "modes": {"Stage_fear": "No", "Drained_after_socializing": "No"},
+    "dummy_levels": {"Stage_fear": ["Yes"], "Drained_after_socializing": ["Yes"]},
+    "caps": {"Time_spent_Alone": [-7.0, 17.0], "Social_event_attendance": [-8.0, 18.0], "Going_outside": [-5.0, 11.0],
+             "Friends_circle_size": [-12.0, 28.0], "Post_frequency": [-9.0, 19.0]},
+    "target_classes": ["Extrovert", "Introvert"],
+}
+
+
+def cleaned_data(n_rows: int = 2000, seed: int = 0):
+    """Rows shaped like the output of DataCleaning: numeric columns, encoded booleans, 0/1 target."""
+    rng = np.random.default_rng(seed)
+    target = rng.integers(0, 2, n_rows)
+    columns = pd.DataFrame({
+        "Time_spent_Alone": np.round(rng.uniform(0, 11, n_rows) + 2 * target),
+        "Social_event_attendance": np.round(rng.uniform(0, 10, n_rows) - 2 * target).clip(0),
+        "Going_outside": np.round(rng.uniform(0, 7, n_rows)),
+        "Friends_circle_size": np.round(rng.uniform(0, 15, n_rows) - 3 * target).clip(0),
+        "Post_frequency": np.round(rng.uniform(0, 10, n_rows)),
+        "Stage_fear_Yes": rng.random(n_rows) < 0.3 + 0.4 * target,
+        "Drained_after_socializing_Yes": rng.random(n_rows) < 0.3 + 0.4 * target,
+    })
+    return columns, target
+
+
+def raw_columns(n_rows: int, seed: int):
+    """Raw records as they reach the service: Yes/No strings and some missing values."""
+    cleaned, target = cleaned_data(n_rows=n_rows, seed=seed)
+    columns = {column: cleaned[column].to_numpy(dtype=np.float64, copy=True) for column in CLEANING_PARAMS["medians"]}
+    for column in CLEANING_PARAMS["modes"]:
+        columns[column] = np.where(cleaned[f"{column}_Yes"], "Yes", "No").astype(object)
+    rng = np.random.default_rng(seed)
+    for column, values in columns.items():
+        values[rng.random(n_rows) < 0.05] = np.nan if values.dtype == np.float64 else None
+    return columns, target
+
+
+def model_config() -> dict:
+    return read_yaml_file(os.path.join(REPO_DIR, MODEL_CONFIG_FILE_PATH))
+
+
+def fit_pipeline(model, seed: int = 0, config: dict = None):
+    """Fits the feature plan, scaler and model the way FeatureEngineering and ModelTrainer do."""
+    columns, target = cleaned_data(seed=seed)
+    feature_plan = FeaturePlan.from_config(config or model_config())
+    feature_plan.fit(columns)
+    scaler = StandardScaler().fit(feature_plan.transform(columns))
+    model.fit(scaler.transform(feature_plan.transform(columns)), target)
+    return feature_plan, scaler, model
@@ -0,0 +1,83 @@
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import PolynomialFeatures
+
+from src.entity.feature_plan import FeaturePlan
+from tests.synthetic import cleaned_data, model_config
+
+
+def pandas_features(X: pd.DataFrame, time_alone_bins) -> pd.DataFrame:
+    """The feature code FeaturePlan replaced, from FeatureEngineering before the plan existed."""
+    X = X.copy()
+    X['Alone_to_Social_Ratio'] = X['Time_spent_Alone'] / (X['Social_event_attendance'] + 1)
+    X['Social_Comfort_Index'] = (X['Friends_circle_size'] + X['Post_frequency'] - X['Stage_fear_Yes']) / 3
+    X['Social_Overload'] = X['Drained_after_socializing_Yes'] * X['Social_event_attendance']
+    X['Time_spent_Alone_Binned'] = pd.cut(X['Time_spent_Alone'], bins=time_alone_bins, labels=['Low', 'Medium', 'High'], include_lowest=True)
+    X = pd.get_dummies(X, columns=['Time_spent_Alone_Binned'], drop_first=True)
+    poly = PolynomialFeatures(degree=2, include_bias=False, interaction_only=True)
+    poly_columns = ['Time_spent_Alone', 'Social_event_attendance', 'Friends_circle_size']
+    poly_features = poly.fit_transform(X[poly_columns])
+    X[poly.get_feature_names_out(poly_columns)] = poly_features
+    return X.astype(np.float64)
+
+
+@pytest.fixture
+def fitted_data():
+    train, _ = cleaned_data(n_rows=300, seed=0)
+    test, _ = cleaned_data(n_rows=100, seed=1)
+    # Values outside the fitted range of the binned column, which pd.cut put in no bin, and its edges
+    test.loc[:3, "Time_spent_Alone"] = [-1.0, 30.0, train["Time_spent_Alone"].min(), train["Time_spent_Alone"].max()]
+    return train, test
+
+
+def test_matches_pandas_feature_code(fitted_data):
+    train, test = fitted_data
+    plan = FeaturePlan.from_config(model_config()).fit(train)
+    expected = pandas_features(test, pd.qcut(train['Time_spent_Alone'], q=3, retbins=True)[1])
+
+    features = plan.transform(test)
+    assert plan.feature_names == list(expected.columns)
+    np.testing.assert_allclose(features, expected.to_numpy())
+    dummies = [plan.feature_names.index(name) for name in ("Time_spent_Alone_Binned_Medium", "Time_spent_Alone_Binned_High")]
+    assert not features[:2][:, dummies].any()
+
+
+def test_shared_subexpressions_are_computed_once(fitted_data):
+    train, test = fitted_data
+    config = model_config()
+    # The same product as a polynomial term of the spec, under a name of its own
+    config["feature_engineering"]["derived_features"].append(
+        {"name": "Alone_x_Friends", "type": "product", "inputs": ["Friends_circle_size", "Time_spent_Alone"]})
+    plan = FeaturePlan.from_config(config).fit(train)
+    baseline = FeaturePlan.from_config(model_config())
+
+    assert len(plan._nodes) == len(baseline._nodes)
+    features = plan.transform(test)
+    np.testing.assert_array_equal(features[:, plan.feature_names.index("Alone_x_Friends")],
+                                  features[:, plan.feature_names.index("Time_spent_Alone Friends_circle_size")])
+
+
+def test_prunes_nodes_of_unselected_features(fitted_data):
+    train, test = fitted_data
+    config = model_config()
+    selected = ["Alone_to_Social_Ratio", "Time_spent_Alone_Binned_High"]
+    config["feature_engineering"]["selected_features"] = selected
+    plan = FeaturePlan.from_config(config).fit(train[["Time_spent_Alone", "Social_event_attendance"]])
+
+    assert plan.feature_names == selected
+    assert plan.input_columns == ["Time_spent_Alone", "Social_event_attendance"]
+    # Columns the selected features do not need are never read
+    features = plan.transform(test[["Time_spent_Alone", "Social_event_attendance"]])
+    expected = pandas_features(test, pd.qcut(train['Time_spent_Alone'], q=3, retbins=True)[1])
+    np.testing.assert_allclose(features, expected[selected].to_numpy())
+
+
+def test_round_trip_keeps_bin_edges(fitted_data):
+    train, test = fitted_data
+    plan = FeaturePlan.from_config(model_config()).fit(train)
+    restored = FeaturePlan.from_dict(copy.deepcopy(plan.to_dict()))
+    assert restored.version == plan.version
+    np.testing.assert_array_equal(restored.transform(test), plan.transform(test))
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+
+from src.entity.linear_scorer import LinearScorer
+from tests.synthetic import cleaned_data, fit_pipeline
+
+
+@pytest.mark.parametrize("model", [LogisticRegression(max_iter=1000),
+                                   SGDClassifier(loss="log_loss", random_state=0)])
+def test_raw_columns_match_sklearn_pipeline(model):
+    feature_plan, scaler, model = fit_pipeline(model)
+    scorer = LinearScorer.from_dict(LinearScorer.from_model(model, feature_plan, scaler).to_dict())
+    columns, _ = cleaned_data(seed=1)
+
+    expected = scaler.transform(feature_plan.transform(columns))
+    features = scorer.transform({column: columns[column].to_numpy() for column in columns.columns})
+
+    np.testing.assert_allclose(features, expected)
+    np.testing.assert_array_equal(scorer.predict(features), model.predict(expected))
+    np.testing.assert_allclose(scorer.predict_proba(features), model.predict_proba(expected)[:, 1])
+
+
+@pytest.mark.parametrize("model", [SGDClassifier(loss="hinge", random_state=0),
+                                   SGDClassifier(loss="modified_huber", random_state=0)])
+def test_rejects_models_without_logistic_probabilities(model):
+    _, _, model = fit_pipeline(model)
+    assert not LinearScorer.is_supported(model)
+
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
+
+from src.utils.metrics import (bootstrap_counts, confusion_counts, metrics_from_counts, paired_confusion_counts,
+                               split_paired_counts, win_probability)
+
+
+def predictions(n_rows: int, accuracy: float, seed: int):
+    rng = np.random.default_rng(seed)
+    y_true = rng.integers(0, 2, n_rows)
+    y_pred = np.where(rng.random(n_rows) < accuracy, y_true, 1 - y_true)
+    return y_true, y_pred
+
+
+@pytest.mark.parametrize("y_true, y_pred", [
+    predictions(1000, 0.8, seed=0),
+    predictions(37, 0.5, seed=1),
+    (np.array([0, 1, 1, 0]), np.zeros(4, dtype=np.int64)),  # no positive predictions
+    (np.zeros(4, dtype=np.int64), np.zeros(4, dtype=np.int64)),  # no positive labels either
+])
+def test_metrics_from_counts_match_sklearn(y_true, y_pred):
+    metrics = metrics_from_counts(confusion_counts(y_true, y_pred))
+    assert metrics["accuracy"] == pytest.approx(accuracy_score(y_true, y_pred))
+    assert metrics["f1"] == pytest.approx(f1_score(y_true, y_pred, zero_division=0))
+    assert metrics["precision"] == pytest.approx(precision_score(y_true, y_pred, zero_division=0))
+    assert metrics["recall"] == pytest.approx(recall_score(y_true, y_pred, zero_division=0))
+
+
+def test_metrics_from_counts_on_bootstrap_resamples():
+    counts = confusion_counts(*predictions(1000, 0.8, seed=0))
+    resamples = bootstrap_counts(counts, n_resamples=500)
+    assert resamples.shape == (500, 4)
+    assert (resamples.sum(axis=1) == counts.sum()).all()
+    metrics = metrics_from_counts(resamples)
+    for name, value in metrics_from_counts(counts).items():
+        assert metrics[name].shape == (500,)
+        assert metrics[name].mean() == pytest.approx(value, abs=0.01)
+
+
+def test_paired_counts_split_into_each_models_confusion_counts():
+    y_true, challenger = predictions(1000, 0.9, seed=0)
+    champion = np.where(np.random.default_rng(1).random(1000) < 0.8, y_true, 1 - y_true)
+    paired = paired_confusion_counts(y_true, challenger, champion)
+    assert paired.shape == (8,) and paired.sum() == 1000
+    challenger_counts, champion_counts = split_paired_counts(paired)
+    np.testing.assert_array_equal(challenger_counts, confusion_counts(y_true, challenger))
+    np.testing.assert_array_equal(champion_counts, confusion_counts(y_true, champion))
+
+
+def test_win_probability_is_even_for_identical_predictions():
+    y_true, y_pred = predictions(1000, 0.8, seed=0)
+    assert win_probability(paired_confusion_counts(y_true, y_pred, y_pred), n_resamples=2000) == pytest.approx(0.5)
+
+
+def test_win_probability_of_a_strictly_better_model():
+    y_true, champion = predictions(1000, 0.8, seed=0)
+    paired = paired_confusion_counts(y_true, y_true, champion)
+    assert win_probability(paired, n_resamples=2000) == pytest.approx(1.0)
+    # Swapped roles: the worse model never wins
+    assert win_probability(paired_confusion_counts(y_true, champion, y_true), n_resamples=2000) == pytest.approx(0.0)
+
+
+def test_win_probability_keeps_the_pairing():
+    # The challenger fixes 15 of the champion's errors and makes no new ones. Resampled independently
+    # the two metrics overlap; resampled on the same rows the challenger wins almost every time
+    y_true, champion = predictions(2000, 0.8, seed=0)
+    challenger = champion.copy()
+    fixed = np.flatnonzero(champion != y_true)[:15]
+    challenger[fixed] = y_true[fixed]
+    assert win_probability(paired_confusion_counts(y_true, challenger, champion), n_resamples=2000) > 0.99
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+from src.entity.model_bundle import ModelBundle
+from tests.synthetic import CLEANING_PARAMS, fit_pipeline, raw_columns
+
+# Small enough to build quickly; most test rows fall outside it and go through the model
+LOOKUP_NUMERICAL_BOUNDS = {column: [0, 6] for column in CLEANING_PARAMS["medians"]}
+LOOKUP_CATEGORICAL_LEVELS = {column: ["Yes", "No"] for column in CLEANING_PARAMS["modes"]}
+
+
+def pipeline_predictions(columns: dict, feature_plan, scaler, model) -> tuple:
+    """The in-memory training pipeline: impute, encode, feature plan, scaler, model."""
+    cleaned = {column: np.where(np.isnan(columns[column]), median, columns[column])
+               for column, median in CLEANING_PARAMS["medians"].items()}
+    for column, mode in CLEANING_PARAMS["modes"].items():
+        cleaned[f"{column}_Yes"] = np.where(columns[column] == None, mode, columns[column]) == "Yes"  # noqa: E711
+    features = scaler.transform(feature_plan.transform(cleaned))
+    labels = np.asarray(CLEANING_PARAMS["target_classes"], dtype=object)[model.predict(features)]
+    return labels, model.predict_proba(features)[:, 1]
+
+
+@pytest.mark.parametrize("model, kind", [(LogisticRegression(max_iter=1000), "linear"),
+                                         (RandomForestClassifier(n_estimators=20, random_state=0), "pickle")])
+@pytest.mark.parametrize("with_lookup_table", [False, True])
+def test_save_load_round_trip_matches_the_pipeline(tmp_path, model, kind, with_lookup_table):
+    feature_plan, scaler, model = fit_pipeline(model)
+    bundle = ModelBundle.build(CLEANING_PARAMS, feature_plan, scaler, model, metadata={"model_version": "v1"})
+    if with_lookup_table:
+        bundle.build_lookup_table(LOOKUP_NUMERICAL_BOUNDS, LOOKUP_CATEGORICAL_LEVELS)
+    bundle.save(str(tmp_path / "model_bundle.bin"))
+    loaded = ModelBundle.load(str(tmp_path / "model_bundle.bin"))
+
+    assert loaded.model_info["kind"] == kind
+    assert loaded.metadata == {"model_version": "v1"}
+    assert (loaded.lookup is not None) == with_lookup_table
+    columns, _ = raw_columns(n_rows=500, seed=1)
+    if with_lookup_table:
+        in_domain = loaded.lookup_index(columns)[1]
+        assert in_domain.any() and not in_domain.all()
+
+    expected_labels, expected_proba = pipeline_predictions(columns, feature_plan, scaler, model)
+    labels, proba = loaded.predict_with_proba(columns)
+    np.testing.assert_array_equal(labels, expected_labels)
+    np.testing.assert_array_equal(loaded.predict(columns), expected_labels)
+    # The lookup table keeps probabilities as float32
+    tolerance = 1e-6 if with_lookup_table else 1e-12
+    np.testing.assert_allclose(proba, expected_proba, rtol=tolerance)
+    np.testing.assert_allclose(loaded.predict_proba(columns), expected_proba, rtol=tolerance)
+    np.testing.assert_array_equal(loaded.predict(columns), bundle.predict(columns))
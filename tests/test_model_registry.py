@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from src.configuration.aws_connection import buckets
+from src.entity.config_entity import ModelRegistryConfig
+from src.entity.model_registry import ModelRegistry
+from src.exception import MyException
+
+REGISTRY_BUCKET_NAME = "personality-classifier-registry-test-bucket"
+
+
+@pytest.fixture
+def registry(moto_s3) -> ModelRegistry:
+    buckets().s3_client.create_bucket(Bucket=REGISTRY_BUCKET_NAME)
+    return ModelRegistry(ModelRegistryConfig(bucket_name=REGISTRY_BUCKET_NAME))
+
+
+def register_versions(registry: ModelRegistry, tmp_path, n_versions: int) -> list:
+    manifests = []
+    for index in range(n_versions):
+        model_file_path = tmp_path / f"model_{index}.pkl"
+        model_file_path.write_bytes(os.urandom(64))
+        manifests.append(registry.register_model(str(model_file_path), {}))
+    return manifests
+
+
+def promote(registry: ModelRegistry, manifest: dict) -> dict:
+    _, pointer_etag = registry.read_production_pointer()
+    return registry.promote(manifest, expected_pointer_etag=pointer_etag)
+
+
+def test_promote_fails_when_the_pointer_changed_since_it_was_read(registry, tmp_path):
+    first, second, third = register_versions(registry, tmp_path, 3)
+    # Two evaluations both decide to promote while production does not exist yet
+    registry.promote(first, expected_pointer_etag=None)
+    with pytest.raises(MyException, match="PreconditionFailed"):
+        registry.promote(second, expected_pointer_etag=None)
+
+    _, stale_etag = registry.read_production_pointer()
+    promote(registry, second)
+    with pytest.raises(MyException, match="PreconditionFailed"):
+        registry.promote(third, expected_pointer_etag=stale_etag)
+    assert registry.read_production_pointer()[0]["version"] == second["version"]
+
+
+def test_rollbacks_walk_back_through_the_promotion_history(registry, tmp_path):
+    versions = [manifest["version"] for manifest in register_versions(registry, tmp_path, 3)]
+    for manifest in map(registry.read_manifest, versions):
+        pointer = promote(registry, manifest)
+    assert pointer["history"] == versions[:2] and pointer["previous_version"] == versions[1]
+
+    pointer = registry.rollback()
+    assert pointer["version"] == versions[1] and pointer["history"] == versions[:1]
+    pointer = registry.rollback()
+    assert pointer["version"] == versions[0] and pointer["previous_version"] is None
+    assert registry.read_production_pointer()[0]["version"] == versions[0]
+    with pytest.raises(MyException, match="No previous production version"):
+        registry.rollback()
+
+    # Promoting again after the rollbacks starts the history from the rolled-back version
+    assert promote(registry, registry.read_manifest(versions[2]))["history"] == versions[:1]
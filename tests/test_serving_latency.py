@@ -0,0 +1,83 @@
+"""
+Request latency of the prediction service with its bundle fetched from S3: LocalStack from
+docker-compose.yml, or whatever endpoint AWS_ENDPOINT_URL points to. Skipped when no endpoint
+is reachable.
+
+    docker compose up -d localstack && python -m pytest -q tests/test_serving_latency.py -s
+"""
+import os
+import time
+import socket
+from urllib.parse import urlparse
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.linear_model import LogisticRegression
+
+from src.configuration.aws_connection import buckets
+from src.entity.config_entity import ModelRegistryConfig
+from src.entity.model_bundle import ModelBundle
+from src.entity.model_registry import ModelRegistry
+from src.entity.s3_estimator import Proj1Estimator
+from src.utils.main_utils import save_object
+from tests.synthetic import CLEANING_PARAMS, fit_pipeline
+
+LATENCY_BUCKET_NAME = "personality-classifier-latency-test-bucket"
+N_REQUESTS = 2000
+# Generous against the ~2.5 ms measured locally, so only a request that goes back to S3 or
+# rebuilds the model trips it
+P99_BUDGET_MS = 20.0
+RECORD = {"Time_spent_Alone": 4.0, "Stage_fear": "No", "Social_event_attendance": 5.0, "Going_outside": 3.0,
+          "Drained_after_socializing": None, "Friends_circle_size": 8.0, "Post_frequency": 5.0}
+
+
+def endpoint_reachable() -> bool:
+    endpoint = urlparse(os.getenv("AWS_ENDPOINT_URL", "http://localhost:4566"))
+    try:
+        with socket.create_connection((endpoint.hostname, endpoint.port or 80), timeout=1):
+            return True
+    except OSError:
+        return False
+
+
+pytestmark = pytest.mark.skipif(not endpoint_reachable(), reason="no S3 endpoint, start LocalStack first")
+
+
+@pytest.fixture
+def production_version(tmp_path) -> str:
+    """Registers and promotes a bundle in a bucket of its own, so the project's registry is never touched."""
+    client = buckets()
+    try:
+        client.s3_client.create_bucket(Bucket=LATENCY_BUCKET_NAME)
+    except client.s3_client.exceptions.BucketAlreadyOwnedByYou:
+        pass
+
+    feature_plan, scaler, model = fit_pipeline(LogisticRegression(max_iter=1000))
+    model_file_path, bundle_file_path = str(tmp_path / "model.pkl"), str(tmp_path / "model_bundle.bin")
+    save_object(model_file_path, model)
+    ModelBundle.build(CLEANING_PARAMS, feature_plan, scaler, model).save(bundle_file_path)
+
+    registry = ModelRegistry(ModelRegistryConfig(bucket_name=LATENCY_BUCKET_NAME))
+    manifest = registry.register_model(model_file_path, {"feature_version": feature_plan.version},
+                                       bundle_file_path=bundle_file_path)
+    _, pointer_etag = registry.read_production_pointer()
+    return registry.promote(manifest, expected_pointer_etag=pointer_etag)["version"]
+
+
+def test_single_record_latency(production_version, monkeypatch):
+    import app as service
+
+    monkeypatch.setattr(service.classifier, "estimator", Proj1Estimator(bucket_name=LATENCY_BUCKET_NAME))
+    latencies = []
+    with TestClient(service.app) as client:
+        assert client.get("/health").json()["model_version"] == production_version
+        for _ in range(N_REQUESTS):
+            start = time.perf_counter()
+            response = client.post("/predict", json=RECORD)
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200
+
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1e3
+    print(f"\n/predict over {N_REQUESTS} requests: p50 {p50:.2f} ms, p99 {p99:.2f} ms")
+    assert p99 < P99_BUDGET_MS
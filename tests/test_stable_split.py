@@ -0,0 +1,14 @@
+import numpy as np
+import pandas as pd
+
+from src.utils.main_utils import stable_test_mask
+
+
+def test_split_follows_the_rows_not_their_position():
+    keys = pd.util.hash_pandas_object(pd.Series(np.arange(2000)), index=False).to_numpy()
+    mask = stable_test_mask(keys, test_size=0.2)
+    assert abs(mask.mean() - 0.2) < 0.03
+
+    # A run that reads a reordered subset of the rows puts each one in the same set
+    subset = np.random.default_rng(0).permutation(2000)[:500]
+    np.testing.assert_array_equal(stable_test_mask(keys[subset], test_size=0.2), mask[subset])
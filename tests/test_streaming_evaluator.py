@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from src.components.streaming_evaluator import StreamingEvaluator
+from src.entity.model_bundle import ModelBundle
+from src.exception import MyException
+from src.utils.main_utils import save_numpy_array_data
+from src.utils.metrics import confusion_counts
+from tests.synthetic import CLEANING_PARAMS, cleaned_data, fit_pipeline, model_config, raw_columns
+
+SLICES = ["Stage_fear_Yes", "Drained_after_socializing_Yes"]
+
+
+def test_bundles_are_scored_in_their_own_feature_space(tmp_path):
+    challenger_plan, challenger_scaler, challenger = fit_pipeline(LogisticRegression(max_iter=1000))
+    # Trained on other data, so its bin edges and scaler statistics differ from the challenger's
+    champion = ModelBundle.build(CLEANING_PARAMS, *fit_pipeline(LogisticRegression(C=0.01, max_iter=1000), seed=2))
+    assert not np.allclose(champion.scaler_mean, challenger_scaler.mean_)
+
+    columns, target = raw_columns(n_rows=1000, seed=1)
+    challenger_bundle = ModelBundle.build(CLEANING_PARAMS, challenger_plan, challenger_scaler, challenger)
+    test_file_path, rows_file_path = str(tmp_path / "test.npy"), str(tmp_path / "test_rows.csv")
+    save_numpy_array_data(test_file_path, np.c_[challenger_bundle.transform(columns), target])
+    pd.DataFrame(columns).to_csv(rows_file_path, index=False)
+
+    evaluator = StreamingEvaluator(models={"challenger": challenger}, block_rows=300, bundles={"champion": champion},
+                                   pair=("challenger", "champion"))
+    scores = evaluator.run(test_file_path, rows_file_path=rows_file_path)
+
+    champion_predictions = champion.predict_class_indices(columns)
+    assert scores["champion"]["overall"] == confusion_counts(target, champion_predictions).tolist()
+    np.testing.assert_array_equal(evaluator.predictions["champion"], champion_predictions)
+    np.testing.assert_array_equal(evaluator.predictions["challenger"], challenger_bundle.predict_class_indices(columns))
+    assert sum(scores["challenger"]["paired"]["champion"]) == 1000
+
+
+@pytest.fixture
+def pruned_test_set(tmp_path):
+    """A test matrix from a feature plan that selects none of the slice columns, with the slices file."""
+    config = model_config()
+    config["feature_engineering"]["selected_features"] = ["Time_spent_Alone", "Alone_to_Social_Ratio"]
+    feature_plan, scaler, model = fit_pipeline(LogisticRegression(max_iter=1000), config=config)
+    assert not set(SLICES) & set(feature_plan.feature_names)
+
+    columns, target = cleaned_data(n_rows=1000, seed=1)
+    test_file_path, slices_file_path = str(tmp_path / "test.npy"), str(tmp_path / "test_slices.csv")
+    save_numpy_array_data(test_file_path, np.c_[scaler.transform(feature_plan.transform(columns)), target])
+    columns[SLICES].to_csv(slices_file_path, index=False)
+    return model, test_file_path, slices_file_path, columns, target
+
+
+def test_slices_come_from_the_cleaned_columns(pruned_test_set):
+    model, test_file_path, slices_file_path, columns, target = pruned_test_set
+    evaluator = StreamingEvaluator(models={"challenger": model}, slice_features=SLICES[::-1], block_rows=300)
+    scores = evaluator.run(test_file_path, slices_file_path=slices_file_path)
+
+    predictions = evaluator.predictions["challenger"]
+    for feature in SLICES:
+        levels = columns[feature].to_numpy()
+        assert scores["challenger"]["slices"][feature] == {
+            str(int(level)): confusion_counts(target[levels == level], predictions[levels == level]).tolist()
+            for level in (False, True)}
+
+
+def test_missing_slice_column_fails(pruned_test_set):
+    model, test_file_path, slices_file_path, _, _ = pruned_test_set
+    evaluator = StreamingEvaluator(models={"challenger": model}, slice_features=SLICES + ["Going_outside"])
+    with pytest.raises(MyException, match=r"Slice columns \['Going_outside'\] are not in"):
+        evaluator.run(test_file_path, slices_file_path=slices_file_path)